@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 这些模块只应在对应的子命令真正执行时才被导入
+HEAVY_MODULES = ("whisper", "torch", "openai", "ffmpeg", "tqdm", "numpy")
+
+# CLI 启动路径上允许的最大累计导入时间（微秒），超过则视为回归
+DEFAULT_MAX_IMPORT_US = 300000
+
+COMMANDS = {
+    "import": ["-c", "import ai_subtitle_assistant.__main__"],
+    "config": ["-m", "ai_subtitle_assistant", "config", "--show-path"],
+    "translate-help": ["-m", "ai_subtitle_assistant", "translate", "--help"],
+}
+
+
+def _env():
+    src_dir = os.path.join(os.path.dirname(__file__), "..", "src")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = (
+        os.path.abspath(src_dir) + os.pathsep + env.get("PYTHONPATH", "")
+    )
+    return env
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(args_list, runs):
+    """
+    Runs the CLI with `-X importtime` and returns timing statistics.
+    """
+    wall_times = []
+    modules = {}
+    returncode = 0
+    errors = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime"] + args_list,
+            env=_env(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall_times.append(time.perf_counter() - start)
+        modules = parse_importtime(proc.stderr)
+        if proc.returncode != 0:
+            # 命令本身失败时计时没有意义，保留其错误输出以便排查
+            returncode = proc.returncode
+            errors = "\n".join(
+                line
+                for line in proc.stderr.splitlines()
+                if not line.startswith("import time:")
+            )
+
+    total_import_us = sum(self_us for self_us, _cumulative in modules.values())
+    heavy = sorted(
+        name
+        for name in modules
+        if name.split(".")[0] in HEAVY_MODULES
+        and name.split(".")[0] == name  # 只报告顶层包
+    )
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    return {
+        "returncode": returncode,
+        "errors": errors,
+        "wall_time_min_s": min(wall_times),
+        "wall_time_median_s": sorted(wall_times)[len(wall_times) // 2],
+        "total_import_us": total_import_us,
+        "heavy_modules": heavy,
+        "slowest_imports": [
+            {"module": name, "self_us": self_us, "cumulative_us": cumulative_us}
+            for name, (self_us, cumulative_us) in slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Startup-time regression benchmark for the ai-subtitle CLI."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-import-us",
+        type=int,
+        default=DEFAULT_MAX_IMPORT_US,
+        help="Fail if the total import time of any command exceeds this value.",
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for name, args_list in COMMANDS.items():
+        result = measure(args_list, args.runs)
+        results[name] = result
+        print(
+            f"{name:15s} wall(min)={result['wall_time_min_s'] * 1000:7.1f}ms "
+            f"imports={result['total_import_us'] / 1000:7.1f}ms"
+        )
+        if result["returncode"] != 0:
+            print(f"  command failed with exit code {result['returncode']}")
+            if result["errors"]:
+                print(result["errors"])
+            failed = True
+        if result["heavy_modules"]:
+            print(f"  heavy modules imported: {', '.join(result['heavy_modules'])}")
+            failed = True
+        if result["total_import_us"] > args.max_import_us:
+            print(f"  import time exceeds {args.max_import_us / 1000:.1f}ms")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
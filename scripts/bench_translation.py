@@ -0,0 +1,249 @@
+"""
+Benchmarks the translation pipeline against the local mock LLM server.
+Results are written as JSON so they can be compared between revisions.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_llm_server import add_settings_arguments, settings_from_args, start_server
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.srt_utils import parse_srt, to_bilingual_srt
+
+SAMPLE_LINES = [
+    "The first and most important rule of gunrunning",
+    "is never get shot with your own merchandise.",
+    "You okay?",
+    "Yeah.",
+    "We need to leave before the convoy reaches the border.",
+    "What?",
+    "Thank you.",
+    "[MUSIC]",
+    "I told you, Colonel Harris will not wait for us.",
+    "There are 42 crates in the warehouse on 5th Street.",
+]
+
+
+def make_srt(cue_count):
+    """Generates a synthetic SRT file with the given number of cues."""
+    blocks = []
+    for i in range(cue_count):
+        start = timedelta(seconds=i * 2)
+        end = start + timedelta(seconds=1, milliseconds=500)
+        text = f"{SAMPLE_LINES[i % len(SAMPLE_LINES)]} ({i})"
+        blocks.append(f"{i + 1}\n{_ts(start)} --> {_ts(end)}\n{text}\n")
+    return "\n".join(blocks)
+
+
+def _ts(delta):
+    total_ms = int(delta.total_seconds() * 1000)
+    hours, rest = divmod(total_ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def _timeit(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"min_s": min(timings), "median_s": sorted(timings)[len(timings) // 2]}
+
+
+def bench_parsing(sizes, repeat):
+    results = []
+    for size in sizes:
+        srt_content = make_srt(size)
+        segments = parse_srt(srt_content)
+        bilingual = [
+            {
+                "start": seg["start"],
+                "end": seg["end"],
+                "original_text": seg["text"],
+                "translated_text": seg["text"],
+            }
+            for seg in segments
+        ]
+        translated = [
+            {"id": seg["id"], "original_text": seg["text"], "translated_text": "x"}
+            for seg in segments
+        ]
+        original_texts = {seg["id"]: seg["text"] for seg in segments}
+
+        def post_process():
+            with contextlib.redirect_stderr(io.StringIO()):
+                translation._validate_translations(
+                    [dict(item) for item in translated], original_texts
+                )
+                translation._assemble_bilingual(segments, translated)
+
+        results.append(
+            {
+                "cues": size,
+                "parse_srt": _timeit(lambda: parse_srt(srt_content), repeat),
+                "to_bilingual_srt": _timeit(
+                    lambda: to_bilingual_srt(bilingual), repeat
+                ),
+                "post_process": _timeit(post_process, repeat),
+            }
+        )
+        print(
+            f"parse/compose cues={size:6d} "
+            f"parse={results[-1]['parse_srt']['min_s'] * 1000:8.2f}ms "
+            f"compose={results[-1]['to_bilingual_srt']['min_s'] * 1000:8.2f}ms "
+            f"post={results[-1]['post_process']['min_s'] * 1000:8.2f}ms"
+        )
+    return results
+
+
+def bench_translate(
+    base_url, settings, sizes, workers_list, chunk_sizes, context_cues=0, hedge=None
+):
+    results = []
+    original_chunk_limit = translation.CHUNK_SIZE_LIMIT
+    try:
+        for size in sizes:
+            segments = parse_srt(make_srt(size))
+            for chunk_size in chunk_sizes:
+                translation.CHUNK_SIZE_LIMIT = chunk_size
+                chunk_count = len(
+                    translation._plan_chunks(segments, context_cues=context_cues)
+                )
+                for workers in workers_list:
+                    requests_before = settings.request_count
+                    start = time.perf_counter()
+                    with contextlib.redirect_stderr(io.StringIO()):
+                        bilingual = translation.translate_segments(
+                            segments,
+                            "Chinese",
+                            base_url,
+                            "mock-key",
+                            "mock-model",
+                            workers,
+                            context_cues=context_cues,
+                            **(hedge or {}),
+                        )
+                    elapsed = time.perf_counter() - start
+                    failed = sum(
+                        1
+                        for item in bilingual
+                        if not item["translated_text"].startswith("[Chinese]")
+                    )
+                    results.append(
+                        {
+                            "cues": size,
+                            "chunk_size_limit": chunk_size,
+                            "chunks": chunk_count,
+                            "max_workers": workers,
+                            "context_cues": context_cues,
+                            "wall_time_s": elapsed,
+                            "cues_per_s": size / elapsed if elapsed else None,
+                            "requests": settings.request_count - requests_before,
+                            "failed_cues": failed,
+                        }
+                    )
+                    print(
+                        f"translate cues={size:6d} chunk={chunk_size:6d} "
+                        f"chunks={chunk_count:4d} workers={workers:3d} "
+                        f"wall={elapsed:7.2f}s failed={failed}"
+                    )
+    finally:
+        translation.CHUNK_SIZE_LIMIT = original_chunk_limit
+    return results
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=_int_list, default=[200, 1000])
+    parser.add_argument("--workers", type=_int_list, default=[1, 5, 10])
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[2000, 8000])
+    parser.add_argument("--parse-sizes", type=_int_list, default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--context-cues",
+        type=int,
+        default=0,
+        help="Read-only context cues sent around each chunk.",
+    )
+    parser.add_argument(
+        "--retry-delay",
+        type=float,
+        default=0.0,
+        help="Overrides RETRY_DELAY so injected failures do not dominate timings.",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=None,
+        help="Enable hedged requests past this chunk latency percentile.",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=translation.DEFAULT_HEDGE_BUDGET,
+        help="Maximum share of chunks that may be hedged.",
+    )
+    parser.add_argument("--skip-translate", action="store_true")
+    parser.add_argument("--json", default="bench_results.json")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    translation.RETRY_DELAY = args.retry_delay
+    settings = settings_from_args(args)
+    httpd, base_url = start_server(settings)
+
+    results = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock_settings": {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "rate_limit": args.rate_limit,
+            "truncate_rate": args.truncate_rate,
+            "failure_rate": args.failure_rate,
+            "slow_rate": args.slow_rate,
+            "slow_factor": args.slow_factor,
+        },
+        "hedge_percentile": args.hedge_percentile,
+        "parsing": bench_parsing(args.parse_sizes, args.repeat),
+    }
+    if not args.skip_translate:
+        results["translate_segments"] = bench_translate(
+            base_url,
+            settings,
+            args.sizes,
+            args.workers,
+            args.chunk_sizes,
+            args.context_cues,
+            {
+                "hedge_percentile": args.hedge_percentile,
+                "hedge_budget": args.hedge_budget,
+            },
+        )
+    results["mock_rejected_requests"] = settings.rejected_count
+    httpd.shutdown()
+
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
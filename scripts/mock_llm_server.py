@@ -0,0 +1,474 @@
+"""
+A local stand-in for an OpenAI-compatible chat completions API, used by the
+benchmarks. It "translates" each segment by prefixing the target language and
+can simulate latency, tail latency, rate limits, truncated output and server failures.
+It also implements the files and batches endpoints used by batch mode, and
+structured output through json_schema response formats or tool calls.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DATA_MARKER = "Here is the JSON data to translate:"
+
+
+class MockSettings:
+    def __init__(
+        self,
+        latency=0.2,
+        jitter=0.1,
+        rate_limit=0.0,
+        truncate_rate=0.0,
+        failure_rate=0.0,
+        slow_rate=0.0,
+        slow_factor=10.0,
+        batch_delay=1.0,
+        structured=("schema", "tool"),
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit  # requests per second, 0 = unlimited
+        self.truncate_rate = truncate_rate
+        self.failure_rate = failure_rate
+        self.slow_rate = (
+            slow_rate  # share of requests that take slow_factor times longer
+        )
+        self.slow_factor = slow_factor
+        # 支持的结构化输出方式，其余方式返回 400
+        self.structured = tuple(structured)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.rejected_count = 0
+        self._tokens = rate_limit
+        self._last_refill = time.monotonic()
+        self.batch_delay = batch_delay  # seconds before a submitted batch completes
+        self.files = {}
+        self.batches = {}
+        self._ids = itertools.count(1)
+
+    def next_id(self, prefix):
+        with self.lock:
+            return f"{prefix}-mock-{next(self._ids)}"
+
+    def take_token(self):
+        """Token bucket rate limiter; returns False when the request should get a 429."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit,
+                self._tokens + (now - self._last_refill) * self.rate_limit,
+            )
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.rejected_count += 1
+            return False
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-1, 1) * self.jitter)
+            if self.random.random() < self.slow_rate:
+                delay *= self.slow_factor
+            return delay
+
+
+def _extract_segments(prompt):
+    """Finds the JSON array of segments at the end of the user prompt."""
+    if DATA_MARKER in prompt:
+        data = prompt.rsplit(DATA_MARKER, 1)[1]
+    else:
+        data = prompt[prompt.rfind("\n[") + 1 :]
+    try:
+        segments = json.loads(data.strip())
+    except ValueError:
+        return []
+    return [s for s in segments if isinstance(s, dict) and "id" in s]
+
+
+def _target_languages(system_prompt):
+    if "each of these languages:" in system_prompt:
+        listed = system_prompt.split("each of these languages:", 1)[1]
+        return [lang.strip() for lang in listed.split(".", 1)[0].split(",")], True
+    if " into " in system_prompt:
+        return [system_prompt.split(" into ", 1)[1].split(".", 1)[0].strip()], False
+    return ["Target"], False
+
+
+def build_completion(body):
+    messages = body.get("messages", [])
+    system_prompt = next(
+        (m["content"] for m in messages if m.get("role") == "system"), ""
+    )
+    prompt = messages[-1]["content"] if messages else ""
+    segments = _extract_segments(prompt)
+    languages, combined = _target_languages(system_prompt)
+
+    translations = []
+    for segment in segments:
+        text = segment.get("text", "")
+        if combined:
+            translated = {lang: f"[{lang}] {text}" for lang in languages}
+        else:
+            translated = f"[{languages[0]}] {text}"
+        translations.append(
+            {"id": segment["id"], "original_text": text, "translated_text": translated}
+        )
+    content = json.dumps({"translations": translations}, ensure_ascii=False)
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    return content, prompt_tokens, len(content) // 4
+
+
+def _parse_multipart(content_type, body):
+    """Returns {field name: bytes} of a multipart/form-data body."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(
+            decode=True
+        )
+        for part in message.iter_parts()
+    }
+
+
+def _file_object(settings, file_id):
+    data, purpose = settings.files[file_id]
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(data),
+        "created_at": int(time.time()),
+        "filename": f"{file_id}.jsonl",
+        "purpose": purpose,
+        "status": "processed",
+    }
+
+
+def _run_batch(settings, batch):
+    """Completes a submitted batch after settings.batch_delay seconds."""
+    time.sleep(settings.batch_delay)
+    if batch["status"] == "cancelled":
+        return
+    data, _purpose = settings.files[batch["input_file_id"]]
+    output = []
+    completed = failed = 0
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if settings.roll(settings.failure_rate):
+            failed += 1
+            output.append(
+                {
+                    "id": settings.next_id("batch_req"),
+                    "custom_id": request["custom_id"],
+                    "response": None,
+                    "error": {"code": "server_error", "message": "injected failure"},
+                }
+            )
+            continue
+        content, prompt_tokens, completion_tokens = build_completion(request["body"])
+        completed += 1
+        output.append(
+            {
+                "id": settings.next_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "model": request["body"].get("model", "mock-model"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": content},
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                    },
+                },
+                "error": None,
+            }
+        )
+    output_id = settings.next_id("file")
+    with settings.lock:
+        settings.files[output_id] = (
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in output).encode(
+                "utf-8"
+            ),
+            "batch_output",
+        )
+        batch.update(
+            status="completed",
+            output_file_id=output_id,
+            completed_at=int(time.time()),
+            request_counts={
+                "total": completed + failed,
+                "completed": completed,
+                "failed": failed,
+            },
+        )
+
+
+def make_handler(settings):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+                entry = settings.files.get(parts[-2])
+                if entry is None:
+                    self._send(404, {"error": {"message": "file not found"}})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(entry[0])))
+                self.end_headers()
+                self.wfile.write(entry[0])
+                return
+            if len(parts) >= 2 and parts[-2] == "batches":
+                batch = settings.batches.get(parts[-1])
+                if batch is None:
+                    self._send(404, {"error": {"message": "batch not found"}})
+                else:
+                    with settings.lock:
+                        self._send(200, dict(batch))
+                return
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(
+                    200,
+                    {
+                        "object": "list",
+                        "data": [{"id": "mock-model", "object": "model"}],
+                    },
+                )
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw_body = self.rfile.read(length)
+            path = self.path.split("?")[0].rstrip("/")
+            if path.endswith("/files"):
+                fields = _parse_multipart(self.headers["Content-Type"], raw_body)
+                file_id = settings.next_id("file")
+                with settings.lock:
+                    settings.files[file_id] = (
+                        fields.get("file", b""),
+                        (fields.get("purpose") or b"batch").decode(),
+                    )
+                self._send(200, _file_object(settings, file_id))
+                return
+            body = json.loads(raw_body.decode("utf-8") or "{}")
+            parts = path.split("/")
+            if len(parts) >= 3 and parts[-3] == "batches" and parts[-1] == "cancel":
+                batch = settings.batches.get(parts[-2])
+                if batch is None:
+                    self._send(404, {"error": {"message": "batch not found"}})
+                    return
+                with settings.lock:
+                    if batch["status"] == "in_progress":
+                        batch.update(status="cancelled", cancelled_at=int(time.time()))
+                    self._send(200, dict(batch))
+                return
+            if path.endswith("/batches"):
+                if body.get("input_file_id") not in settings.files:
+                    self._send(400, {"error": {"message": "unknown input file"}})
+                    return
+                batch = {
+                    "id": settings.next_id("batch"),
+                    "object": "batch",
+                    "endpoint": body.get("endpoint"),
+                    "completion_window": body.get("completion_window", "24h"),
+                    "input_file_id": body["input_file_id"],
+                    "status": "in_progress",
+                    "created_at": int(time.time()),
+                    "output_file_id": None,
+                    "error_file_id": None,
+                    "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                }
+                settings.batches[batch["id"]] = batch
+                threading.Thread(
+                    target=_run_batch, args=(settings, batch), daemon=True
+                ).start()
+                self._send(200, dict(batch))
+                return
+            if not path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            with settings.lock:
+                settings.request_count += 1
+            if not settings.take_token():
+                self._send(429, {"error": {"message": "rate limit exceeded"}})
+                return
+            mode = "off"
+            if body.get("tools"):
+                mode = "tool"
+            elif (body.get("response_format") or {}).get("type") == "json_schema":
+                mode = "schema"
+            if mode != "off" and mode not in settings.structured:
+                parameter = "tools" if mode == "tool" else "response_format"
+                self._send(
+                    400,
+                    {
+                        "error": {
+                            "message": f"'{parameter}' ({mode} output) is not supported",
+                            "param": parameter,
+                        }
+                    },
+                )
+                return
+            time.sleep(settings.delay())
+            if settings.roll(settings.failure_rate):
+                self._send(500, {"error": {"message": "injected failure"}})
+                return
+
+            content, prompt_tokens, completion_tokens = build_completion(body)
+            finish_reason = "stop"
+            if settings.roll(settings.truncate_rate):
+                content = content[: max(1, len(content) // 2)]
+                finish_reason = "length"
+            message = {"role": "assistant", "content": content}
+            if mode == "tool":
+                name = body["tools"][0]["function"]["name"]
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": settings.next_id("call"),
+                            "type": "function",
+                            "function": {"name": name, "arguments": content},
+                        }
+                    ],
+                }
+            self._send(
+                200,
+                {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock-model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": finish_reason,
+                            "message": message,
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                },
+            )
+
+    return MockHandler
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """Starts the mock server in a daemon thread and returns (httpd, base_url)."""
+    httpd = ThreadingHTTPServer((host, port), make_handler(settings))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://{host}:{httpd.server_address[1]}/v1"
+
+
+def add_settings_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean latency (s).")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Latency jitter (s).")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Requests/s, 0 for none."
+    )
+    parser.add_argument(
+        "--truncate-rate", type=float, default=0.0, help="Share of truncated replies."
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0, help="Share of HTTP 500 replies."
+    )
+    parser.add_argument(
+        "--slow-rate", type=float, default=0.0, help="Share of tail-latency replies."
+    )
+    parser.add_argument(
+        "--slow-factor", type=float, default=10.0, help="Latency multiplier for them."
+    )
+    parser.add_argument(
+        "--batch-delay", type=float, default=1.0, help="Time to complete a batch (s)."
+    )
+    parser.add_argument(
+        "--structured",
+        default="schema,tool",
+        help="Supported structured output modes (schema, tool); others get a 400.",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def settings_from_args(args):
+    return MockSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        truncate_rate=args.truncate_rate,
+        failure_rate=args.failure_rate,
+        slow_rate=args.slow_rate,
+        slow_factor=args.slow_factor,
+        batch_delay=args.batch_delay,
+        structured=[m for m in args.structured.split(",") if m],
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(settings_from_args(args))
+    )
+    print(f"Mock LLM API listening on http://{args.host}:{args.port}/v1")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
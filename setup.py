@@ -12,6 +12,9 @@ setup(
     packages=find_packages(where="src"),
     package_dir={"": "src"},
     install_requires=read_requirements(),
+    extras_require={
+        "local": ["transformers"],
+    },
     entry_points={
         "console_scripts": [
             "ai-subtitle = ai_subtitle_assistant.__main__:main",
@@ -1,13 +1,29 @@
 import argparse
 import signal
 import sys
-from ai_subtitle_assistant.commands import transcribe_cmd, translate_cmd, config_cmd
+import time
+from ai_subtitle_assistant.commands import (
+    transcribe_cmd,
+    translate_cmd,
+    config_cmd,
+    serve_cmd,
+    worker_cmd,
+)
+from ai_subtitle_assistant.core.log import (
+    DEFAULT_LOG_FILE,
+    get_logger,
+    parse_module_levels,
+    setup_logging,
+)
+from ai_subtitle_assistant.core.metrics import registry as metrics
 from ai_subtitle_assistant.i18n import set_language, _
 from colorama import Fore, Style, init
 
 # 初始化 colorama
 init(autoreset=True)
 
+logger = get_logger("ai_subtitle_assistant")
+
 # 全局变量，用于标记是否收到中断信号
 interrupted = False
 
@@ -38,6 +54,47 @@ def main():
         default="zh",
         help=_('Set the display language (e.g., "en", "zh").'),
     )
+    parser.add_argument(
+        "--metrics-json",
+        help=_("Write a JSON report with stage timings, latencies and token usage."),
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help=_("Expose Prometheus metrics at http://127.0.0.1:PORT/metrics."),
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help=_(
+            "Profile each stage (cProfile and sampled stacks with wait times) and write the results to DIR and DIR.zip. Default: ai-subtitle-profile-<timestamp>."
+        ),
+    )
+    parser.add_argument(
+        "--log-level",
+        metavar="LEVEL",
+        help=_(
+            "Log level: DEBUG, INFO, WARNING or ERROR. Default: INFO (DEBUG if AI_SUBTITLE_DEBUG=1)."
+        ),
+    )
+    parser.add_argument(
+        "--log-module-level",
+        action="append",
+        default=[],
+        metavar="MODULE=LEVEL",
+        help=_(
+            "Log level of one module, e.g. translation=DEBUG or endpoints=WARNING. Can be repeated."
+        ),
+    )
+    parser.add_argument(
+        "--log-file",
+        metavar="PATH",
+        help=_(
+            "Rotating log file that also receives debug payloads such as prompts and responses. Default with DEBUG: {path}"
+        ).format(path=DEFAULT_LOG_FILE),
+    )
 
     subparsers = parser.add_subparsers(dest="command", help=_("Available commands"))
     subparsers.required = True
@@ -60,6 +117,18 @@ def main():
     )
     config_cmd.configure_parser(config_parser)
 
+    # Serve command
+    serve_parser = subparsers.add_parser(
+        "serve", help=_("Run a local job server that keeps models warm.")
+    )
+    serve_cmd.configure_parser(serve_parser)
+
+    # Worker command
+    worker_parser = subparsers.add_parser(
+        "worker", help=_("Run jobs from a shared job store.")
+    )
+    worker_cmd.configure_parser(worker_parser)
+
     # First, parse only the language argument
     args, remaining_argv = parser.parse_known_args()
 
@@ -72,8 +141,52 @@ def main():
     parser.set_defaults(language=args.language)
     all_args = parser.parse_args()
 
+    try:
+        log_file = setup_logging(
+            all_args.log_level,
+            parse_module_levels(",".join(all_args.log_module_level)),
+            all_args.log_file,
+        )
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if log_file:
+        logger.info(
+            _("Writing the log to {path}").format(path=log_file),
+            extra={"color": Fore.BLUE},
+        )
+
+    if all_args.metrics_port:
+        from ai_subtitle_assistant.core.metrics import start_prometheus_server
+
+        start_prometheus_server(all_args.metrics_port)
+
+    profiler = None
+    if all_args.profile is not None:
+        from ai_subtitle_assistant.core.profiling import Profiler
+
+        profiler = Profiler(
+            all_args.profile or time.strftime("ai-subtitle-profile-%Y%m%d-%H%M%S")
+        )
+        metrics.profiler = profiler
+        profiler.start()
+
     if hasattr(all_args, "func"):
-        all_args.func(all_args)
+        try:
+            with metrics.stage(f"command.{all_args.command}"):
+                all_args.func(all_args)
+        finally:
+            if all_args.metrics_json:
+                metrics.write_json_report(all_args.metrics_json)
+            if profiler is not None:
+                profiler.stop()
+                metrics.profiler = None
+                archive = profiler.write(metrics.report()["stages"])
+                print(
+                    Fore.GREEN
+                    + _("Profile written to {path}").format(path=archive)
+                    + Style.RESET_ALL,
+                    file=sys.stderr,
+                )
     else:
         parser.print_help()
         sys.exit(1)
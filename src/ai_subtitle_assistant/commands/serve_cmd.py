@@ -0,0 +1,118 @@
+import argparse
+import configparser
+import os
+import sys
+from ai_subtitle_assistant.config import (
+    get_config_value,
+    get_endpoint_configs,
+    CONFIG_FILE,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    DEFAULT_SERVER_QUEUE_SIZE,
+)
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+
+def configure_parser(parser):
+    """
+    Configures the parser for the serve command.
+    """
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_SERVER_HOST,
+        help=_("Address to bind the job server to."),
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_SERVER_PORT,
+        help=_("Port to bind the job server to."),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help=_("Number of jobs processed concurrently by the server."),
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_SERVER_QUEUE_SIZE,
+        help=_("Maximum number of pending jobs before new submissions are rejected."),
+    )
+    parser.add_argument(
+        "--preload-model",
+        action="append",
+        default=[],
+        help=_("Whisper model to load at startup. Can be given multiple times."),
+    )
+    parser.add_argument(
+        "--job-store",
+        metavar="PATH",
+        help=_(
+            "Queue submitted jobs in this shared job store for 'ai-subtitle worker' processes "
+            "instead of running them in the server."
+        ),
+    )
+    parser.add_argument(
+        "--job-retention",
+        type=float,
+        default=24,
+        metavar="HOURS",
+        help=_(
+            "With --job-store, delete finished jobs from the store this many hours after they finished."
+        ),
+    )
+    parser.set_defaults(func=run)
+
+
+def run(args):
+    """
+    The main function for the serve command.
+    """
+    from ai_subtitle_assistant.core.server import serve
+
+    # 服务端不能交互式地创建配置，因此只读取已存在的配置文件
+    config = configparser.ConfigParser()
+    if os.path.exists(CONFIG_FILE):
+        config.read(CONFIG_FILE, encoding="utf-8")
+    else:
+        print(
+            Fore.YELLOW
+            + _(
+                "No config file found at {config_file}. Translate jobs must provide API credentials."
+            ).format(config_file=CONFIG_FILE),
+            file=sys.stderr,
+        )
+    defaults = {
+        "api_base_url": get_config_value(config, "api_base_url"),
+        "api_key": get_config_value(config, "api_key"),
+        "endpoints": get_endpoint_configs(config),
+    }
+
+    job_store = None
+    if args.job_store:
+        from ai_subtitle_assistant.core.job_store import JobStore
+
+        job_store = JobStore(args.job_store)
+
+    try:
+        serve(
+            host=args.host,
+            port=args.port,
+            queue_size=args.queue_size,
+            workers=args.workers,
+            defaults=defaults,
+            preload_models=args.preload_model,
+            job_store=job_store,
+            job_retention=args.job_retention * 3600,
+        )
+    except OSError as e:
+        print(
+            Fore.RED + _("Failed to start server: {e}").format(e=e),
+            file=sys.stderr,
+        )
+        sys.exit(1)
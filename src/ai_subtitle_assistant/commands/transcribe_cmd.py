@@ -1,8 +1,6 @@
 import argparse
+import os
 import sys
-from ai_subtitle_assistant.core.transcription import transcribe
-from ai_subtitle_assistant.core.srt_utils import to_srt
-from ai_subtitle_assistant.core.video_utils import probe_subtitles, extract_subtitle
 from ai_subtitle_assistant.i18n import _
 from colorama import Fore, Style, init
 
@@ -32,6 +30,51 @@ def configure_parser(parser):
         action="store_true",
         help=_("Force transcription even if embedded subtitles are found."),
     )
+    parser.add_argument(
+        "--no-audio-cache",
+        dest="audio_cache",
+        action="store_false",
+        help=_(
+            "Decode the audio with ffmpeg again instead of reusing the cached decoded audio."
+        ),
+    )
+    parser.add_argument(
+        "--fingerprint-index",
+        nargs="?",
+        const="default",
+        default=None,
+        metavar="PATH",
+        help=_(
+            "Reuse the transcription of audio heard in earlier files (intros, credits, ads) "
+            "found through an audio fingerprint index. Optionally give the path of the index database."
+        ),
+    )
+    parser.add_argument(
+        "--job-store",
+        metavar="PATH",
+        help=_(
+            "Split the audio into windows and queue them in this shared job store, "
+            "where 'ai-subtitle worker' processes on any node transcribe them."
+        ),
+    )
+    parser.add_argument(
+        "--window-seconds",
+        type=float,
+        default=600,
+        help=_("Length of the audio windows used with --job-store. Default is 600."),
+    )
+    parser.add_argument(
+        "--server",
+        help=_(
+            "URL of a running 'ai-subtitle serve' instance to submit the job to (e.g., http://127.0.0.1:8765)."
+        ),
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help=_("Job priority when using --server. Lower values run first."),
+    )
     parser.set_defaults(func=run)
 
 
@@ -39,6 +82,10 @@ def run(args):
     """
     The main function for the transcribe command.
     """
+    # 重量级依赖（whisper/torch、ffmpeg）只在命令真正执行时才导入
+    from ai_subtitle_assistant.core.srt_utils import to_srt
+    from ai_subtitle_assistant.core.video_utils import probe_subtitles, extract_subtitle
+
     try:
         # Check for embedded subtitles if it's a video file and not forced
         if not args.force_transcribe and args.input_file.lower().endswith(
@@ -126,10 +173,54 @@ def run(args):
             Fore.BLUE + _("No subtitles extracted. Starting transcription..."),
             file=sys.stderr,
         )
-        transcription_result = transcribe(args.input_file, args.model)
+        if args.server:
+            from ai_subtitle_assistant.core.server import run_remote_job
+
+            if not os.path.exists(args.input_file):
+                raise FileNotFoundError(args.input_file)
+            result = run_remote_job(
+                args.server,
+                "transcribe",
+                {
+                    "input_file": os.path.abspath(args.input_file),
+                    "model": args.model,
+                    "audio_cache": args.audio_cache,
+                    "fingerprint_index": args.fingerprint_index,
+                },
+                args.priority,
+            )
+            srt_content = result["srt"]
+        else:
+            from ai_subtitle_assistant.core.transcription import transcribe
+
+            fingerprint_index = None
+            if args.fingerprint_index:
+                from ai_subtitle_assistant.core.fingerprint import (
+                    DEFAULT_INDEX_FILE,
+                    get_index,
+                )
+
+                fingerprint_index = get_index(
+                    DEFAULT_INDEX_FILE
+                    if args.fingerprint_index == "default"
+                    else args.fingerprint_index
+                )
+            job_store = None
+            if args.job_store:
+                from ai_subtitle_assistant.core.job_store import JobStore
+
+                job_store = JobStore(args.job_store)
+            transcription_result = transcribe(
+                args.input_file,
+                args.model,
+                audio_cache=args.audio_cache,
+                fingerprint_index=fingerprint_index,
+                job_store=job_store,
+                window_seconds=args.window_seconds,
+            )
 
-        # 2. Convert to SRT format
-        srt_content = to_srt(transcription_result["segments"])
+            # 2. Convert to SRT format
+            srt_content = to_srt(transcription_result["segments"])
 
         # 3. Output
         if args.output:
@@ -1,9 +1,17 @@
 import argparse
+import concurrent.futures
+import contextlib
 import sys
 import os
-from ai_subtitle_assistant.core.translation import translate_segments
-from ai_subtitle_assistant.core.srt_utils import parse_srt, to_bilingual_srt
-from ai_subtitle_assistant.config import load_config, get_config_value, CONFIG_FILE
+import tempfile
+from ai_subtitle_assistant.core.srt_utils import parse_srt, OrderedBilingualWriter
+from ai_subtitle_assistant.config import (
+    load_config,
+    get_config_value,
+    get_endpoint_configs,
+    API_KEY_ENV,
+    CONFIG_FILE,
+)
 from ai_subtitle_assistant.i18n import _
 from colorama import Fore, Style, init
 
@@ -32,7 +40,15 @@ def configure_parser(parser):
         "--target-language",
         default="Chinese",
         help=_(
-            "The target language for translation (e.g., Chinese, English, Japanese)."
+            "The target language for translation (e.g., Chinese, English, Japanese). "
+            "Separate several languages with commas to produce one output per language."
+        ),
+    )
+    parser.add_argument(
+        "--combined-languages",
+        action="store_true",
+        help=_(
+            "When translating into several languages, request all of them in a single API call per chunk."
         ),
     )
     parser.add_argument(
@@ -44,6 +60,15 @@ def configure_parser(parser):
         default="gpt-3.5-turbo",
         help=_("Select the model to use for translation."),
     )
+    parser.add_argument(
+        "--fast-model",
+        metavar="MODEL",
+        help=_(
+            "Send every chunk to this cheaper, faster model first and escalate only the cues "
+            "that fail local checks (missing, wrong length, wrong script or language, altered "
+            "original text) to --model."
+        ),
+    )
     parser.add_argument(
         "--max-workers",
         type=int,
@@ -55,20 +80,468 @@ def configure_parser(parser):
         action="store_true",
         help=_("List available models and exit."),
     )
+    parser.add_argument(
+        "--translation-memory",
+        nargs="?",
+        const="default",
+        default=None,
+        metavar="PATH",
+        help=_(
+            "Reuse and record translations in a local translation memory. "
+            "Optionally give the path of the memory database."
+        ),
+    )
+    parser.add_argument(
+        "--tm-reuse-threshold",
+        type=float,
+        default=None,
+        help=_(
+            "Minimum similarity (0-1) for reusing a remembered translation without calling the LLM. "
+            "The default 1.0 only reuses lines that differ in punctuation, casing or numbers."
+        ),
+    )
+    parser.add_argument(
+        "--tm-hint-threshold",
+        type=float,
+        default=None,
+        help=_(
+            "Minimum similarity (0-1) for sending a remembered translation to the LLM as an example."
+        ),
+    )
+    parser.add_argument(
+        "--glossary",
+        choices=["off", "local", "llm"],
+        default="off",
+        help=_(
+            "Build a glossary of names and terms once per file and add it to every chunk prompt "
+            "so they are translated consistently. 'local' uses a capitalization and frequency "
+            "heuristic; 'llm' also asks the model for their translations with one extra request."
+        ),
+    )
+    parser.add_argument(
+        "--context-cues",
+        type=int,
+        default=0,
+        metavar="N",
+        help=_(
+            "Send N untranslated cues before and after each chunk as read-only context, "
+            "so lines at chunk boundaries are translated with their surroundings. "
+            "They count towards the chunk size. Default is 0."
+        ),
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=None,
+        metavar="P",
+        help=_(
+            "Send a duplicate request for a chunk that runs longer than the P-th percentile "
+            "of the chunk latencies seen so far, and use whichever answer arrives first (e.g., 95)."
+        ),
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.1,
+        help=_(
+            "Maximum number of duplicate requests, as a share of the number of chunks. Default is 0.1."
+        ),
+    )
+    parser.add_argument(
+        "--hedge-model",
+        help=_("Model for the duplicate requests. Defaults to --model."),
+    )
+    parser.add_argument(
+        "--local-model",
+        metavar="MODEL",
+        help=_(
+            "Translate with a local Hugging Face model (name or path) in this process instead of a remote API. "
+            "Requires the 'transformers' package."
+        ),
+    )
+    parser.add_argument(
+        "--local-device",
+        default="cpu",
+        help=_("Device for --local-model (e.g., cpu, cuda). Default is cpu."),
+    )
+    parser.add_argument(
+        "--local-batch-size",
+        type=int,
+        default=8,
+        help=_(
+            "Maximum number of chunk prompts the local model generates together. Default is 8."
+        ),
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=_(
+            "Submit all chunks as one job through the provider's batch API and wait for it to finish. "
+            "Slower, but usually cheaper and not bound by rate limits."
+        ),
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help=_("How often to check the status of a batch job. Default is 30 seconds."),
+    )
+    parser.add_argument(
+        "--batch-timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help=_(
+            "Cancel a batch job that has not finished after this many seconds and translate "
+            "its chunks synchronously instead. By default the batch is awaited until it ends."
+        ),
+    )
+    parser.add_argument(
+        "--no-skip-detection",
+        dest="skip_detection",
+        action="store_false",
+        help=_(
+            "Send every cue to the LLM, including music notes, sound tags, numbers "
+            "and lines already in the target language."
+        ),
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="deduplicate",
+        action="store_false",
+        help=_(
+            "Translate every occurrence of a repeated line separately instead of "
+            "translating it once and reusing the result."
+        ),
+    )
+    parser.add_argument(
+        "--job-store",
+        metavar="PATH",
+        help=_(
+            "Queue every chunk in this shared job store, where 'ai-subtitle worker' processes "
+            "on any node translate them."
+        ),
+    )
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        help=_(
+            "Adapt the number of concurrent requests and the chunk size to the provider "
+            "instead of using --max-workers, and remember them per endpoint and model."
+        ),
+    )
+    parser.add_argument(
+        "--structured-output",
+        choices=("auto", "schema", "tool", "off"),
+        default="auto",
+        help=_(
+            "How to make the model reply with valid JSON: 'schema' uses strict JSON schema output, "
+            "'tool' uses function calling, 'off' only asks for a JSON object, and 'auto' (default) "
+            "uses the first one the provider supports."
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        nargs="?",
+        const="",
+        metavar="PREVIOUS",
+        help=_(
+            "Re-translate only the cues that were inserted or edited since the previous bilingual "
+            "output PREVIOUS (default: the --output file). Unchanged cues keep their translations "
+            "with the new timings."
+        ),
+    )
+    parser.add_argument(
+        "--server",
+        help=_(
+            "URL of a running 'ai-subtitle serve' instance to submit the job to (e.g., http://127.0.0.1:8765)."
+        ),
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help=_("Job priority when using --server. Lower values run first."),
+    )
     parser.set_defaults(func=run)
 
 
+def read_srt_input(args):
+    """
+    Reads SRT content from the input file or stdin, exiting if neither is available.
+    """
+    if args.input_file:
+        with open(args.input_file, "r", encoding="utf-8") as f:
+            return f.read()
+    if not sys.stdin.isatty():
+        return sys.stdin.read()
+    print(
+        Fore.RED + _("Error: No input file provided and no data from stdin."),
+        file=sys.stderr,
+    )
+    print(Fore.YELLOW + _("Use --help for more information."), file=sys.stderr)
+    sys.exit(1)
+
+
+def parse_target_languages(value):
+    """
+    Splits the --target-language value into a list of languages.
+    """
+    languages = [lang.strip() for lang in value.split(",") if lang.strip()]
+    # 去除重复的语言，保持原有顺序
+    return list(dict.fromkeys(languages))
+
+
+def output_path_for_language(output, language):
+    """
+    Derives the per-language output path, e.g. movie.srt -> movie.Japanese.srt.
+    """
+    root, ext = os.path.splitext(output)
+    return f"{root}.{language.replace(' ', '_')}{ext or '.srt'}"
+
+
+def check_output_for_languages(args, languages):
+    """
+    Several target languages need an output path to derive file names from.
+    """
+    if len(languages) > 1 and not args.output:
+        print(
+            Fore.RED
+            + _("Error: --output is required when translating into several languages."),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+def check_fast_model(args):
+    """
+    --fast-model switches between two models per request, which a local
+    model loaded in this process cannot do.
+    """
+    if args.fast_model and args.local_model:
+        print(
+            Fore.RED
+            + _(
+                "Error: --fast-model needs an API backend; a local model cannot switch to another model."
+            ),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+def previous_output_paths(base, languages):
+    """The previous output file of every language for --incremental."""
+    if len(languages) > 1:
+        return {
+            language: output_path_for_language(base, language) for language in languages
+        }
+    return {languages[0]: base}
+
+
+def read_previous_outputs(args, languages):
+    """
+    Reads the previous bilingual output of every language for --incremental.
+    A missing file is not an error: that language is translated in full.
+    """
+    base = args.incremental or args.output
+    if not base:
+        print(
+            Fore.RED
+            + _("Error: --incremental needs the previous output file or --output."),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    previous = {}
+    for language, path in previous_output_paths(base, languages).items():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                previous[language] = f.read()
+        except FileNotFoundError:
+            print(
+                Fore.YELLOW
+                + _(
+                    "Warning: No previous output at {path}; translating every cue."
+                ).format(path=path),
+                file=sys.stderr,
+            )
+    return previous
+
+
+def _output_mode(path):
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextlib.contextmanager
+def open_output(path, atomic=False):
+    """
+    Opens path for writing. Cues are streamed to it as they arrive, so other
+    tools can read the beginning of the file while the rest is translated.
+
+    With atomic=True the content goes to a temporary file next to path that
+    is moved over path only when the block succeeds, so a failed or
+    interrupted translation leaves the previous output untouched.
+    """
+    if not atomic:
+        with open(path, "w", encoding="utf-8") as f:
+            yield f
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".part"
+    )
+    try:
+        # mkstemp 创建的文件只有所有者可读写，改为与普通输出文件相同的权限
+        os.chmod(tmp_path, _output_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _save_srt(path, output_srt):
+    with open_output(path, atomic=True) as f:
+        f.write(output_srt)
+
+
+def write_output(output, output_srt):
+    """
+    Writes the bilingual SRT to the output file or stdout.
+    """
+    if output:
+        _save_srt(output, output_srt)
+        print(
+            Fore.GREEN
+            + _("Bilingual SRT file saved to {output}").format(output=output),
+            file=sys.stderr,
+        )
+    else:
+        print(output_srt)
+
+
+def write_language_outputs(output, srt_by_language):
+    """
+    Writes one bilingual SRT per language in parallel.
+    """
+    paths = {
+        language: output_path_for_language(output, language)
+        for language in srt_by_language
+    }
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(srt_by_language)
+    ) as executor:
+        futures = [
+            executor.submit(_save_srt, paths[language], output_srt)
+            for language, output_srt in srt_by_language.items()
+        ]
+        for future in futures:
+            future.result()
+    for path in paths.values():
+        print(
+            Fore.GREEN + _("Bilingual SRT file saved to {output}").format(output=path),
+            file=sys.stderr,
+        )
+
+
+def run_via_server(args):
+    """
+    Sends the translate job to a running server instead of translating locally.
+    The server's own configuration supplies credentials unless overridden.
+    """
+    from ai_subtitle_assistant.core.server import run_remote_job
+
+    languages = parse_target_languages(args.target_language)
+    check_output_for_languages(args, languages)
+    check_fast_model(args)
+
+    try:
+        srt_content = read_srt_input(args)
+        params = {
+            "srt": srt_content,
+            "model": args.model,
+            "max_workers": args.max_workers,
+            "glossary_mode": args.glossary,
+            "context_cues": args.context_cues,
+            "hedge_percentile": args.hedge_percentile,
+            "hedge_budget": args.hedge_budget,
+            "hedge_model": args.hedge_model,
+            "fast_model": args.fast_model,
+            "batch": args.batch,
+            "local_model": args.local_model,
+            "local_device": args.local_device,
+            "local_batch_size": args.local_batch_size,
+            "batch_poll_interval": args.batch_poll_interval,
+            "batch_timeout": args.batch_timeout,
+            "skip_detection": args.skip_detection,
+            "deduplicate": args.deduplicate,
+            "autotune": args.autotune,
+            "structured_output": args.structured_output,
+        }
+        if len(languages) > 1:
+            params["target_languages"] = languages
+            params["combined"] = args.combined_languages
+        else:
+            params["target_language"] = languages[0]
+        if args.api_base_url:
+            params["api_base_url"] = args.api_base_url
+        if args.api_key:
+            params["api_key"] = args.api_key
+        if args.incremental is not None:
+            params["previous_srt"] = read_previous_outputs(args, languages)
+        result = run_remote_job(args.server, "translate", params, args.priority)
+        if "srt_by_language" in result:
+            write_language_outputs(args.output, result["srt_by_language"])
+        else:
+            write_output(args.output, result["srt"])
+    except FileNotFoundError:
+        print(
+            Fore.RED
+            + _("Error: The input file '{file}' was not found.").format(
+                file=args.input_file
+            ),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    except Exception as e:
+        print(
+            Fore.RED + _("An unexpected error occurred: {e}").format(e=e),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
 def run(args):
     """
     The main function for the translate command.
     """
-    config = load_config()
+    if args.server and not args.list_models:
+        run_via_server(args)
+        return
+
+    languages = parse_target_languages(args.target_language)
+    if not args.list_models:
+        check_output_for_languages(args, languages)
+        check_fast_model(args)
+
+    # 本地模型不需要 API 配置，避免触发交互式配置向导
+    config = None if args.local_model and not args.list_models else load_config()
 
     # Get API credentials
     api_base_url = args.api_base_url or get_config_value(config, "api_base_url")
     api_key = args.api_key or get_config_value(config, "api_key")
+    # 命令行指定了凭据时只使用该端点，否则使用配置中的 [endpoint:*] 列表
+    endpoints = None
+    if not (args.api_base_url or args.api_key):
+        endpoints = get_endpoint_configs(config) or None
 
-    if not api_key or not api_base_url:
+    if not args.local_model and not endpoints and (not api_key or not api_base_url):
         print(
             Fore.RED + _("Error: API Key and Base URL must be configured."),
             file=sys.stderr,
@@ -98,52 +571,160 @@ def run(args):
             )
         return
 
-    try:
-        # 1. Read SRT input
-        srt_content = ""
-        if args.input_file:
-            with open(args.input_file, "r", encoding="utf-8") as f:
-                srt_content = f.read()
-        elif not sys.stdin.isatty():
-            srt_content = sys.stdin.read()
-        else:
+    # 重量级依赖（openai、tqdm）只在命令真正执行时才导入
+    from ai_subtitle_assistant.core.translation import translate_segments_multi
+
+    # 分布式模式下由工作进程调用模型；接口地址和本地模型仅在命令行指定时随任务下发
+    job_store = None
+    job_params = {}
+    if args.job_store:
+        from ai_subtitle_assistant.core.job_store import JobStore
+
+        job_store = JobStore(args.job_store)
+        if args.api_base_url or args.api_key:
+            job_params.update(api_base_url=api_base_url)
+        if args.api_key:
+            # 密钥不写入共享的任务库，工作进程使用自己为该地址配置的密钥
             print(
-                Fore.RED + _("Error: No input file provided and no data from stdin."),
+                Fore.YELLOW
+                + _(
+                    "Warning: The job's API key is not stored in the shared job store; "
+                    "workers use the key they have configured for its API base URL "
+                    "or the {env} environment variable."
+                ).format(env=API_KEY_ENV),
+                file=sys.stderr,
+            )
+        if args.local_model:
+            job_params.update(
+                local_model=args.local_model,
+                local_device=args.local_device,
+                local_batch_size=args.local_batch_size,
+            )
+
+    backend = None
+    if args.local_model and (job_store is None or args.glossary == "llm"):
+        from ai_subtitle_assistant.core.backends import get_local_backend
+
+        try:
+            backend = get_local_backend(
+                args.local_model, args.local_device, args.local_batch_size
+            )
+        except Exception as e:
+            print(
+                Fore.RED
+                + _("Failed to load local model: {e}").format(e=e)
+                + Style.RESET_ALL,
                 file=sys.stderr,
             )
-            print(Fore.YELLOW + _("Use --help for more information."), file=sys.stderr)
             sys.exit(1)
 
+    translation_memory = None
+    if args.translation_memory:
+        from ai_subtitle_assistant.core.translation_memory import (
+            TranslationMemory,
+            DEFAULT_MEMORY_FILE,
+        )
+
+        translation_memory = TranslationMemory(
+            DEFAULT_MEMORY_FILE
+            if args.translation_memory == "default"
+            else args.translation_memory
+        )
+
+    try:
+        # 1. Read SRT input
+        srt_content = read_srt_input(args)
+
         # 2. Parse SRT content into segments
         segments = parse_srt(srt_content)
         if not segments:
             print(Fore.RED + _("Error: Could not parse SRT content."), file=sys.stderr)
             sys.exit(1)
 
-        # 3. Translate segments
-        bilingual_subtitles = translate_segments(
-            segments,
-            args.target_language,
-            api_base_url,
-            api_key,
-            args.model,
-            args.max_workers,
-        )
+        # 读取上一次的输出，必须在打开（清空）输出文件之前
+        previous = None
+        if args.incremental is not None:
+            from ai_subtitle_assistant.core.incremental import parse_bilingual_srt
 
-        # 4. Convert to bilingual SRT format
-        output_srt = to_bilingual_srt(bilingual_subtitles)
+            previous = {
+                language: parse_bilingual_srt(content, segments)
+                for language, content in read_previous_outputs(args, languages).items()
+            }
 
-        # 5. Output
-        if args.output:
-            with open(args.output, "w", encoding="utf-8") as f:
-                f.write(output_srt)
-            print(
-                Fore.GREEN
-                + _("Bilingual SRT file saved to {output}").format(output=args.output),
-                file=sys.stderr,
-            )
+        # 3. Open one ordered writer per language
+        if len(languages) > 1:
+            paths = {
+                language: output_path_for_language(args.output, language)
+                for language in languages
+            }
         else:
-            print(output_srt)
+            paths = {languages[0]: args.output}
+        overwritten = set()
+        if args.incremental is not None:
+            # 覆盖上一次的输出时，翻译成功后才替换它，失败时保留上一次的结果
+            for language, path in previous_output_paths(
+                args.incremental or args.output, languages
+            ).items():
+                if paths[language] and os.path.abspath(path) == os.path.abspath(
+                    paths[language]
+                ):
+                    overwritten.add(language)
+
+        with contextlib.ExitStack() as stack:
+            writers = {}
+            for language, path in paths.items():
+                stream = (
+                    stack.enter_context(
+                        open_output(path, atomic=language in overwritten)
+                    )
+                    if path
+                    else sys.stdout
+                )
+                writers[language] = OrderedBilingualWriter(stream)
+
+            # 4. Translate segments, writing each chunk once every earlier chunk is done
+            translate_segments_multi(
+                segments,
+                languages,
+                api_base_url,
+                api_key,
+                args.model,
+                args.max_workers,
+                combined=args.combined_languages,
+                translation_memory=translation_memory,
+                tm_reuse_threshold=args.tm_reuse_threshold,
+                tm_hint_threshold=args.tm_hint_threshold,
+                glossary_mode=args.glossary,
+                context_cues=args.context_cues,
+                hedge_percentile=args.hedge_percentile,
+                hedge_budget=args.hedge_budget,
+                hedge_model=args.hedge_model,
+                fast_model=args.fast_model,
+                endpoints=endpoints,
+                backend=backend,
+                batch=args.batch,
+                batch_poll_interval=args.batch_poll_interval,
+                batch_timeout=args.batch_timeout,
+                skip_detection=args.skip_detection,
+                deduplicate=args.deduplicate,
+                autotune=args.autotune,
+                structured_output=args.structured_output,
+                job_store=job_store,
+                job_params=job_params,
+                previous=previous,
+                on_chunk=lambda language, position, subtitles: writers[language].add(
+                    position, subtitles
+                ),
+            )
+
+        # 5. Report the written files
+        for path in paths.values():
+            if path:
+                print(
+                    Fore.GREEN
+                    + _("Bilingual SRT file saved to {output}").format(output=path),
+                    file=sys.stderr,
+                )
 
     except FileNotFoundError:
         print(
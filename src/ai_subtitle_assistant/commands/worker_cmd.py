@@ -0,0 +1,111 @@
+import configparser
+import os
+import sys
+from ai_subtitle_assistant.config import (
+    get_config_value,
+    get_endpoint_configs,
+    CONFIG_FILE,
+)
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+JOB_TYPES = ("transcribe", "translate", "translate_chunk", "transcribe_window")
+
+
+def configure_parser(parser):
+    """
+    Configures the parser for the worker command.
+    """
+    parser.add_argument(
+        "job_store",
+        help=_(
+            "Path of the shared job store database (e.g., on a network filesystem)."
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=_("Number of jobs this worker runs at the same time."),
+    )
+    parser.add_argument(
+        "--types",
+        default=",".join(JOB_TYPES),
+        help=_(
+            "Comma-separated job types this worker accepts. Default is all: {types}."
+        ).format(types=", ".join(JOB_TYPES)),
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=60,
+        help=_(
+            "How long a claimed job stays reserved without a heartbeat before another worker may take it over."
+        ),
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help=_("Seconds to wait before checking an empty job store again."),
+    )
+    parser.add_argument(
+        "--preload-model",
+        action="append",
+        default=[],
+        help=_("Whisper model to load at startup. Can be given multiple times."),
+    )
+    parser.set_defaults(func=run)
+
+
+def run(args):
+    """
+    The main function for the worker command.
+    """
+    from ai_subtitle_assistant.core.job_store import JobStore, run_worker
+    from ai_subtitle_assistant.core.server import job_runners
+
+    job_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    unknown = [t for t in job_types if t not in JOB_TYPES]
+    if unknown:
+        print(
+            Fore.RED + _("Unknown job type: {type}").format(type=", ".join(unknown)),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # 与 serve 相同：工作进程不能交互式地创建配置，只读取已存在的配置文件
+    config = configparser.ConfigParser()
+    if os.path.exists(CONFIG_FILE):
+        config.read(CONFIG_FILE, encoding="utf-8")
+    defaults = {
+        "api_base_url": get_config_value(config, "api_base_url"),
+        "api_key": get_config_value(config, "api_key"),
+        "endpoints": get_endpoint_configs(config),
+    }
+
+    if args.preload_model:
+        from ai_subtitle_assistant.core.transcription import load_model
+
+        for model_name in args.preload_model:
+            load_model(model_name)
+
+    store = JobStore(args.job_store)
+    print(
+        Fore.GREEN
+        + _("Worker waiting for {types} jobs in {store}").format(
+            types=", ".join(job_types), store=args.job_store
+        )
+        + Style.RESET_ALL,
+        file=sys.stderr,
+    )
+    run_worker(
+        store,
+        job_runners(job_types),
+        defaults=defaults,
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+    )
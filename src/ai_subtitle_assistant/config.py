@@ -10,6 +10,18 @@ APP_NAME = "ai-subtitle"
 CONFIG_DIR = user_config_dir(APP_NAME, "Lumos")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.ini")
 
+# Sections named [endpoint:NAME] define additional LLM endpoints
+ENDPOINT_SECTION_PREFIX = "endpoint:"
+
+# Workers of a shared job store read the API key for job-level endpoints
+# from this environment variable, since keys are never stored with jobs
+API_KEY_ENV = "AI_SUBTITLE_API_KEY"
+
+# Defaults for the `serve` command's job server
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+DEFAULT_SERVER_QUEUE_SIZE = 32
+
 
 def load_config():
     """Loads the configuration from the config file."""
@@ -93,3 +105,28 @@ def get_config_value(config, key, default=None):
     if config and "DEFAULT" in config:
         return config["DEFAULT"].get(key, default)
     return default
+
+
+def get_endpoint_configs(config):
+    """
+    Returns the LLM endpoints configured as [endpoint:NAME] sections, each a
+    dict with name, api_base_url, api_key, model and weight. Keys missing in
+    a section fall back to the DEFAULT section.
+    """
+    endpoints = []
+    if not config:
+        return endpoints
+    for section in config.sections():
+        if not section.startswith(ENDPOINT_SECTION_PREFIX):
+            continue
+        values = config[section]
+        endpoints.append(
+            {
+                "name": section[len(ENDPOINT_SECTION_PREFIX) :].strip(),
+                "api_base_url": values.get("api_base_url"),
+                "api_key": values.get("api_key"),
+                "model": values.get("model"),
+                "weight": values.getfloat("weight", fallback=1.0),
+            }
+        )
+    return endpoints
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import tempfile
+import threading
+import numpy as np
+from platformdirs import user_cache_dir
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+APP_NAME = "ai-subtitle"
+AUDIO_CACHE_DIR = os.path.join(user_cache_dir(APP_NAME, "Lumos"), "audio")
+
+# Whisper 需要 16 kHz 单声道 float32 音频；按此格式缓存即可直接映射给模型使用
+SAMPLE_RATE = 16000
+PCM_DTYPE = np.float32
+PCM_FORMAT = "f32le"
+HASH_BLOCK_SIZE = 1 << 20
+# 缓存目录的大小上限（GB），超出时删除最久未使用的文件；一小时的音频约 230 MB
+DEFAULT_MAX_CACHE_GB = 10
+
+# 文件内容哈希缓存，键为 (路径, 大小, 修改时间)，避免常驻服务重复读取整个文件
+_hash_cache = {}
+_hash_cache_lock = threading.Lock()
+
+
+def content_hash(path):
+    """Returns the SHA-256 of a file's content."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_cache_lock:
+        digest = _hash_cache.get(key)
+    if digest is not None:
+        return digest
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+    with _hash_cache_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+def _cache_path(digest):
+    return os.path.join(AUDIO_CACHE_DIR, f"{digest}.{PCM_FORMAT}")
+
+
+def max_cache_bytes():
+    """The cache size cap in bytes, from AI_SUBTITLE_AUDIO_CACHE_MAX_GB."""
+    value = os.environ.get("AI_SUBTITLE_AUDIO_CACHE_MAX_GB")
+    try:
+        gigabytes = float(value) if value else DEFAULT_MAX_CACHE_GB
+    except ValueError:
+        gigabytes = DEFAULT_MAX_CACHE_GB
+    return int(gigabytes * (1 << 30))
+
+
+def prune_cache(max_bytes=None, keep=None):
+    """
+    Deletes the least recently used cached files until the cache is at most
+    max_bytes (default max_cache_bytes()); keep is never deleted. Returns
+    the number of bytes freed.
+    """
+    if max_bytes is None:
+        max_bytes = max_cache_bytes()
+    entries = []
+    try:
+        names = os.listdir(AUDIO_CACHE_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if not name.endswith(f".{PCM_FORMAT}"):
+            continue
+        path = os.path.join(AUDIO_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _mtime, size, _path in entries)
+    freed = 0
+    # 命中缓存时会更新修改时间，修改时间最早的即最久未使用的
+    for _mtime, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            # 其他进程仍映射着的文件在 POSIX 上可以删除，映射保持有效
+            os.remove(path)
+        except OSError:
+            continue
+        freed += size
+    if freed:
+        metrics.increment("audio_cache_evicted_bytes", freed)
+        logger.debug(f"音频缓存超出上限，已删除 {freed} 字节")
+    return freed
+
+
+def _decode(audio_file, path):
+    """Decodes the audio track to raw mono PCM at SAMPLE_RATE, written atomically to path."""
+    import ffmpeg
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先写入临时文件再改名，并行的进程不会读到写了一半的缓存
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        with metrics.stage("ffmpeg.decode_audio"):
+            (
+                ffmpeg.input(audio_file, threads=0)
+                .output(tmp_path, format=PCM_FORMAT, ac=1, ar=SAMPLE_RATE)
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        os.replace(tmp_path, path)
+    except ffmpeg.Error as e:
+        os.remove(tmp_path)
+        raise RuntimeError(
+            _("Failed to decode audio: {error}").format(
+                error=e.stderr.decode(errors="ignore")
+            )
+        )
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_pcm(audio_file):
+    """
+    Returns the file's audio as 16 kHz mono float32 samples. The decoded PCM
+    is cached as a raw file keyed by the content hash and mapped with
+    numpy.memmap, so later runs and parallel workers share the pages instead
+    of decoding again. The mapping is copy-on-write: writes stay private.
+    Each use marks the file as recently used; after decoding a new file the
+    least recently used ones are deleted to keep the cache under
+    max_cache_bytes().
+    """
+    with metrics.stage("transcribe.hash_audio"):
+        path = _cache_path(content_hash(audio_file))
+    cached = os.path.exists(path)
+    metrics.record_cache("decoded_audio", cached)
+    if not cached:
+        logger.info(
+            _("Decoding audio of '{file}'...").format(file=audio_file),
+            extra={"color": Fore.BLUE},
+        )
+        _decode(audio_file, path)
+        prune_cache(keep=path)
+    else:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=PCM_DTYPE)
+    return np.memmap(path, dtype=PCM_DTYPE, mode="c")
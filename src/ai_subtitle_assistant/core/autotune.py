@@ -0,0 +1,241 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from platformdirs import user_data_dir
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+
+logger = get_logger(__name__)
+
+APP_NAME = "ai-subtitle"
+DEFAULT_STATE_FILE = os.path.join(user_data_dir(APP_NAME, "Lumos"), "autotune.json")
+
+# 没有保存的设置时从保守的值开始
+INITIAL_WORKERS = 2
+INITIAL_CHUNK_SIZE = 4000
+MIN_WORKERS = 1
+MAX_WORKERS = 32
+MIN_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 32000
+# 加性增加：每一轮（与当前并发数相同的成功请求数）都健康时的增量
+WORKERS_STEP = 1
+CHUNK_SIZE_STEP = 1000
+# 乘性减少
+DECREASE_FACTOR = 0.5
+# 每字符延迟超过本次运行最佳值的多少倍时视为不健康，停止增加
+LATENCY_TOLERANCE = 2.0
+
+# 按 (端点, 模型) 缓存的调节器，使常驻服务在多个任务之间延续学到的设置
+_tuner_cache = {}
+_tuner_cache_lock = threading.Lock()
+
+
+def classify_error(error, finish_reason=None):
+    """
+    Returns the back-off reason for a failed request: "rate_limit",
+    "timeout", "truncated" (the reply stopped at the output limit, as told
+    by finish_reason, or ended inside unterminated JSON), "malformed" (a
+    reply of the wrong structure), or None for errors that say nothing
+    about load.
+    """
+    import openai
+    from ai_subtitle_assistant.core.json_repair import TruncatedJSONError
+
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "rate_limit"
+    if finish_reason == "length" or isinstance(error, TruncatedJSONError):
+        return "truncated"
+    # 结构不符（缺少字段、不是 JSON 等）与块大小无关，不缩小块
+    if isinstance(error, ValueError):
+        return "malformed"
+    return None
+
+
+class Autotuner:
+    """
+    Adapts the number of concurrent requests and the chunk size to one
+    endpoint and model with an AIMD rule. After every round of successful
+    requests (as many as the current concurrency) whose latency per
+    character stays within LATENCY_TOLERANCE of the best seen in this run,
+    both grow by a step. A 429 or a timeout halves the concurrency, a
+    timeout or a truncated response halves the chunk size; requests that
+    started before the last decrease do not decrease again. A malformed
+    reply decreases nothing but keeps the current round from growing.
+    """
+
+    def __init__(
+        self,
+        key,
+        max_workers=INITIAL_WORKERS,
+        chunk_size=INITIAL_CHUNK_SIZE,
+        path=DEFAULT_STATE_FILE,
+    ):
+        self.key = key
+        self.path = path
+        self.max_workers = min(MAX_WORKERS, max(MIN_WORKERS, int(max_workers)))
+        self.chunk_size = min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, int(chunk_size)))
+        self._lock = threading.Lock()
+        self._best_latency = None
+        self._round_successes = 0
+        self._round_healthy = True
+        self._last_decrease = None
+
+    def record_success(self, started_at, seconds, chars):
+        """Records a successful request started at started_at (time.monotonic())."""
+        latency = seconds / max(chars, 1)
+        with self._lock:
+            if self._best_latency is None or latency < self._best_latency:
+                self._best_latency = latency
+            if latency > LATENCY_TOLERANCE * self._best_latency:
+                self._round_healthy = False
+            self._round_successes += 1
+            if self._round_successes < self.max_workers:
+                return
+            healthy = self._round_healthy
+            self._round_successes = 0
+            self._round_healthy = True
+            if not healthy:
+                return
+            self.max_workers = min(MAX_WORKERS, self.max_workers + WORKERS_STEP)
+            self.chunk_size = min(MAX_CHUNK_SIZE, self.chunk_size + CHUNK_SIZE_STEP)
+            max_workers, chunk_size = self.max_workers, self.chunk_size
+        metrics.increment("autotune_increases")
+        logger.debug(f"自动调节：并发增加到 {max_workers}，块大小 {chunk_size}")
+
+    def record_failure(self, started_at, reason):
+        """Backs off for a request that failed with a classify_error() reason."""
+        if reason is None:
+            return
+        if reason == "malformed":
+            with self._lock:
+                self._round_healthy = False
+            return
+        with self._lock:
+            if self._last_decrease is not None and started_at < self._last_decrease:
+                return
+            if reason in ("rate_limit", "timeout"):
+                self.max_workers = max(
+                    MIN_WORKERS, int(self.max_workers * DECREASE_FACTOR)
+                )
+            if reason in ("timeout", "truncated"):
+                self.chunk_size = max(
+                    MIN_CHUNK_SIZE, int(self.chunk_size * DECREASE_FACTOR)
+                )
+            self._last_decrease = time.monotonic()
+            self._round_successes = 0
+            self._round_healthy = True
+            max_workers, chunk_size = self.max_workers, self.chunk_size
+        metrics.increment("autotune_decreases", labels={"reason": reason})
+        logger.debug(
+            f"自动调节：{reason}，并发降低到 {max_workers}，块大小 {chunk_size}"
+        )
+
+    def save(self):
+        """Stores the current settings for this key, keeping other keys' settings."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            settings = {
+                "max_workers": self.max_workers,
+                "chunk_size": self.chunk_size,
+                "updated_at": time.time(),
+            }
+        state = _load_state(self.path)
+        state[self.key] = settings
+        # 先写入临时文件再改名，避免并行的运行读到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=directory or None, suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def _load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def tuner_key(endpoints, model):
+    """The key learned settings are saved under: the endpoints and the model."""
+    return "|".join(sorted(endpoints) + [model])
+
+
+class TunerGroup:
+    """
+    Tunes every endpoint of a pool separately: one Autotuner per (endpoint,
+    model), so a rate limit or a slow reply from one provider only backs off
+    that provider. targets are the (endpoint, model) pairs the run's
+    requests go to. The run's concurrency is the sum of their concurrency
+    and its chunk size the smallest of their chunk sizes, since a chunk may
+    be sent to any endpoint. Requests for other models (hedges,
+    escalations) are tuned under their own keys.
+    """
+
+    def __init__(self, targets, path=DEFAULT_STATE_FILE):
+        self.targets = list(targets)
+        self.path = path
+        self.worker_limit = MAX_WORKERS * len(self.targets)
+        self._used = {}
+        for endpoint, model in self.targets:
+            self.tuner(endpoint, model)
+
+    def tuner(self, endpoint, model):
+        """Returns the Autotuner of an endpoint (as in describe()) and model."""
+        key = (endpoint, model)
+        tuner = self._used.get(key)
+        if tuner is None:
+            tuner = get_tuner(tuner_key([endpoint], model), self.path)
+            self._used[key] = tuner
+        return tuner
+
+    @property
+    def max_workers(self):
+        return sum(self.tuner(*target).max_workers for target in self.targets)
+
+    @property
+    def chunk_size(self):
+        return min(self.tuner(*target).chunk_size for target in self.targets)
+
+    def record_success(self, started_at, seconds, chars, target):
+        """target is the (endpoint, model) that answered, or None if unknown."""
+        if target is not None:
+            self.tuner(*target).record_success(started_at, seconds, chars)
+
+    def record_failure(self, started_at, reason, target):
+        if target is not None:
+            self.tuner(*target).record_failure(started_at, reason)
+
+    def save(self):
+        """Stores the settings of every (endpoint, model) used in this run."""
+        for tuner in list(self._used.values()):
+            tuner.save()
+
+
+def get_tuner(key, path=DEFAULT_STATE_FILE):
+    """Returns the Autotuner for a key, starting from its saved settings if any."""
+    with _tuner_cache_lock:
+        tuner = _tuner_cache.get((path, key))
+        if tuner is None:
+            saved = _load_state(path).get(key) or {}
+            tuner = Autotuner(
+                key,
+                saved.get("max_workers", INITIAL_WORKERS),
+                saved.get("chunk_size", INITIAL_CHUNK_SIZE),
+                path,
+            )
+            _tuner_cache[(path, key)] = tuner
+        return tuner
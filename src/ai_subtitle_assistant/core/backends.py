@@ -0,0 +1,381 @@
+import queue
+import threading
+import time
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+DEFAULT_LOCAL_DEVICE = "cpu"
+DEFAULT_LOCAL_BATCH_SIZE = 8
+# 收集同一批请求时最多等待的时间（秒）
+DEFAULT_LOCAL_BATCH_WAIT = 0.05
+DEFAULT_LOCAL_MAX_NEW_TOKENS = 4096
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+# 结构化输出方式："schema" 使用严格的 JSON Schema，"tool" 使用函数调用，
+# "off" 只要求 JSON 对象；"auto" 按此顺序尝试服务商支持的第一种方式
+STRUCTURED_OUTPUT_MODES = ("auto", "schema", "tool", "off")
+_AUTO_STRUCTURED_OUTPUT = ("schema", "tool", "off")
+# 只有错误信息提到这些参数时，才认为服务商不支持该结构化输出方式
+_STRUCTURED_OUTPUT_PARAMETERS = (
+    "response_format",
+    "json_schema",
+    "json_object",
+    "tools",
+    "tool_choice",
+)
+
+# 已加载的本地模型缓存，供常驻服务复用
+_local_backend_cache = {}
+_local_backend_cache_lock = threading.Lock()
+
+
+def _structured_output_options(mode, schema):
+    """The chat.completions.create() arguments that request output matching schema."""
+    if mode == "schema":
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": dict(schema, strict=True),
+            }
+        }
+    if mode == "tool":
+        return {
+            "tools": [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": schema["name"],
+                        "description": schema.get("description", ""),
+                        "parameters": schema["schema"],
+                        "strict": True,
+                    },
+                }
+            ],
+            "tool_choice": {"type": "function", "function": {"name": schema["name"]}},
+        }
+    return {"response_format": {"type": "json_object"}}
+
+
+def _rejects_structured_output(error):
+    """
+    Whether a 400/422 error is about the structured output parameters,
+    rather than e.g. the context length, the model name or a content filter.
+    """
+    text = str(getattr(error, "body", None) or "") + " " + str(error)
+    return any(keyword in text for keyword in _STRUCTURED_OUTPUT_PARAMETERS)
+
+
+def _reply_content(response, mode):
+    message = response.choices[0].message
+    if mode == "tool" and message.tool_calls:
+        return message.tool_calls[0].function.arguments
+    return message.content
+
+
+def _describe_endpoint(endpoint):
+    return f"{endpoint.name} {endpoint.api_base_url}"
+
+
+class RemoteBackend:
+    """
+    Sends chat completions to the OpenAI-compatible endpoints of an
+    EndpointPool. An endpoint's own model replaces the run's main model
+    (`model`, i.e. --model), but a request for any other model, such as
+    --fast-model or --hedge-model, is sent with the model it names.
+
+    When a request passes a JSON schema, structured_output (one of
+    STRUCTURED_OUTPUT_MODES) selects how the reply is constrained to it.
+    With "auto", an endpoint that rejects a mode with HTTP 400 or 422 whose
+    error names the structured output parameters (response_format,
+    json_schema, tools) is asked again with the next one, and remembers the
+    mode that worked; any other 400 or 422 is raised unchanged.
+    """
+
+    name = "remote"
+
+    def __init__(self, pool, structured_output="off", model=None):
+        self.pool = pool
+        self.structured_output = structured_output
+        self.model = model
+        # 每个线程最近一次请求发往的 (端点, 模型) 及回复的结束原因，供自动调节按端点记录
+        self._last_target = threading.local()
+        self._last_finish_reason = threading.local()
+
+    def resolve_model(self, endpoint, model):
+        """The model to request from endpoint when the caller asks for model."""
+        if endpoint.model and (self.model is None or model == self.model):
+            return endpoint.model
+        return model
+
+    def describe(self):
+        return [_describe_endpoint(e) for e in self.pool.endpoints]
+
+    def targets(self, model):
+        """The (endpoint, model) pairs that requests for model are sent to."""
+        return [
+            (_describe_endpoint(e), self.resolve_model(e, model))
+            for e in self.pool.endpoints
+        ]
+
+    def last_target(self):
+        """The (endpoint, model) of this thread's latest request, as in describe()."""
+        return getattr(self._last_target, "value", None)
+
+    def last_finish_reason(self):
+        """The finish_reason of this thread's latest reply, e.g. "length"."""
+        return getattr(self._last_finish_reason, "value", None)
+
+    def _mode(self, endpoint, schema):
+        if schema is None:
+            return "off"
+        if self.structured_output == "auto":
+            return endpoint.structured_output or _AUTO_STRUCTURED_OUTPUT[0]
+        return self.structured_output
+
+    def complete(
+        self, system_prompt, prompt, model, temperature=0.7, labels=None, schema=None
+    ):
+        """
+        Returns the text of the model's reply; raises on API errors. schema is
+        {"name": ..., "schema": <JSON schema>} for a structured reply.
+        """
+        import openai
+
+        self._last_target.value = None
+        self._last_finish_reason.value = None
+        endpoint = self.pool.acquire()
+        request_model = self.resolve_model(endpoint, model)
+        self._last_target.value = (_describe_endpoint(endpoint), request_model)
+        labels = dict(labels or {}, model=request_model, endpoint=endpoint.name)
+        metrics.increment("llm_requests", labels=labels)
+        request_start = time.perf_counter()
+        mode = self._mode(endpoint, schema)
+        while True:
+            try:
+                with metrics.stage("translate.llm_request"):
+                    response = endpoint.client.chat.completions.create(
+                        model=request_model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt},
+                        ],
+                        temperature=temperature,
+                        **_structured_output_options(mode, schema),
+                    )
+                break
+            except (openai.BadRequestError, openai.UnprocessableEntityError) as e:
+                if (
+                    self.structured_output != "auto"
+                    or mode == "off"
+                    or not _rejects_structured_output(e)
+                ):
+                    self.pool.release(endpoint, success=False)
+                    raise
+                # 服务商不支持这种结构化输出，改用下一种方式并记住
+                fallback = _AUTO_STRUCTURED_OUTPUT[
+                    _AUTO_STRUCTURED_OUTPUT.index(mode) + 1
+                ]
+                known = endpoint.structured_output
+                if known is not None and _AUTO_STRUCTURED_OUTPUT.index(
+                    known
+                ) >= _AUTO_STRUCTURED_OUTPUT.index(fallback):
+                    # 并发的请求已经完成了回退
+                    mode = known
+                    continue
+                mode = fallback
+                endpoint.structured_output = mode
+                metrics.increment(
+                    "structured_output_fallbacks",
+                    labels={"endpoint": endpoint.name, "mode": mode},
+                )
+                logger.warning(
+                    _(
+                        "Endpoint '{name}' rejected the structured output request ({e}); using '{mode}' instead."
+                    ).format(name=endpoint.name, e=e, mode=mode)
+                )
+            except Exception:
+                self.pool.release(endpoint, success=False)
+                raise
+        request_seconds = time.perf_counter() - request_start
+        self.pool.release(endpoint, request_seconds)
+        metrics.observe("llm_request_seconds", request_seconds, labels=labels)
+        metrics.record_usage(getattr(response, "usage", None), labels=labels)
+        self._last_finish_reason.value = response.choices[0].finish_reason
+        return _reply_content(response, mode)
+
+
+def _extract_json(text):
+    """Cuts the JSON object out of a local model's reply (which may add prose or code fences)."""
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        return text
+    return text[start : end + 1]
+
+
+class LocalBackend:
+    """
+    Runs a Hugging Face causal language model in this process, by default on
+    the CPU. Prompts from concurrent chunks are queued and generated together:
+    a single worker takes up to max_batch_size waiting prompts at a time, so
+    prompts that arrive while a batch is running form the next batch.
+    Generation is greedy, so `temperature` is ignored.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_name,
+        device=DEFAULT_LOCAL_DEVICE,
+        max_batch_size=DEFAULT_LOCAL_BATCH_SIZE,
+        batch_wait=DEFAULT_LOCAL_BATCH_WAIT,
+        max_new_tokens=DEFAULT_LOCAL_MAX_NEW_TOKENS,
+    ):
+        try:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+        except ImportError:
+            raise RuntimeError(
+                _(
+                    "Local translation needs the 'transformers' package. Install it with: pip install transformers"
+                )
+            )
+
+        self.model_name = model_name
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.max_new_tokens = max_new_tokens
+        # 输出到 stderr：未指定 -o 时 stdout 是字幕内容
+        logger.info(
+            _("Loading local model '{model_name}'...").format(model_name=model_name),
+            extra={"color": Fore.BLUE},
+        )
+        with metrics.stage("translate.load_local_model"):
+            self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+            # 批量生成时在左侧补齐，使所有序列的末尾对齐
+            self._tokenizer.padding_side = "left"
+            if self._tokenizer.pad_token is None:
+                self._tokenizer.pad_token = self._tokenizer.eos_token
+            self._model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+            self._model.eval()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def describe(self):
+        return [f"local {self.model_name} ({self.device})"]
+
+    def complete(
+        self,
+        system_prompt,
+        prompt,
+        model=None,
+        temperature=0.7,
+        labels=None,
+        schema=None,
+    ):
+        """
+        Queues the prompt for the next batch and waits for its reply. model
+        is ignored: the loaded model answers every request. schema is
+        ignored; the reply is cut down to its JSON object instead.
+        """
+        labels = dict(labels or {}, model=self.model_name, endpoint="local")
+        metrics.increment("llm_requests", labels=labels)
+        request = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            "done": threading.Event(),
+            "result": None,
+            "error": None,
+        }
+        request_start = time.perf_counter()
+        self._queue.put(request)
+        request["done"].wait()
+        metrics.observe(
+            "llm_request_seconds", time.perf_counter() - request_start, labels=labels
+        )
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+            try:
+                for request, result in zip(batch, self._generate(batch)):
+                    request["result"] = result
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            finally:
+                for request in batch:
+                    request["done"].set()
+
+    def _generate(self, batch):
+        import torch
+
+        texts = [
+            self._tokenizer.apply_chat_template(
+                request["messages"], tokenize=False, add_generation_prompt=True
+            )
+            for request in batch
+        ]
+        inputs = self._tokenizer(texts, return_tensors="pt", padding=True).to(
+            self.device
+        )
+        metrics.observe("local_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        with torch.no_grad(), metrics.stage("translate.local_generate"):
+            output_ids = self._model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                pad_token_id=self._tokenizer.pad_token_id,
+            )
+        new_tokens = output_ids[:, inputs["input_ids"].shape[1] :]
+        labels = {"model": self.model_name, "endpoint": "local"}
+        metrics.increment(
+            "prompt_tokens", int(inputs["attention_mask"].sum()), labels=labels
+        )
+        metrics.increment(
+            "completion_tokens",
+            int((new_tokens != self._tokenizer.pad_token_id).sum()),
+            labels=labels,
+        )
+        return [
+            _extract_json(text)
+            for text in self._tokenizer.batch_decode(
+                new_tokens, skip_special_tokens=True
+            )
+        ]
+
+
+def get_local_backend(
+    model_name,
+    device=DEFAULT_LOCAL_DEVICE,
+    max_batch_size=DEFAULT_LOCAL_BATCH_SIZE,
+):
+    """Loads a LocalBackend, reusing an already loaded instance when possible."""
+    key = (model_name, device, max_batch_size)
+    with _local_backend_cache_lock:
+        backend = _local_backend_cache.get(key)
+        metrics.record_cache("local_model", backend is not None)
+        if backend is None:
+            backend = LocalBackend(model_name, device, max_batch_size)
+            _local_backend_cache[key] = backend
+        return backend
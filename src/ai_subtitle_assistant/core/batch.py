@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import time
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_INTERVAL = 30  # seconds
+_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_file(path, requests):
+    """Writes (custom_id, body) pairs as a JSONL batch request file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests:
+            f.write(
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": body,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+
+
+def submit_batch(client, path):
+    """Uploads a batch request file and creates the batch. Returns the batch."""
+    with open(path, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+
+
+def wait_for_batch(client, batch_id, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None):
+    """
+    Polls the batch until it reaches a final status and returns it. Raises
+    TimeoutError if it is still running after timeout seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last_status = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        status = (
+            batch.status,
+            counts.completed if counts else None,
+            counts.failed if counts else None,
+        )
+        if status != last_status:
+            logger.info(
+                _("Batch {id}: {status} ({completed}/{total} done)").format(
+                    id=batch_id,
+                    status=batch.status,
+                    completed=counts.completed if counts else 0,
+                    total=counts.total if counts else "?",
+                ),
+                extra={"color": Fore.CYAN},
+            )
+            last_status = status
+        if batch.status in _FINAL_STATUSES:
+            return batch
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    _("Batch {id} did not finish within {seconds} seconds.").format(
+                        id=batch_id, seconds=timeout
+                    )
+                )
+            time.sleep(min(poll_interval, remaining))
+        else:
+            time.sleep(poll_interval)
+
+
+def read_batch_output(client, batch):
+    """
+    Returns {custom_id: response body} for the requests that succeeded.
+    Failed requests are left out.
+    """
+    responses = {}
+    if not batch.output_file_id:
+        return responses
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            continue
+        responses[record["custom_id"]] = response.get("body")
+    return responses
+
+
+def cancel_batch(client, batch_id):
+    """Asks the provider to cancel a batch; failures are only logged."""
+    try:
+        client.batches.cancel(batch_id)
+    except Exception as e:
+        logger.warning(
+            _("Warning: Could not cancel batch {id}: {e}").format(id=batch_id, e=e)
+        )
+        return
+    metrics.increment("batch_cancellations")
+    logger.warning(
+        _("Cancelled batch {id}.").format(id=batch_id), extra={"color": Fore.YELLOW}
+    )
+
+
+def run_batch(client, requests, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None):
+    """
+    Sends (custom_id, body) chat completion requests through the provider's
+    batch API, waits for the batch to finish and returns the successful
+    response bodies by custom_id. If waiting fails, times out (timeout in
+    seconds) or is interrupted, the batch is cancelled so that the provider
+    stops working on it, and the error is raised.
+    """
+    fd, path = tempfile.mkstemp(prefix="ai-subtitle-batch-", suffix=".jsonl")
+    os.close(fd)
+    try:
+        write_batch_file(path, requests)
+        with metrics.stage("translate.batch_submit"):
+            batch = submit_batch(client, path)
+        metrics.increment("batch_requests", len(requests))
+        logger.info(
+            _("Submitted batch {id} with {count} requests.").format(
+                id=batch.id, count=len(requests)
+            ),
+            extra={"color": Fore.CYAN},
+        )
+        try:
+            with metrics.stage("translate.batch_wait"):
+                batch = wait_for_batch(client, batch.id, poll_interval, timeout)
+        except BaseException:
+            # 包括 Ctrl-C：不再等待的批处理仍会在服务商处运行并计费
+            cancel_batch(client, batch.id)
+            raise
+        if batch.status != "completed":
+            logger.warning(
+                _("Warning: Batch {id} ended with status '{status}'.").format(
+                    id=batch.id, status=batch.status
+                )
+            )
+        return read_batch_output(client, batch)
+    finally:
+        os.remove(path)
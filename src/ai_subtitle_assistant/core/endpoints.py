@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+# 连续失败多少次后打开熔断器
+FAILURE_THRESHOLD = 3
+# 熔断器打开后，至少等待多久才进行健康检查（秒）
+OPEN_SECONDS = 30
+HEALTH_CHECK_INTERVAL = 10  # seconds
+HEALTH_CHECK_TIMEOUT = 10  # seconds
+# 延迟的指数加权移动平均系数
+LATENCY_EWMA_ALPHA = 0.3
+# 尚无延迟数据的端点按此延迟估算（秒）
+DEFAULT_LATENCY = 1.0
+
+# 按端点配置缓存的端点池，使熔断状态在同一进程的多个任务之间保留
+_pool_cache = {}
+_pool_cache_lock = threading.Lock()
+
+
+class Endpoint:
+    """One OpenAI-compatible provider with its credentials, model and weight."""
+
+    def __init__(self, name, api_base_url, api_key, model=None, weight=1.0):
+        self.name = name
+        self.api_base_url = api_base_url
+        self.api_key = api_key
+        self.model = model
+        # 负的权重按 0 处理
+        self.weight = max(0.0, weight)
+        self.latency = None
+        self.in_flight = 0
+        self.failures = 0
+        self.opened_at = None
+        # 自动模式下该端点支持的结构化输出方式，首次请求时确定
+        self.structured_output = None
+
+    @property
+    def client(self):
+        from ai_subtitle_assistant.core.translation import get_client
+
+        return get_client(self.api_base_url, self.api_key)
+
+
+class EndpointPool:
+    """
+    Spreads requests over several endpoints in proportion to their weight and
+    inversely to their recent latency and load. An endpoint with weight 0
+    is only used when every candidate has weight 0, in which case they are
+    picked uniformly. An endpoint that fails
+    FAILURE_THRESHOLD times in a row is taken out of rotation (its circuit
+    opens) until a background health check finds it reachable again.
+    """
+
+    def __init__(self, endpoints):
+        self.endpoints = list(endpoints)
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._health_thread = None
+
+    def acquire(self):
+        """Picks the endpoint for the next request; pair it with release()."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.opened_at is None]
+            if not candidates:
+                # 所有端点都已熔断时，仍尝试熔断最久的那个，而不是让任务停住
+                candidates = [min(self.endpoints, key=lambda e: e.opened_at)]
+            scores = [
+                e.weight / ((e.latency or DEFAULT_LATENCY) * (1 + e.in_flight))
+                for e in candidates
+            ]
+            if sum(scores) > 0:
+                endpoint = self._random.choices(candidates, weights=scores)[0]
+            else:
+                # 所有候选端点的权重都为 0 时均匀选择
+                endpoint = self._random.choice(candidates)
+            endpoint.in_flight += 1
+        metrics.increment("endpoint_requests", labels={"endpoint": endpoint.name})
+        return endpoint
+
+    def release(self, endpoint, latency=None, success=True):
+        """Records the outcome of a request made through acquire()."""
+        opened = False
+        with self._lock:
+            endpoint.in_flight -= 1
+            if success:
+                endpoint.failures = 0
+                endpoint.opened_at = None
+                if latency is not None:
+                    endpoint.latency = (
+                        latency
+                        if endpoint.latency is None
+                        else LATENCY_EWMA_ALPHA * latency
+                        + (1 - LATENCY_EWMA_ALPHA) * endpoint.latency
+                    )
+                return
+            endpoint.failures += 1
+            metrics.increment("endpoint_failures", labels={"endpoint": endpoint.name})
+            if endpoint.failures >= FAILURE_THRESHOLD and endpoint.opened_at is None:
+                endpoint.opened_at = time.monotonic()
+                opened = True
+        if opened:
+            metrics.increment("circuit_opened", labels={"endpoint": endpoint.name})
+            logger.warning(
+                _(
+                    "Warning: Endpoint '{name}' failed {count} times in a row and is paused."
+                ).format(name=endpoint.name, count=FAILURE_THRESHOLD)
+            )
+            self._start_health_checks()
+
+    def check_health(self):
+        """Probes every paused endpoint whose cool-down has passed."""
+        import openai
+
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                e
+                for e in self.endpoints
+                if e.opened_at is not None and now - e.opened_at >= OPEN_SECONDS
+            ]
+        for endpoint in due:
+            try:
+                endpoint.client.with_options(
+                    timeout=HEALTH_CHECK_TIMEOUT, max_retries=0
+                ).models.list()
+                healthy = True
+            except openai.APIStatusError as e:
+                # 服务有响应（例如不支持 /models），只有 5xx 和限流才算不健康
+                healthy = e.status_code < 500 and e.status_code != 429
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    endpoint.failures = 0
+                    endpoint.opened_at = None
+                else:
+                    endpoint.opened_at = time.monotonic()
+            if healthy:
+                metrics.increment("circuit_closed", labels={"endpoint": endpoint.name})
+                logger.info(
+                    _("Endpoint '{name}' is reachable again.").format(
+                        name=endpoint.name
+                    ),
+                    extra={"color": Fore.GREEN},
+                )
+
+    def _start_health_checks(self):
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(
+                target=self._health_loop, daemon=True
+            )
+        self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(HEALTH_CHECK_INTERVAL)
+            with self._lock:
+                if all(e.opened_at is None for e in self.endpoints):
+                    self._health_thread = None
+                    return
+            self.check_health()
+
+
+def get_pool(endpoint_configs):
+    """
+    Returns the shared EndpointPool for a list of endpoint configs (dicts
+    with name, api_base_url, api_key and optional model and weight).
+    """
+    key = tuple(
+        (
+            config["name"],
+            config["api_base_url"],
+            config["api_key"],
+            config.get("model"),
+            float(1.0 if config.get("weight") is None else config["weight"]),
+        )
+        for config in endpoint_configs
+    )
+    with _pool_cache_lock:
+        pool = _pool_cache.get(key)
+        if pool is None:
+            pool = EndpointPool(
+                Endpoint(name, api_base_url, api_key, model, weight)
+                for name, api_base_url, api_key, model, weight in key
+            )
+            _pool_cache[key] = pool
+        return pool
@@ -0,0 +1,317 @@
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from platformdirs import user_data_dir
+from ai_subtitle_assistant.core.audio_cache import SAMPLE_RATE
+
+APP_NAME = "ai-subtitle"
+DEFAULT_INDEX_FILE = os.path.join(
+    user_data_dir(APP_NAME, "Lumos"), "audio_fingerprints.sqlite3"
+)
+
+FFT_SIZE = 1024
+HOP_SIZE = 512
+FRAME_SECONDS = HOP_SIZE / SAMPLE_RATE
+# 频谱按这些频点边界分带，每个频带在时间邻域内的最大值作为峰值
+BAND_EDGES = (2, 10, 20, 40, 80, 160, FFT_SIZE // 2 + 1)
+PEAK_NEIGHBORHOOD = 10  # frames on each side
+MIN_PEAK_MAGNITUDE = 0.5
+# 每个峰值与其后 FAN_OUT 个峰值组成哈希，时间差不超过 TARGET_ZONE 帧
+FAN_OUT = 5
+TARGET_ZONE = 127
+# 峰值所在帧随音频相对分帧网格的偏移而前后移动一帧，查询时同时查找相邻的时间差
+DT_TOLERANCE = 1
+# 频点按此位数量化后再组成哈希，容忍峰值在相邻频点之间移动
+BIN_SHIFT = 1
+# 哈希格式改变时递增；旧格式的索引无法匹配，打开时清空
+HASH_VERSION = 2
+BLOCK_FRAMES = 4096
+
+# 匹配区域的判定条件
+MIN_MATCHES = 20
+MIN_REGION_SECONDS = 8.0
+MAX_GAP_SECONDS = 3.0
+OFFSET_TOLERANCE = 1  # frames
+MAX_CANDIDATES = 50
+# 复用片段时允许超出匹配区域边界的秒数
+EDGE_TOLERANCE = 0.5
+
+_index_cache = {}
+_index_cache_lock = threading.Lock()
+
+
+def _band_peaks(samples):
+    """Returns (frames, bins) of the spectral peaks, block by block."""
+    if len(samples) < FFT_SIZE:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP_SIZE]
+    band_bins = []
+    band_values = []
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        magnitude = np.abs(np.fft.rfft(frames[start : start + BLOCK_FRAMES] * window))
+        bins = []
+        values = []
+        for low, high in zip(BAND_EDGES, BAND_EDGES[1:]):
+            band = magnitude[:, low:high]
+            bins.append(band.argmax(axis=1) + low)
+            values.append(band.max(axis=1))
+        band_bins.append(np.stack(bins, axis=1))
+        band_values.append(np.stack(values, axis=1))
+    bins = np.concatenate(band_bins)
+    values = np.concatenate(band_values)
+
+    # 只保留在前后 PEAK_NEIGHBORHOOD 帧内最大的频带峰值，使星座图保持稀疏
+    padded = np.pad(
+        values, ((PEAK_NEIGHBORHOOD, PEAK_NEIGHBORHOOD), (0, 0)), mode="constant"
+    )
+    neighborhood_max = np.lib.stride_tricks.sliding_window_view(
+        padded, 2 * PEAK_NEIGHBORHOOD + 1, axis=0
+    ).max(axis=2)
+    is_peak = (values >= neighborhood_max) & (values >= MIN_PEAK_MAGNITUDE)
+    peak_frames, peak_bands = np.nonzero(is_peak)
+    return peak_frames, bins[peak_frames, peak_bands]
+
+
+def _hash(anchor_bins, target_bins, dt):
+    return ((anchor_bins >> BIN_SHIFT) << 17) | ((target_bins >> BIN_SHIFT) << 7) | dt
+
+
+def _query_hashes(hashes, frames):
+    """
+    Adds to the query hashes the same peak pairs with a time difference
+    DT_TOLERANCE frames shorter or longer, since audio that is not aligned
+    to the HOP_SIZE grid can move each peak by a frame.
+    """
+    dt = hashes & 0x7F
+    variants = [hashes]
+    anchors = [frames]
+    for delta in range(-DT_TOLERANCE, DT_TOLERANCE + 1):
+        if delta == 0:
+            continue
+        shifted = dt + delta
+        valid = (shifted > 0) & (shifted <= TARGET_ZONE)
+        variants.append((hashes[valid] & ~0x7F) | shifted[valid])
+        anchors.append(frames[valid])
+    return np.concatenate(variants), np.concatenate(anchors)
+
+
+def fingerprint(samples):
+    """
+    Computes the landmark hashes of 16 kHz mono audio. Each hash combines two
+    spectral peaks (frequency bins quantized by BIN_SHIFT) and their time
+    difference. Returns (hashes, frames) arrays,
+    where frames are the anchor peaks' frame numbers (HOP_SIZE samples each).
+    """
+    frames, bins = _band_peaks(np.asarray(samples, dtype=np.float32))
+    hashes = []
+    anchors = []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        valid = (dt > 0) & (dt <= TARGET_ZONE)
+        hashes.append(_hash(bins[:-k][valid], bins[k:][valid], dt[valid]))
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def _smooth_counts(keys, counts):
+    """
+    Adds to the hit count of every (file, offset) key, sorted as np.unique
+    returns them, the counts of the same file's offsets within
+    OFFSET_TOLERANCE: unaligned audio spreads its hits over adjacent offsets.
+    """
+    smoothed = counts.copy()
+    for step in range(1, OFFSET_TOLERANCE + 1):
+        near = (keys[step:, 0] == keys[:-step, 0]) & (
+            keys[step:, 1] - keys[:-step, 1] <= OFFSET_TOLERANCE
+        )
+        smoothed[step:] += np.where(near, counts[:-step], 0)
+        smoothed[:-step] += np.where(near, counts[step:], 0)
+    return smoothed
+
+
+def _runs(query_frames):
+    """Splits sorted frame numbers into runs without gaps longer than MAX_GAP_SECONDS."""
+    max_gap = MAX_GAP_SECONDS / FRAME_SECONDS
+    breaks = np.nonzero(np.diff(query_frames) > max_gap)[0] + 1
+    return np.split(query_frames, breaks)
+
+
+def _overlaps(start, end, spans):
+    return any(start < span_end and end > span_start for span_start, span_end in spans)
+
+
+class FingerprintIndex:
+    """
+    A local, persistent index of audio landmark hashes and the segments
+    transcribed for each file, used to find audio that was heard before
+    (theme songs, recaps, credits, ads) and reuse its transcription.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                segments TEXT NOT NULL,
+                UNIQUE (content_hash, model)
+            );
+            CREATE TABLE IF NOT EXISTS hashes (
+                hash INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                frame INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+            CREATE INDEX IF NOT EXISTS hashes_file ON hashes (file_id);
+            """)
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != HASH_VERSION:
+            with self._conn:
+                self._conn.execute("DELETE FROM hashes")
+                self._conn.execute("DELETE FROM files")
+            self._conn.execute(f"PRAGMA user_version = {HASH_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, content_hash, model, hashes, frames, segments):
+        """Stores a transcribed file's hashes and segments, replacing an older entry."""
+        segments = [
+            {"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments
+        ]
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM files WHERE content_hash = ? AND model = ?",
+                (content_hash, model),
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM hashes WHERE file_id = ?", (row[0],))
+                self._conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            cursor = self._conn.execute(
+                "INSERT INTO files (content_hash, model, segments) VALUES (?, ?, ?)",
+                (content_hash, model, json.dumps(segments, ensure_ascii=False)),
+            )
+            self._conn.executemany(
+                "INSERT INTO hashes (hash, file_id, frame) VALUES (?, ?, ?)",
+                zip(
+                    hashes.tolist(),
+                    [cursor.lastrowid] * len(hashes),
+                    frames.tolist(),
+                ),
+            )
+
+    def _matches(self, hashes, frames, model):
+        """Returns (file_ids, offsets, query_frames) of all hash hits."""
+        with self._lock:
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, frame INTEGER)"
+            )
+            self._conn.execute("DELETE FROM query")
+            self._conn.executemany(
+                "INSERT INTO query (hash, frame) VALUES (?, ?)",
+                zip(hashes.tolist(), frames.tolist()),
+            )
+            rows = self._conn.execute(
+                "SELECT h.file_id, h.frame - q.frame, q.frame "
+                "FROM query q JOIN hashes h ON h.hash = q.hash "
+                "JOIN files f ON f.id = h.file_id WHERE f.model = ?",
+                (model,),
+            ).fetchall()
+            self._conn.execute("DELETE FROM query")
+        if not rows:
+            return None
+        return np.array(rows, dtype=np.int64).T
+
+    def _segments(self, file_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segments FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def find_reusable(self, hashes, frames, model):
+        """
+        Finds regions of the query audio that match previously indexed audio
+        transcribed with the same model. Returns (segments, spans): the stored
+        segments of those regions shifted to the query's timeline, and the
+        (start, end) spans in seconds that they cover and need no transcription.
+        """
+        matches = (
+            self._matches(*_query_hashes(hashes, frames), model)
+            if len(hashes)
+            else None
+        )
+        if matches is None:
+            return [], []
+        file_ids, offsets, query_frames = matches
+        keys, counts = np.unique(
+            np.stack([file_ids, offsets], axis=1), axis=0, return_counts=True
+        )
+        counts = _smooth_counts(keys, counts)
+        reused = []
+        spans = []
+        for index in np.argsort(counts, kind="stable")[::-1][:MAX_CANDIDATES]:
+            if counts[index] < MIN_MATCHES:
+                break
+            file_id, offset = keys[index]
+            hit = (file_ids == file_id) & (np.abs(offsets - offset) <= OFFSET_TOLERANCE)
+            for run in _runs(np.unique(query_frames[hit])):
+                region = self._region(file_id, offset, run, spans)
+                if region is None:
+                    continue
+                span, segments = region
+                spans.append(span)
+                reused.extend(segments)
+        spans.sort()
+        reused.sort(key=lambda segment: segment["start"])
+        return reused, spans
+
+    def _region(self, file_id, offset, run, spans):
+        """Turns a run of matching frames into a reusable span and its segments."""
+        start = int(run[0]) * FRAME_SECONDS
+        end = (int(run[-1]) + 1) * FRAME_SECONDS
+        if len(run) < MIN_MATCHES or end - start < MIN_REGION_SECONDS:
+            return None
+        shift = int(offset) * FRAME_SECONDS
+        segments = []
+        for segment in self._segments(int(file_id)):
+            seg_start = segment["start"] - shift
+            seg_end = segment["end"] - shift
+            if seg_end <= start or seg_start >= end:
+                continue
+            if seg_start >= start - EDGE_TOLERANCE and seg_end <= end + EDGE_TOLERANCE:
+                segments.append(dict(segment, start=seg_start, end=seg_end))
+            # 跨越区域边界的片段需要重新转录，区域收缩到该片段之外
+            elif seg_start < start:
+                start = seg_end
+            else:
+                end = min(end, seg_start)
+        if segments:
+            start = min(start, segments[0]["start"])
+            end = max(end, max(segment["end"] for segment in segments))
+        start = max(start, 0.0)
+        if end - start < MIN_REGION_SECONDS or _overlaps(start, end, spans):
+            return None
+        return (start, end), segments
+
+
+def get_index(path=DEFAULT_INDEX_FILE):
+    """Opens a FingerprintIndex, reusing an already open instance when possible."""
+    with _index_cache_lock:
+        index = _index_cache.get(path)
+        if index is None:
+            index = FingerprintIndex(path)
+            _index_cache[path] = index
+        return index
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from platformdirs import user_cache_dir
+from ai_subtitle_assistant.core.json_repair import loads_tolerant
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+
+logger = get_logger(__name__)
+
+APP_NAME = "ai-subtitle"
+GLOSSARY_CACHE_DIR = os.path.join(user_cache_dir(APP_NAME, "Lumos"), "glossary")
+
+GLOSSARY_MODES = ("off", "local", "llm")
+MAX_GLOSSARY_TERMS = 50
+MIN_TERM_FREQUENCY = 2
+# 发送给模型用于提取术语的原文样本的最大字符数
+SAMPLE_CHAR_LIMIT = 4000
+
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*")
+_WORD_RE = re.compile(r"[\w'-]+")
+_SENTENCE_END_RE = re.compile(r"[.!?…]\s*$")
+# 常见的大写开头但不属于专有名词的词
+_STOP_TERMS = {"I", "I'm", "I'll", "I've", "I'd", "OK", "Okay", "Mr", "Mrs", "Ms"}
+
+
+def extract_terms(segments):
+    """
+    Finds likely names and terms with a frequency and capitalization
+    heuristic: capitalized words or phrases that also occur in the middle of
+    a sentence and are never written in lower case.
+    """
+    lowercase_words = set()
+    counts = Counter()
+    mid_sentence = set()
+    for segment in segments:
+        text = segment["text"]
+        for word in _WORD_RE.findall(text):
+            if word.islower():
+                lowercase_words.add(word)
+        for match in _CAPITALIZED_RE.finditer(text):
+            before = text[: match.start()]
+            after = text[match.end() :]
+            if before.endswith("[") and after.startswith("]"):
+                # [MUSIC] 之类的音效标记不是术语
+                continue
+            words = [w for w in match.group(0).split() if w not in _STOP_TERMS]
+            if not words:
+                continue
+            term = " ".join(words)
+            counts[term] += 1
+            # 句首的大写不能说明是专有名词
+            if before.strip() and not _SENTENCE_END_RE.search(before):
+                mid_sentence.add(term)
+
+    terms = [
+        term
+        for term, count in counts.most_common()
+        if (" " in term or (count >= MIN_TERM_FREQUENCY and term in mid_sentence))
+        and term.split()[0].lower() not in lowercase_words
+    ]
+    return terms[:MAX_GLOSSARY_TERMS]
+
+
+def _sample_text(segments):
+    """Takes evenly spread lines from the file up to SAMPLE_CHAR_LIMIT characters."""
+    texts = [segment["text"].strip() for segment in segments if segment["text"].strip()]
+    total = sum(len(text) + 1 for text in texts)
+    step = max(1, total // SAMPLE_CHAR_LIMIT)
+    sample = []
+    size = 0
+    for text in texts[::step]:
+        if size + len(text) > SAMPLE_CHAR_LIMIT:
+            break
+        sample.append(text)
+        size += len(text) + 1
+    return sample
+
+
+def _request_glossary(backend, model, terms, sample, target_language):
+    """Asks the model for a glossary of names and terms with their translations."""
+    prompt = f"""You are preparing a glossary for translating a subtitle file into {target_language}.
+Identify the proper nouns (people, places, organizations) and recurring special terms in the file, and give the single {target_language} rendering that should be used consistently for each of them.
+Candidate terms found automatically (may be incomplete or contain mistakes): {json.dumps(terms, ensure_ascii=False)}
+Sample lines from the file:
+{json.dumps(sample, ensure_ascii=False, indent=2)}
+
+Return at most {MAX_GLOSSARY_TERMS} entries. Your output MUST be a valid JSON object of the form:
+{{"glossary": {{"<term as written in the source>": "<{target_language} rendering>"}}}}
+"""
+    content = backend.complete(
+        "You are a professional subtitle translator. Your output must be a valid JSON object.",
+        prompt,
+        model,
+        temperature=0.2,
+        labels={"purpose": "glossary"},
+    )
+    glossary = loads_tolerant(content)[0].get("glossary", {})
+    return {
+        str(term): str(translation)
+        for term, translation in glossary.items()
+        if term and translation
+    }
+
+
+def _cache_path(segments, target_language, model, mode):
+    digest = hashlib.sha256()
+    # 本地启发式结果与目标语言和模型无关，所有语言共用一份缓存
+    if mode != "llm":
+        target_language = model = ""
+    for value in (mode, target_language, model):
+        digest.update(value.encode("utf-8") + b"\0")
+    for segment in segments:
+        digest.update(segment["text"].strip().encode("utf-8") + b"\n")
+    return os.path.join(GLOSSARY_CACHE_DIR, digest.hexdigest() + ".json")
+
+
+def build_glossary(segments, target_language, mode="local", backend=None, model=None):
+    """
+    Builds the glossary for a file once, caching it on disk by the file's
+    content. Returns {term: translation}; with mode "local" the translations
+    are None and the terms only tell the model which names to keep consistent.
+    """
+    if mode == "off":
+        return {}
+    path = _cache_path(segments, target_language, model or "", mode)
+    if os.path.exists(path):
+        metrics.record_cache("glossary", True)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    metrics.record_cache("glossary", False)
+
+    with metrics.stage("translate.glossary"):
+        terms = extract_terms(segments)
+        glossary = {term: None for term in terms}
+        if mode == "llm":
+            try:
+                glossary.update(
+                    _request_glossary(
+                        backend, model, terms, _sample_text(segments), target_language
+                    )
+                )
+            except Exception as e:
+                logger.warning(
+                    _(
+                        "Warning: Glossary extraction failed, using local terms only: {e}"
+                    ).format(e=e)
+                )
+                # 不缓存失败的结果，下次运行时重试
+                return glossary
+
+    os.makedirs(GLOSSARY_CACHE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(glossary, f, ensure_ascii=False, indent=2)
+    return glossary
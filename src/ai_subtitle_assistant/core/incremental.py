@@ -0,0 +1,166 @@
+import difflib
+import srt
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+
+# 改动的段落与旧原文至少这么相似时，旧译文作为提示发送给模型
+HINT_SIMILARITY = 0.5
+# 每条改动的段落前后各附带多少条未改动的段落（连同现有译文）作为上下文
+INCREMENTAL_CONTEXT_CUES = 2
+# 原文改动过的段落与新原文中上一条未改动段落之后的这几条比较，以找出原文从哪一行开始
+EDITED_CUE_WINDOW = 3
+
+
+def _normalize(text):
+    # 只改变换行或空白的段落视为未改动
+    return " ".join(text.split())
+
+
+def _failed_markers():
+    markers = {"[Translation Failed]", "[Chunk Translation Failed]"}
+    return markers | {_("[Translation Failed]"), _("[Chunk Translation Failed]")}
+
+
+def _split_cue(content, source_texts, nearby_texts=()):
+    """
+    Splits a bilingual cue ("translation\\noriginal") into its two parts. The
+    original is the longest trailing run of lines that is a cue of the new
+    source. For a cue whose original was edited since, it is the trailing
+    run most similar to one of nearby_texts (normalized new source cues
+    where the edited cue now stands); without those it is split in the
+    middle.
+    """
+    lines = content.strip().split("\n")
+    if len(lines) < 2:
+        return None
+    for k in range(1, len(lines)):
+        original = "\n".join(lines[k:])
+        if _normalize(original) in source_texts:
+            return "\n".join(lines[:k]), original
+    if nearby_texts:
+        k = max(
+            range(1, len(lines)),
+            key=lambda k: max(
+                difflib.SequenceMatcher(
+                    None, _normalize("\n".join(lines[k:])), text
+                ).ratio()
+                for text in nearby_texts
+            ),
+        )
+    else:
+        k = len(lines) // 2
+    return "\n".join(lines[:k]), "\n".join(lines[k:])
+
+
+def parse_bilingual_srt(content, segments):
+    """
+    Parses a bilingual SRT written by translate into a list of
+    {"original_text", "translated_text"} dicts, using the new source
+    segments to tell where each cue's original text starts.
+    """
+    new_texts = [_normalize(segment["text"]) for segment in segments]
+    source_texts = set(new_texts)
+    with metrics.stage("srt.parse"):
+        subs = list(srt.parse(content))
+    cues = []
+    # 新原文中上一条未改动段落之后的位置
+    position = 0
+    for sub in subs:
+        parts = _split_cue(
+            sub.content,
+            source_texts,
+            new_texts[position : position + EDITED_CUE_WINDOW],
+        )
+        if parts is None:
+            continue
+        translated_text, original_text = parts
+        original = _normalize(original_text)
+        if original in source_texts:
+            try:
+                position = new_texts.index(original, position) + 1
+            except ValueError:
+                pass
+        cues.append(
+            {"original_text": original_text, "translated_text": translated_text}
+        )
+    return cues
+
+
+def align_previous(segments, previous_cues):
+    """
+    Aligns the new source segments with the cues of a previous bilingual
+    output by their text, using sequence diffing, so shifted timings and
+    renumbered, inserted or deleted cues do not break the alignment.
+
+    Returns (carried, edited): carried maps the id of every unchanged
+    segment to its previous translation; edited maps the id of a changed
+    segment that replaced a similar previous cue to a translation memory
+    style hint ({"source_text", "translated_text", "similarity"}). Cues
+    whose previous translation failed count as changed.
+    """
+    failed = _failed_markers()
+    old = [_normalize(cue["original_text"]) for cue in previous_cues]
+    new = [_normalize(segment["text"]) for segment in segments]
+    # 字幕中常见的短句（如 "Yeah."）会反复出现，不能被当作垃圾元素忽略
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    carried = {}
+    edited = {}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(i2 - i1):
+                translated_text = previous_cues[i1 + offset]["translated_text"]
+                if translated_text.strip() and translated_text not in failed:
+                    carried[segments[j1 + offset]["id"]] = translated_text
+        elif tag == "replace":
+            # 按位置配对被替换的段落，旧译文足够相似时作为提示
+            for offset in range(min(i2 - i1, j2 - j1)):
+                cue = previous_cues[i1 + offset]
+                if cue["translated_text"] in failed:
+                    continue
+                similarity = difflib.SequenceMatcher(
+                    None, old[i1 + offset], new[j1 + offset]
+                ).ratio()
+                if similarity >= HINT_SIMILARITY:
+                    edited[segments[j1 + offset]["id"]] = {
+                        "source_text": cue["original_text"],
+                        "translated_text": cue["translated_text"],
+                        "similarity": similarity,
+                    }
+    return carried, edited
+
+
+def incremental_context(pending_chunk, segments, index_by_id, carried, languages):
+    """
+    Returns the unchanged segments around the pending segments of a chunk,
+    with their carried translations (a dict of languages when there are
+    several), for the read-only context of the prompt.
+    """
+    pending = {item["id"] for item in pending_chunk}
+    indexes = set()
+    for item in pending_chunk:
+        index = index_by_id[item["id"]]
+        for neighbour in range(
+            max(0, index - INCREMENTAL_CONTEXT_CUES),
+            min(len(segments), index + INCREMENTAL_CONTEXT_CUES + 1),
+        ):
+            segment_id = segments[neighbour]["id"]
+            if segment_id not in pending and all(
+                segment_id in carried[language] for language in languages
+            ):
+                indexes.add(neighbour)
+    around = []
+    for index in sorted(indexes):
+        segment = segments[index]
+        translations = {
+            language: carried[language][segment["id"]] for language in languages
+        }
+        around.append(
+            {
+                "id": segment["id"],
+                "text": segment["text"].strip(),
+                "translated_text": (
+                    translations if len(languages) > 1 else translations[languages[0]]
+                ),
+            }
+        )
+    return around
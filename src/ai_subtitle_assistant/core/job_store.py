@@ -0,0 +1,407 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_INTERVAL = 1.0  # seconds
+# 已完成的任务保留多久（秒），供客户端取回结果，之后被清理
+DEFAULT_JOB_RETENTION = 24 * 3600
+# 等待数据库锁的最长时间；共享文件系统上多个节点可能同时写入
+BUSY_TIMEOUT = 60
+# SQLite 单条语句可绑定的参数数量有限，按批查询
+_QUERY_BATCH = 500
+# 共享文件中不保存凭据，工作进程从自己的配置或环境变量中读取
+SECRET_PARAMS = ("api_key",)
+
+
+def _without_secrets(params):
+    return {key: value for key, value in params.items() if key not in SECRET_PARAMS}
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobStore:
+    """
+    A job queue in a SQLite file that any number of processes, on any node
+    that can reach the file, share without a separate broker. Workers claim
+    jobs with a lease and renew it with heartbeats; a job whose lease runs
+    out (its worker died or hung) is handed to the next worker, up to
+    max_attempts times.
+
+    The database uses the default rollback journal rather than WAL, which
+    does not work on network filesystems.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # isolation_level=None：事务由 BEGIN IMMEDIATE 显式控制
+        self._conn = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                params TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                submitted_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claim
+                ON jobs (status, priority, submitted_at);
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, statements):
+        """Runs (sql, params) statements in one immediate transaction; returns the last cursor."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = None
+                for sql, params in statements:
+                    cursor = self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+                return cursor
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def submit(self, job_type, params, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queues a job. Lower priority values run first. Returns its id."""
+        return self.submit_many(job_type, [params], priority, max_attempts)[0]
+
+    def submit_many(
+        self, job_type, params_list, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS
+    ):
+        """
+        Queues several jobs of one type in a single transaction. Returns their
+        ids. SECRET_PARAMS are left out of the stored params.
+        """
+        now = time.time()
+        job_ids = [uuid.uuid4().hex for _params in params_list]
+        self._write(
+            [
+                (
+                    "INSERT INTO jobs (id, type, params, priority, status, max_attempts, submitted_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (
+                        job_id,
+                        job_type,
+                        json.dumps(_without_secrets(params), ensure_ascii=False),
+                        priority,
+                        max_attempts,
+                        now,
+                    ),
+                )
+                for job_id, params in zip(job_ids, params_list)
+            ]
+        )
+        metrics.increment("jobs_submitted", len(job_ids), labels={"type": job_type})
+        return job_ids
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, job_types=None):
+        """
+        Takes the next queued job (or one whose lease has expired) for this
+        worker. Returns the job as a dict, or None when there is nothing to do.
+        """
+        now = time.time()
+        type_clause = ""
+        type_params = ()
+        if job_types:
+            type_clause = f"AND type IN ({', '.join('?' * len(job_types))}) "
+            type_params = tuple(job_types)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 租约过期的任务：已用尽重试次数的标记为失败，其余重新排队
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, params = '{}' "
+                    "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                    (_("Job lease expired too many times."), now, now),
+                )
+                expired = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL "
+                    "WHERE status = 'running' AND lease_expires < ?",
+                    (now,),
+                ).rowcount
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' "
+                    + type_clause
+                    + "ORDER BY priority, submitted_at LIMIT 1",
+                    type_params,
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                        (worker_id, now + lease_seconds, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if expired:
+            metrics.increment("job_leases_expired", expired)
+        return self.get(row[0]) if row else None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extends the lease. Returns False if the worker no longer holds the job."""
+        cursor = self._write(
+            [
+                (
+                    "UPDATE jobs SET lease_expires = ? "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (time.time() + lease_seconds, job_id, worker_id),
+                )
+            ]
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, worker_id, result):
+        """Stores the result. Returns False if the lease was lost in the meantime."""
+        cursor = self._write(
+            [
+                (
+                    "UPDATE jobs SET status = 'done', result = ?, finished_at = ?, "
+                    "params = '{}', lease_expires = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (
+                        json.dumps(result, ensure_ascii=False),
+                        time.time(),
+                        job_id,
+                        worker_id,
+                    ),
+                )
+            ]
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id, worker_id, error):
+        """Re-queues the job, or marks it failed once it has used all its attempts."""
+        now = time.time()
+        cursor = self._write(
+            [
+                (
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, "
+                    "params = '{}', lease_expires = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running' "
+                    "AND attempts >= max_attempts",
+                    (error, now, job_id, worker_id),
+                ),
+                (
+                    "UPDATE jobs SET status = 'queued', error = ?, worker = NULL, "
+                    "lease_expires = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (error, job_id, worker_id),
+                ),
+            ]
+        )
+        if cursor.rowcount:
+            metrics.increment("jobs_retried")
+
+    def get(self, job_id):
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+            finally:
+                self._conn.row_factory = None
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def queued(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+
+    def delete(self, job_ids):
+        job_ids = list(job_ids)
+        for start in range(0, len(job_ids), _QUERY_BATCH):
+            batch = job_ids[start : start + _QUERY_BATCH]
+            self._write(
+                [
+                    (
+                        f"DELETE FROM jobs WHERE id IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                ]
+            )
+
+    def purge_finished(self, retention=DEFAULT_JOB_RETENTION):
+        """
+        Deletes the done and failed jobs that finished more than retention
+        seconds ago. Returns how many were deleted.
+        """
+        cursor = self._write(
+            [
+                (
+                    "DELETE FROM jobs WHERE status IN ('done', 'failed') "
+                    "AND finished_at < ?",
+                    (time.time() - retention,),
+                )
+            ]
+        )
+        if cursor.rowcount:
+            metrics.increment("jobs_purged", cursor.rowcount)
+            logger.debug(f"已清理 {cursor.rowcount} 个过期的已完成任务")
+        return cursor.rowcount
+
+    def wait_many(self, job_ids, poll_interval=DEFAULT_POLL_INTERVAL):
+        """Yields (job_id, status, result, error) for each job as it finishes."""
+        remaining = set(job_ids)
+        while remaining:
+            finished = []
+            ids = list(remaining)
+            for start in range(0, len(ids), _QUERY_BATCH):
+                batch = ids[start : start + _QUERY_BATCH]
+                with self._lock:
+                    finished.extend(
+                        self._conn.execute(
+                            "SELECT id, status, result, error FROM jobs "
+                            f"WHERE id IN ({', '.join('?' * len(batch))}) "
+                            "AND status IN ('done', 'failed')",
+                            batch,
+                        ).fetchall()
+                    )
+            for job_id, status, result, error in finished:
+                remaining.discard(job_id)
+                yield job_id, status, json.loads(result) if result else None, error
+            if remaining and not finished:
+                time.sleep(poll_interval)
+
+
+def run_distributed(store, job_type, params_list, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Submits one job per params dict and yields (index, result) in completion
+    order, with result None for jobs that failed. The jobs are removed from
+    the store once collected.
+    """
+    job_ids = store.submit_many(job_type, params_list)
+    index_by_id = {job_id: index for index, job_id in enumerate(job_ids)}
+    logger.info(
+        _("Submitted {count} {type} jobs to {store}; waiting for workers...").format(
+            count=len(job_ids), type=job_type, store=store.path
+        ),
+        extra={"color": Fore.CYAN},
+    )
+    try:
+        for job_id, status, result, error in store.wait_many(job_ids, poll_interval):
+            if status != "done":
+                logger.error(
+                    _("Job {id} failed: {error}").format(id=job_id, error=error)
+                )
+                result = None
+            yield index_by_id[job_id], result
+    finally:
+        store.delete(job_ids)
+
+
+def _work(store, worker_id, runners, defaults, lease_seconds, poll_interval, stop):
+    while not stop.is_set():
+        job = store.claim(worker_id, lease_seconds, list(runners))
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        # 心跳线程定期续租，任务卡死或进程退出后租约会过期并交给其他工作进程
+        done = threading.Event()
+
+        def beat(job_id=job["id"]):
+            while not done.wait(lease_seconds / 3):
+                if not store.heartbeat(job_id, worker_id, lease_seconds):
+                    break
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        with metrics.stage(f"worker.{job['type']}"):
+            try:
+                result = runners[job["type"]](job["params"], defaults)
+            except Exception as e:
+                logger.exception(
+                    _("Job {id} failed: {error}").format(id=job["id"], error=e)
+                )
+                store.fail(job["id"], worker_id, str(e))
+            else:
+                if not store.complete(job["id"], worker_id, result):
+                    logger.warning(
+                        _(
+                            "Warning: Lost the lease on job {id}; its result was discarded."
+                        ).format(id=job["id"])
+                    )
+            finally:
+                done.set()
+                heartbeat.join()
+
+
+def run_worker(
+    store,
+    runners,
+    defaults=None,
+    concurrency=1,
+    worker_id=None,
+    lease_seconds=DEFAULT_LEASE_SECONDS,
+    poll_interval=DEFAULT_POLL_INTERVAL,
+    stop=None,
+):
+    """
+    Claims and runs jobs from the store until `stop` (a threading.Event) is
+    set. runners maps each job type this worker accepts to a function
+    runner(params, defaults) returning a JSON-serializable result.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    threads = [
+        threading.Thread(
+            target=_work,
+            args=(
+                store,
+                f"{worker_id}/{index}",
+                runners,
+                defaults or {},
+                lease_seconds,
+                poll_interval,
+                stop,
+            ),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(poll_interval)
@@ -0,0 +1,111 @@
+import json
+
+# 修复时最多尝试的截断位置数，避免在很长的损坏回复上耗时过多
+MAX_REPAIR_ATTEMPTS = 200
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class TruncatedJSONError(ValueError):
+    """The reply ends inside an unclosed string, object or array."""
+
+
+def _scan(text, start):
+    """
+    Walks the JSON text from start, dropping trailing commas before closing
+    brackets. Returns (cleaned text, cut points, unclosed), where each cut
+    point is (length of the cleaned text, open brackets) just after a
+    complete string value or a closed object/array, i.e. a place where the
+    text can be cut and closed to get valid JSON, and unclosed is True if
+    the text ends inside a string, object or array.
+    """
+    out = []
+    cuts = []
+    stack = []
+    in_string = False
+    escaped = False
+    string_is_value = False
+    last = ""
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                last = '"'
+                if string_is_value:
+                    cuts.append((len(out), tuple(stack)))
+            continue
+        if char == '"':
+            in_string = True
+            # 对象中位于 "{" 或 "," 之后的字符串是键
+            string_is_value = not (stack and stack[-1] == "{" and last in "{,")
+            out.append(char)
+            continue
+        if char in "}]":
+            if not stack or _CLOSERS[stack[-1]] != char:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(char)
+            last = char
+            if not stack:
+                break
+            cuts.append((len(out), tuple(stack)))
+            continue
+        if char in "{[":
+            stack.append(char)
+        if not char.isspace():
+            last = char
+        out.append(char)
+    else:
+        return "".join(out), cuts, in_string or bool(stack)
+    return "".join(out), cuts, False
+
+
+def _close(text, stack):
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join(_CLOSERS[bracket] for bracket in reversed(stack))
+
+
+def loads_tolerant(text):
+    """
+    Parses the JSON object or array in a model reply. Prose or code fences
+    around it are ignored. Malformed or truncated JSON is repaired: trailing
+    commas are dropped, and if the text ends inside an unclosed string,
+    object or array, it is cut after the last complete value and the open
+    brackets are closed, so every complete object before that point is
+    recovered. Returns (value, truncated), where truncated is True if the
+    text had to be cut; raises ValueError if nothing can be recovered,
+    TruncatedJSONError if that text ends inside an unclosed value.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object found in the response")
+    start = min(starts)
+    decoder = json.JSONDecoder(strict=False)
+    try:
+        return decoder.raw_decode(text, start)[0], False
+    except ValueError as e:
+        error = e
+
+    cleaned, cuts, unclosed = _scan(text, start)
+    try:
+        return decoder.raw_decode(cleaned)[0], False
+    except ValueError:
+        pass
+    for length, stack in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        try:
+            return json.loads(_close(cleaned[:length], stack), strict=False), True
+        except ValueError:
+            continue
+    if unclosed:
+        raise TruncatedJSONError(str(error)) from error
+    raise error
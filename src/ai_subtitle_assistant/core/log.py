@@ -0,0 +1,215 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from platformdirs import user_log_dir
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore, Style
+
+APP_NAME = "ai-subtitle"
+PACKAGE = "ai_subtitle_assistant"
+DEFAULT_LOG_FILE = os.path.join(user_log_dir(APP_NAME, "Lumos"), "ai-subtitle.log")
+DEFAULT_LEVEL = "INFO"
+# 队列满时丢弃日志记录，而不是阻塞工作线程
+QUEUE_SIZE = 10000
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+_LEVEL_COLORS = {
+    logging.DEBUG: Style.DIM,
+    logging.WARNING: Fore.YELLOW,
+    logging.ERROR: Fore.RED,
+    logging.CRITICAL: Fore.RED,
+}
+
+_listener = None
+_queue = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Returns the logger of a module; use with __name__."""
+    return logging.getLogger(name)
+
+
+def module_logger_name(module):
+    """
+    Expands a module name given on the command line: "translation" or
+    "core.translation" both mean "ai_subtitle_assistant.core.translation".
+    """
+    if module == PACKAGE or module.startswith(PACKAGE + "."):
+        return module
+    if "." not in module:
+        return f"{PACKAGE}.core.{module}"
+    return f"{PACKAGE}.{module}"
+
+
+def _level(value):
+    level = logging.getLevelName(str(value).strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(_("Unknown log level: {level}").format(level=value))
+    return level
+
+
+def parse_module_levels(value):
+    """Parses "translation=DEBUG,endpoints=WARNING" into {logger name: level}."""
+    levels = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        module, level = item.split("=", 1)
+        levels[module_logger_name(module.strip())] = _level(level)
+    return levels
+
+
+def _serialize_payload(payload):
+    if isinstance(payload, str):
+        return payload
+    try:
+        return json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+    except (TypeError, ValueError, RuntimeError):
+        # 负载在序列化时被其他线程修改时退回 repr
+        return repr(payload)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues a snapshot of each record: the calling thread only merges the
+    message with its arguments and deep-copies the payload, so later
+    mutations of the logged dicts and lists do not change what is written,
+    while rendering the payload as JSON is left to the listener thread. A
+    full queue drops the record instead of blocking the caller.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        payload = getattr(record, "payload", None)
+        if payload is not None and not isinstance(payload, str):
+            try:
+                record.payload = copy.deepcopy(payload)
+            except Exception:
+                # 无法复制的对象（如锁、文件）退回 repr
+                record.payload = repr(payload)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_records_dropped")
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """Colors the message by level (or by record.color); payloads are left out."""
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.levelno <= logging.DEBUG:
+            message = f"[DEBUG] {record.name}: {message}"
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        color = getattr(record, "color", None) or _LEVEL_COLORS.get(record.levelno)
+        if color:
+            message = color + message + Style.RESET_ALL
+        return message
+
+
+class _FileFormatter(logging.Formatter):
+    """Timestamped records with the thread name and the full payload."""
+
+    def __init__(self):
+        super().__init__(
+            "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+        )
+
+    def format(self, record):
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        if payload is None:
+            return text
+        return f"{text}\n{_serialize_payload(payload)}"
+
+
+def setup_logging(level=None, module_levels=None, log_file=None):
+    """
+    Routes the package's log records through a queue to a background thread
+    that writes them, so logging never blocks the worker threads.
+
+    level is the package level (default INFO, or DEBUG with the
+    AI_SUBTITLE_DEBUG=1 environment variable, or AI_SUBTITLE_LOG_LEVEL).
+    module_levels maps module names to levels (see parse_module_levels),
+    in addition to AI_SUBTITLE_LOG_LEVELS. Messages go to stderr; payloads
+    attached with extra={"payload": ...} (prompts, responses) only go to
+    the rotating log_file, which defaults to DEFAULT_LOG_FILE whenever any
+    module logs at DEBUG. Returns the log file path or None.
+    """
+    global _listener, _queue
+
+    if level is None:
+        level = os.environ.get("AI_SUBTITLE_LOG_LEVEL") or (
+            "DEBUG" if os.environ.get("AI_SUBTITLE_DEBUG", "0") == "1" else None
+        )
+    levels = parse_module_levels(os.environ.get("AI_SUBTITLE_LOG_LEVELS"))
+    levels.update(module_levels or {})
+    levels[PACKAGE] = _level(level or DEFAULT_LEVEL)
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+    if log_file is None and min(levels.values()) <= logging.DEBUG:
+        log_file = DEFAULT_LOG_FILE
+
+    handlers = []
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(_ConsoleFormatter())
+    handlers.append(console)
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUPS,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(_FileFormatter())
+        handlers.append(file_handler)
+
+    with _setup_lock:
+        stop_logging()
+        _queue = queue.Queue(QUEUE_SIZE)
+        package_logger = logging.getLogger(PACKAGE)
+        for handler in list(package_logger.handlers):
+            if isinstance(handler, _NonBlockingQueueHandler):
+                package_logger.removeHandler(handler)
+        package_logger.addHandler(_NonBlockingQueueHandler(_queue))
+        package_logger.propagate = False
+        _listener = logging.handlers.QueueListener(_queue, *handlers)
+        _listener.start()
+    return log_file
+
+
+def flush_logs():
+    """Waits until every queued record has been written."""
+    if _listener is not None:
+        _queue.join()
+
+
+def stop_logging():
+    """Writes the queued records and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,229 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 请求延迟直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+METRIC_PREFIX = "ai_subtitle_"
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in pairs
+        )
+        + "}"
+    )
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, in-process collection of counters, stage timers and latency
+    histograms. Recording is cheap so it can stay enabled in production.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 由 --profile 设置，在每个阶段的进入和退出时被调用
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._counters = {}
+            self._stages = {}
+            self._histograms = {}
+
+    def increment(self, name, amount=1, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {
+                    "buckets": buckets,
+                    "counts": [0] * (len(buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+                self._histograms[key] = histogram
+            histogram["counts"][bisect.bisect_left(buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            stage = self._stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+
+    @contextmanager
+    def stage(self, name):
+        """Measures the wall time spent inside the block under the given stage."""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+            if profiler is not None:
+                profiler.exit(name)
+
+    def record_cache(self, cache, hit):
+        self.increment("cache_hits" if hit else "cache_misses", labels={"cache": cache})
+
+    def record_usage(self, usage, labels=None):
+        """Adds the token counts of an OpenAI `response.usage` object."""
+        if usage is None:
+            return
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = getattr(usage, field, None)
+            if value is None and isinstance(usage, dict):
+                value = usage.get(field)
+            if value:
+                self.increment(field, value, labels)
+
+    def report(self):
+        """Returns a JSON-serialisable snapshot of all metrics."""
+        with self._lock:
+            counters = {}
+            for (name, label_key), value in self._counters.items():
+                counters.setdefault(name, []).append(
+                    {"labels": dict(label_key), "value": value}
+                )
+            histograms = {}
+            for (name, label_key), histogram in self._histograms.items():
+                histograms.setdefault(name, []).append(
+                    {
+                        "labels": dict(label_key),
+                        "buckets": list(histogram["buckets"]),
+                        "counts": list(histogram["counts"]),
+                        "sum": histogram["sum"],
+                        "count": histogram["count"],
+                    }
+                )
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            started_at = self.started_at
+
+        hits = {
+            item["labels"].get("cache"): item["value"]
+            for item in counters.get("cache_hits", [])
+        }
+        misses = {
+            item["labels"].get("cache"): item["value"]
+            for item in counters.get("cache_misses", [])
+        }
+        cache_hit_rates = {}
+        for cache in set(hits) | set(misses):
+            total = hits.get(cache, 0) + misses.get(cache, 0)
+            cache_hit_rates[cache] = hits.get(cache, 0) / total if total else 0.0
+
+        return {
+            "started_at": started_at,
+            "elapsed_seconds": time.time() - started_at,
+            "stages": stages,
+            "counters": counters,
+            "histograms": histograms,
+            "cache_hit_rates": cache_hit_rates,
+        }
+
+    def write_json_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _labels in self._counters})
+            for name in counter_names:
+                metric = f"{METRIC_PREFIX}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, label_key), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{_format_labels(label_key)} {value}")
+
+            if self._stages:
+                lines.append(f"# TYPE {METRIC_PREFIX}stage_seconds_total counter")
+                for name, stage in sorted(self._stages.items()):
+                    labels = _format_labels((("stage", name),))
+                    lines.append(
+                        f"{METRIC_PREFIX}stage_seconds_total{labels} {stage['seconds']}"
+                    )
+                lines.append(f"# TYPE {METRIC_PREFIX}stage_calls_total counter")
+                for name, stage in sorted(self._stages.items()):
+                    labels = _format_labels((("stage", name),))
+                    lines.append(
+                        f"{METRIC_PREFIX}stage_calls_total{labels} {stage['calls']}"
+                    )
+
+            histogram_names = sorted({name for name, _labels in self._histograms})
+            for name in histogram_names:
+                metric = f"{METRIC_PREFIX}{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram_name, label_key), histogram in sorted(
+                    self._histograms.items()
+                ):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(
+                        list(histogram["buckets"]) + ["+Inf"], histogram["counts"]
+                    ):
+                        cumulative += count
+                        labels = _format_labels(label_key, (("le", bound),))
+                        lines.append(f"{metric}_bucket{labels} {cumulative}")
+                    labels = _format_labels(label_key)
+                    lines.append(f"{metric}_sum{labels} {histogram['sum']}")
+                    lines.append(f"{metric}_count{labels} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的默认指标注册表
+registry = MetricsRegistry()
+
+
+def start_prometheus_server(port, host="127.0.0.1"):
+    """
+    Serves the default registry at http://host:port/metrics from a daemon thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
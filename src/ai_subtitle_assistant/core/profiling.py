@@ -0,0 +1,229 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+
+# 采样间隔（秒）；只在 --profile 时运行，开销可以接受
+SAMPLE_INTERVAL = 0.005
+PSTATS_LINES = 40
+UNSCOPED = "(unscoped)"
+
+# 栈顶位于这些函数时，线程被视为在等待而非执行；值为等待原因
+_WAIT_FUNCTIONS = {
+    ("threading.py", "wait"): "lock",
+    ("threading.py", "acquire"): "lock",
+    ("threading.py", "_wait_for_tstate_lock"): "join",
+    ("threading.py", "join"): "join",
+    ("queue.py", "get"): "queue",
+    ("_base.py", "result"): "future",
+    ("_base.py", "as_completed"): "future",
+    ("_base.py", "wait"): "future",
+    ("thread.py", "_worker"): "idle",
+    ("ssl.py", "read"): "network",
+    ("ssl.py", "recv_into"): "network",
+    ("ssl.py", "do_handshake"): "network",
+    ("socket.py", "readinto"): "network",
+    ("socket.py", "create_connection"): "network",
+    ("selectors.py", "select"): "network",
+    ("_backends/sync.py", "read"): "network",
+    ("subprocess.py", "communicate"): "subprocess",
+    ("subprocess.py", "_communicate"): "subprocess",
+    ("subprocess.py", "wait"): "subprocess",
+}
+# ThreadPoolExecutor-0_3 -> ThreadPoolExecutor-0
+_THREAD_GROUP_RE = re.compile(r"_\d+$")
+
+
+def _frame_label(code):
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _wait_reason(frame):
+    filename = frame.f_code.co_filename.replace(os.sep, "/")
+    name = frame.f_code.co_name
+    for (suffix, function), reason in _WAIT_FUNCTIONS.items():
+        if name == function and filename.endswith("/" + suffix):
+            return reason
+    return None
+
+
+def _safe_name(stage):
+    return re.sub(r"[^\w.-]+", "_", stage)
+
+
+class Profiler:
+    """
+    Profiles the named stages of metrics.stage() scopes in two ways:
+
+    * cProfile, per stage name and exclusive of nested stages: entering a
+      stage pauses the enclosing stage's profile until it exits.
+    * A sampling thread that records every thread's Python stack every
+      SAMPLE_INTERVAL seconds under the thread's innermost stage, as
+      flamegraph-compatible collapsed stacks. A sample whose top frame is
+      blocked (lock, queue, future, network read, subprocess) counts as
+      waiting, so the time the translation worker pool spends waiting for
+      the LLM can be told apart from time spent computing.
+    """
+
+    def __init__(self, output_dir, interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        # 线程 id -> 当前所在的 (阶段, cProfile) 栈（采样线程读取）
+        self._stacks = {}
+        self._stats = {}
+        self._collapsed = {}
+        self._waits = {}
+        self._stop = threading.Event()
+        self._sampler = None
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def enter(self, name):
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        # 每个阶段只统计自身的调用：进入内层阶段时暂停外层的分析器
+        if stack and stack[-1][1] is not None:
+            stack[-1][1].disable()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 其他分析工具已启用时只进行采样
+            profile = None
+        stack.append((name, profile))
+
+    def exit(self, name):
+        stack = self._stacks.get(threading.get_ident())
+        if not stack:
+            return
+        _name, profile = stack.pop()
+        if profile is not None:
+            profile.disable()
+            self._add_stats(name, profile)
+        if stack and stack[-1][1] is not None:
+            stack[-1][1].enable()
+
+    def _add_stats(self, name, profile):
+        try:
+            stats = pstats.Stats(profile)
+        except TypeError:
+            # 没有记录到任何调用
+            return
+        with self._lock:
+            if name in self._stats:
+                self._stats[name].add(stats)
+            else:
+                self._stats[name] = stats
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            # 在 GIL 竞争下实际间隔会大于 interval，等待时间按实际间隔累计
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = self._stacks.get(ident)
+                stage = stack[-1][0] if stack else UNSCOPED
+                reason = _wait_reason(frame)
+                if stage == UNSCOPED and reason is not None:
+                    # 不属于任何阶段的空闲线程（健康检查、进度条等）不计入
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                group = _THREAD_GROUP_RE.sub("", names.get(ident, str(ident)))
+                with self._lock:
+                    self._collapsed.setdefault(stage, Counter())[
+                        ";".join(reversed(frames))
+                    ] += 1
+                    self._waits.setdefault(stage, {}).setdefault(group, Counter())[
+                        reason or "running"
+                    ] += elapsed
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def summary(self, stage_seconds=None):
+        """Per stage: wall time and, per thread group, running vs waiting seconds."""
+        stages = {}
+        with self._lock:
+            for stage, groups in self._waits.items():
+                stages[stage] = {
+                    "samples": sum(self._collapsed.get(stage, {}).values()),
+                    "threads": {
+                        group: {
+                            "running_seconds": seconds.get("running", 0.0),
+                            "waiting_seconds": {
+                                reason: value
+                                for reason, value in seconds.most_common()
+                                if reason != "running"
+                            },
+                        }
+                        for group, seconds in groups.items()
+                    },
+                }
+        for stage, info in (stage_seconds or {}).items():
+            stages.setdefault(stage, {})["wall_seconds"] = info["seconds"]
+            stages[stage]["calls"] = info["calls"]
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": time.time() - self.started_at,
+            "sample_interval": self.interval,
+            "argv": sys.argv,
+            "stages": stages,
+        }
+
+    def write(self, stage_seconds=None):
+        """
+        Writes <stage>.prof/.txt (cProfile), <stage>.collapsed, all.collapsed
+        and summary.json to output_dir, and zips the directory. Returns the
+        path of the zip archive.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            stats = dict(self._stats)
+            collapsed = {stage: Counter(c) for stage, c in self._collapsed.items()}
+        for stage, stage_stats in stats.items():
+            base = os.path.join(self.output_dir, _safe_name(stage))
+            stage_stats.dump_stats(base + ".prof")
+            text = io.StringIO()
+            stage_stats.stream = text
+            stage_stats.sort_stats("cumulative").print_stats(PSTATS_LINES)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+        with open(
+            os.path.join(self.output_dir, "all.collapsed"), "w", encoding="utf-8"
+        ) as all_file:
+            for stage, stacks in sorted(collapsed.items()):
+                path = os.path.join(self.output_dir, _safe_name(stage) + ".collapsed")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                        all_file.write(f"{stage};{stack} {count}\n")
+        with open(
+            os.path.join(self.output_dir, "summary.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(self.summary(stage_seconds), f, ensure_ascii=False, indent=2)
+        return shutil.make_archive(self.output_dir, "zip", self.output_dir)
@@ -0,0 +1,156 @@
+from ai_subtitle_assistant.core.metrics import registry as metrics
+from ai_subtitle_assistant.core.skip_detection import (
+    _STOPWORDS,
+    _script_counts,
+    detect_latin_language,
+    target_script_share,
+)
+from ai_subtitle_assistant.i18n import _
+
+# 译文与原文的长度比（按加权字符数）超出此范围时视为可疑
+MIN_LENGTH_RATIO = 0.3
+MAX_LENGTH_RATIO = 3.0
+# 原文短于此加权长度时不检查长度比
+MIN_LENGTH_FOR_RATIO = 15
+# 汉字、假名和韩文一个字符承载的信息约等于几个拉丁字母
+WIDE_CHAR_WEIGHT = 2.5
+# 译文中目标文字所占的最低比例（允许夹杂人名等拉丁字母）
+MIN_TARGET_SCRIPT_SHARE = 0.5
+# 日文译文至少这么长时必须含假名，否则可能是中文
+MIN_LETTERS_FOR_KANA = 6
+
+ESCALATION_REASONS = ("missing", "failed", "original_text", "length", "script")
+
+
+def _weighted_length(text):
+    counts = _script_counts(text)
+    wide = counts.get("han", 0) + counts.get("kana", 0) + counts.get("hangul", 0)
+    return len(text.strip()) - wide + wide * WIDE_CHAR_WEIGHT
+
+
+def _normalize(text):
+    return " ".join(text.split())
+
+
+def check_translation(source_text, item, language):
+    """
+    Runs the local checks on one translated item of the fast tier. Returns
+    the reason it should be escalated (see ESCALATION_REASONS) or None.
+    """
+    translated_text = item.get("translated_text")
+    if not isinstance(translated_text, str) or not translated_text.strip():
+        return "failed"
+    if translated_text in (
+        _("[Chunk Translation Failed]"),
+        "[Chunk Translation Failed]",
+    ):
+        return "failed"
+    original_text = item.get("original_text")
+    if isinstance(original_text, str) and _normalize(original_text) != _normalize(
+        source_text
+    ):
+        return "original_text"
+
+    source_length = _weighted_length(source_text)
+    if source_length >= MIN_LENGTH_FOR_RATIO:
+        ratio = _weighted_length(translated_text) / source_length
+        if not MIN_LENGTH_RATIO <= ratio <= MAX_LENGTH_RATIO:
+            return "length"
+
+    share = target_script_share(translated_text, language)
+    if share is not None:
+        if share < MIN_TARGET_SCRIPT_SHARE:
+            return "script"
+        counts = _script_counts(translated_text)
+        if (
+            language.lower() == "japanese"
+            and not counts.get("kana")
+            and sum(counts.values()) >= MIN_LETTERS_FOR_KANA
+        ):
+            return "script"
+    elif language.lower() in _STOPWORDS:
+        # 拉丁字母的目标语言：能识别出语言且不是目标语言（例如原样返回英文）
+        detected = detect_latin_language(translated_text)
+        if detected is not None and detected != language.lower():
+            return "script"
+    return None
+
+
+def check_translations(chunk, translated_chunk, language):
+    """
+    Checks the fast tier's translations of a chunk. Returns {id: reason}
+    for every cue of the chunk that is missing from translated_chunk or
+    fails check_translation.
+    """
+    items = {}
+    for item in translated_chunk:
+        if isinstance(item, dict) and "id" in item:
+            items.setdefault(item["id"], item)
+    failures = {}
+    for segment in chunk:
+        item = items.get(segment["id"])
+        reason = (
+            "missing"
+            if item is None
+            else check_translation(segment["text"], item, language)
+        )
+        if reason is not None:
+            failures[segment["id"]] = reason
+    return failures
+
+
+class RoutingStats:
+    """Counts per tier how many cues were accepted and why cues were escalated."""
+
+    def __init__(self, fast_model, model):
+        self.fast_model = fast_model
+        self.model = model
+        self.accepted = 0
+        self.escalated = 0
+        self.reasons = {}
+
+    def record(self, accepted, failures):
+        self.accepted += accepted
+        self.escalated += len(failures)
+        metrics.increment(
+            "routing_cues",
+            accepted,
+            labels={"tier": "fast", "model": self.fast_model, "result": "accepted"},
+        )
+        metrics.increment(
+            "routing_cues",
+            len(failures),
+            labels={"tier": "fast", "model": self.fast_model, "result": "escalated"},
+        )
+        for reason in failures.values():
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            metrics.increment("routing_escalations", labels={"reason": reason})
+
+    def record_strong(self, cues):
+        metrics.increment(
+            "routing_cues",
+            cues,
+            labels={"tier": "strong", "model": self.model, "result": "accepted"},
+        )
+
+    def summary(self):
+        total = self.accepted + self.escalated
+        share = self.accepted / total if total else 1.0
+        reasons = ", ".join(
+            f"{reason} {count}"
+            for reason, count in sorted(
+                self.reasons.items(), key=lambda item: item[1], reverse=True
+            )
+        )
+        return _(
+            "Routing: {accepted} of {total} cues ({share:.0%}) accepted from {fast_model}; "
+            "{escalated} escalated to {model}{reasons}."
+        ).format(
+            accepted=self.accepted,
+            total=total,
+            share=share,
+            fast_model=self.fast_model,
+            escalated=self.escalated,
+            model=self.model,
+            reasons=f" ({reasons})" if reasons else "",
+        )
@@ -0,0 +1,511 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai_subtitle_assistant.config import (
+    API_KEY_ENV,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    DEFAULT_SERVER_QUEUE_SIZE,
+)
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.i18n import _
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+# 已完成的任务最多保留多少个，超出后丢弃最早完成的
+MAX_FINISHED_JOBS = 200
+POLL_INTERVAL = 0.5  # seconds
+# 共享任务库中清理过期任务的间隔（秒）
+PURGE_INTERVAL = 600
+
+
+def _run_transcribe_job(params, defaults):
+    from ai_subtitle_assistant.core.transcription import transcribe
+    from ai_subtitle_assistant.core.srt_utils import to_srt
+
+    fingerprint_index = None
+    if params.get("fingerprint_index"):
+        from ai_subtitle_assistant.core.fingerprint import DEFAULT_INDEX_FILE, get_index
+
+        fingerprint_index = get_index(
+            DEFAULT_INDEX_FILE
+            if params["fingerprint_index"] == "default"
+            else params["fingerprint_index"]
+        )
+    result = transcribe(
+        params["input_file"],
+        params.get("model", "base"),
+        audio_cache=params.get("audio_cache", True),
+        fingerprint_index=fingerprint_index,
+    )
+    return {"srt": to_srt(result["segments"])}
+
+
+def _configured_key(api_base_url, defaults):
+    """The key this process has configured for api_base_url."""
+    for endpoint in defaults.get("endpoints") or []:
+        if endpoint.get("api_base_url") == api_base_url and endpoint.get("api_key"):
+            return endpoint["api_key"]
+    return os.environ.get(API_KEY_ENV) or defaults.get("api_key")
+
+
+def _job_backend(params, defaults):
+    """
+    Resolves the credentials, endpoint list and backend a translate job uses.
+    Returns (api_base_url, api_key, endpoints, backend). Jobs from a shared
+    JobStore carry no api_key; the key configured for their api_base_url
+    (see _configured_key) is used instead.
+    """
+    api_base_url = params.get("api_base_url") or defaults.get("api_base_url")
+    api_key = params.get("api_key") or _configured_key(api_base_url, defaults)
+    # 任务自带凭据时只使用该端点，否则使用配置中的端点列表
+    endpoints = None
+    if not (params.get("api_base_url") or params.get("api_key")):
+        endpoints = defaults.get("endpoints") or None
+    backend = None
+    if params.get("local_model"):
+        from ai_subtitle_assistant.core.backends import get_local_backend
+
+        backend = get_local_backend(
+            params["local_model"],
+            params.get("local_device", "cpu"),
+            params.get("local_batch_size", 8),
+        )
+    elif not endpoints and (not api_key or not api_base_url):
+        raise ValueError(_("Error: API Key and Base URL must be configured."))
+    return api_base_url, api_key, endpoints, backend
+
+
+def _run_translate_job(params, defaults):
+    from ai_subtitle_assistant.core.translation import (
+        translate_segments,
+        translate_segments_multi,
+    )
+    from ai_subtitle_assistant.core.srt_utils import parse_srt, to_bilingual_srt
+
+    api_base_url, api_key, endpoints, backend = _job_backend(params, defaults)
+
+    segments = parse_srt(params["srt"])
+    if not segments:
+        raise ValueError(_("Error: Could not parse SRT content."))
+    previous = None
+    if params.get("previous_srt"):
+        from ai_subtitle_assistant.core.incremental import parse_bilingual_srt
+
+        previous = {
+            language: parse_bilingual_srt(content, segments)
+            for language, content in params["previous_srt"].items()
+        }
+
+    if params.get("target_languages"):
+        results = translate_segments_multi(
+            segments,
+            params["target_languages"],
+            api_base_url,
+            api_key,
+            params.get("model", "gpt-3.5-turbo"),
+            params.get("max_workers", 5),
+            combined=params.get("combined", False),
+            glossary_mode=params.get("glossary_mode", "off"),
+            context_cues=params.get("context_cues", 0),
+            hedge_percentile=params.get("hedge_percentile"),
+            hedge_budget=params.get("hedge_budget", 0.1),
+            hedge_model=params.get("hedge_model"),
+            fast_model=params.get("fast_model"),
+            endpoints=endpoints,
+            backend=backend,
+            batch=params.get("batch", False),
+            batch_poll_interval=params.get("batch_poll_interval"),
+            batch_timeout=params.get("batch_timeout"),
+            skip_detection=params.get("skip_detection", True),
+            deduplicate=params.get("deduplicate", True),
+            autotune=params.get("autotune", False),
+            structured_output=params.get("structured_output", "auto"),
+            previous=previous,
+        )
+        return {
+            "srt_by_language": {
+                language: to_bilingual_srt(bilingual_subtitles)
+                for language, bilingual_subtitles in results.items()
+            }
+        }
+
+    bilingual_subtitles = translate_segments(
+        segments,
+        params.get("target_language", "Chinese"),
+        api_base_url,
+        api_key,
+        params.get("model", "gpt-3.5-turbo"),
+        params.get("max_workers", 5),
+        glossary_mode=params.get("glossary_mode", "off"),
+        context_cues=params.get("context_cues", 0),
+        hedge_percentile=params.get("hedge_percentile"),
+        hedge_budget=params.get("hedge_budget", 0.1),
+        hedge_model=params.get("hedge_model"),
+        fast_model=params.get("fast_model"),
+        endpoints=endpoints,
+        backend=backend,
+        batch=params.get("batch", False),
+        batch_poll_interval=params.get("batch_poll_interval"),
+        batch_timeout=params.get("batch_timeout"),
+        skip_detection=params.get("skip_detection", True),
+        deduplicate=params.get("deduplicate", True),
+        autotune=params.get("autotune", False),
+        structured_output=params.get("structured_output", "auto"),
+        previous=previous,
+    )
+    return {"srt": to_bilingual_srt(bilingual_subtitles)}
+
+
+def _run_translate_chunk_job(params, defaults):
+    from ai_subtitle_assistant.core.translation import run_chunk_task
+
+    api_base_url, api_key, endpoints, backend = _job_backend(params, defaults)
+    return {
+        "results": run_chunk_task(params, api_base_url, api_key, endpoints, backend)
+    }
+
+
+def _run_transcribe_window_job(params, defaults):
+    from ai_subtitle_assistant.core.transcription import transcribe_window
+
+    return transcribe_window(
+        params["input_file"],
+        params.get("model", "base"),
+        params["start"],
+        params["end"],
+        audio_cache=params.get("audio_cache", True),
+    )
+
+
+_JOB_RUNNERS = {
+    "transcribe": _run_transcribe_job,
+    "translate": _run_translate_job,
+    # 分布式模式下由协调进程拆分出的子任务
+    "translate_chunk": _run_translate_chunk_job,
+    "transcribe_window": _run_transcribe_window_job,
+}
+# 可以通过 HTTP 接口提交的任务类型
+_PUBLIC_JOB_TYPES = ("transcribe", "translate")
+
+
+def job_runners(job_types=None):
+    """
+    Returns {job type: runner(params, defaults)} for job_types, or for every
+    job type; `ai-subtitle worker` runs the jobs of a JobStore with them.
+    Raises KeyError for an unknown type.
+    """
+    if job_types is None:
+        return dict(_JOB_RUNNERS)
+    return {job_type: _JOB_RUNNERS[job_type] for job_type in job_types}
+
+
+class JobManager:
+    """
+    Holds the bounded priority queue of pending jobs, the job registry and the
+    worker threads that execute jobs inside the long-running process.
+    """
+
+    def __init__(self, queue_size=DEFAULT_SERVER_QUEUE_SIZE, workers=2, defaults=None):
+        self.queue = queue.PriorityQueue(maxsize=queue_size)
+        self.jobs = {}
+        self.defaults = defaults or {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._finished = []
+        self._threads = [
+            threading.Thread(target=self._worker, daemon=True) for _i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_type, params, priority=0):
+        """
+        Queues a job. Lower priority values run first.
+        Raises queue.Full when the queue is at capacity.
+        """
+        if job_type not in _PUBLIC_JOB_TYPES:
+            raise ValueError(_("Unknown job type: {type}").format(type=job_type))
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "type": job_type,
+            "priority": priority,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+            "params": params,
+        }
+        with self._lock:
+            self.queue.put_nowait((priority, next(self._counter), job_id))
+            self.jobs[job_id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def queued(self):
+        return self.queue.qsize()
+
+    def status(self, job):
+        """Returns the public view of a job, without params or result."""
+        return {
+            key: job[key]
+            for key in (
+                "id",
+                "type",
+                "priority",
+                "status",
+                "submitted_at",
+                "started_at",
+                "finished_at",
+                "error",
+            )
+        }
+
+    def _worker(self):
+        while True:
+            _priority, _seq, job_id = self.queue.get()
+            job = self.get(job_id)
+            if job is None:
+                self.queue.task_done()
+                continue
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            try:
+                job["result"] = _JOB_RUNNERS[job["type"]](job["params"], self.defaults)
+                job["status"] = "done"
+            except Exception as e:
+                logger.exception(
+                    _("Job {id} failed: {error}").format(id=job_id, error=e)
+                )
+                job["error"] = str(e)
+                job["status"] = "failed"
+            finally:
+                job["finished_at"] = time.time()
+                # 结果已产生，不再需要保留请求参数（可能包含完整的 SRT 内容和密钥）
+                job["params"] = None
+                self._record_finished(job_id)
+                self.queue.task_done()
+
+    def _record_finished(self, job_id):
+        with self._lock:
+            self._finished.append(job_id)
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self._finished.pop(0), None)
+
+
+class StoreJobManager(JobManager):
+    """
+    Puts submitted jobs into a shared JobStore instead of running them in
+    this process; `ai-subtitle worker` processes on any node execute them.
+    Finished jobs are deleted from the store retention seconds after they
+    finished.
+    """
+
+    def __init__(self, store, retention=None):
+        from ai_subtitle_assistant.core.job_store import DEFAULT_JOB_RETENTION
+
+        self.store = store
+        self.retention = DEFAULT_JOB_RETENTION if retention is None else retention
+
+    def start(self):
+        threading.Thread(target=self._purge, daemon=True).start()
+
+    def _purge(self):
+        while True:
+            try:
+                self.store.purge_finished(self.retention)
+            except Exception as e:
+                logger.warning(
+                    _("Warning: Could not purge finished jobs: {e}").format(e=e)
+                )
+            time.sleep(PURGE_INTERVAL)
+
+    def submit(self, job_type, params, priority=0):
+        if job_type not in _PUBLIC_JOB_TYPES:
+            raise ValueError(_("Unknown job type: {type}").format(type=job_type))
+        if params.get("api_key"):
+            logger.warning(
+                _(
+                    "Warning: The job's API key is not stored in the shared job store; "
+                    "workers use the key they have configured for its API base URL "
+                    "or the {env} environment variable."
+                ).format(env=API_KEY_ENV)
+            )
+        return self.store.get(self.store.submit(job_type, params, priority))
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def queued(self):
+        return self.store.queued()
+
+
+def _make_handler(manager):
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.info("[serve] " + format, *args)
+
+        def _send_json(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            if parts == ["metrics"]:
+                from ai_subtitle_assistant.core.metrics import registry
+
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if parts == ["health"]:
+                self._send_json(200, {"status": "ok", "queued": manager.queued()})
+                return
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = manager.get(parts[1])
+                if job is None:
+                    self._send_json(404, {"error": "job not found"})
+                    return
+                if len(parts) == 2:
+                    self._send_json(200, manager.status(job))
+                    return
+                if parts[2] == "result":
+                    if job["status"] == "done":
+                        self._send_json(200, job["result"])
+                    elif job["status"] == "failed":
+                        self._send_json(500, {"error": job["error"]})
+                    else:
+                        self._send_json(409, manager.status(job))
+                    return
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length).decode("utf-8"))
+                job = manager.submit(
+                    payload["type"],
+                    payload.get("params", {}),
+                    int(payload.get("priority", 0)),
+                )
+            except queue.Full:
+                self._send_json(503, {"error": "job queue is full"})
+                return
+            except (KeyError, ValueError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(202, manager.status(job))
+
+    return JobRequestHandler
+
+
+def serve(
+    host=DEFAULT_SERVER_HOST,
+    port=DEFAULT_SERVER_PORT,
+    queue_size=DEFAULT_SERVER_QUEUE_SIZE,
+    workers=2,
+    defaults=None,
+    preload_models=(),
+    job_store=None,
+    job_retention=None,
+):
+    """
+    Runs the job server until interrupted. With job_store (a JobStore) the
+    server only queues jobs there and workers elsewhere run them; finished
+    jobs are deleted job_retention seconds after they finished.
+    """
+    if preload_models and job_store is None:
+        from ai_subtitle_assistant.core.transcription import load_model
+
+        for model_name in preload_models:
+            load_model(model_name)
+
+    if job_store is not None:
+        manager = StoreJobManager(job_store, job_retention)
+    else:
+        manager = JobManager(queue_size=queue_size, workers=workers, defaults=defaults)
+    manager.start()
+    httpd = ThreadingHTTPServer((host, port), _make_handler(manager))
+    logger.info(
+        _("Server listening on http://{host}:{port}").format(host=host, port=port),
+        extra={"color": Fore.GREEN},
+    )
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+
+
+def _request_json(url, payload=None):
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers["Content-Type"] = "application/json; charset=utf-8"
+    request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8") or "{}")
+
+
+def submit_job(server_url, job_type, params, priority=0):
+    """Submits a job to a running server and returns its id."""
+    code, body = _request_json(
+        server_url.rstrip("/") + "/jobs",
+        {"type": job_type, "params": params, "priority": priority},
+    )
+    if code != 202:
+        raise RuntimeError(body.get("error", code))
+    return body["id"]
+
+
+def wait_for_job(server_url, job_id, poll_interval=POLL_INTERVAL):
+    """Polls a job until it finishes and returns its result."""
+    url = server_url.rstrip("/") + "/jobs/" + job_id + "/result"
+    while True:
+        code, body = _request_json(url)
+        if code == 200:
+            return body
+        if code != 409:
+            raise RuntimeError(body.get("error", code))
+        time.sleep(poll_interval)
+
+
+def run_remote_job(server_url, job_type, params, priority=0):
+    """Submits a job and blocks until its result is available."""
+    job_id = submit_job(server_url, job_type, params, priority)
+    logger.info(
+        _("Submitted {type} job {id} to {server}").format(
+            type=job_type, id=job_id, server=server_url
+        ),
+        extra={"color": Fore.BLUE},
+    )
+    return wait_for_job(server_url, job_id)
@@ -0,0 +1,344 @@
+import re
+import unicodedata
+
+# 只包含音乐符号、标点、数字等的行无需翻译
+_MUSIC_RE = re.compile(r"^[\s♪♫♬♩#*~.…\-–—]*$")
+_NUMBERS_RE = re.compile(r"^[\s\d.,:;!?%+\-–—/()#$€£¥'\"]*$")
+_SOUND_TAG_RE = re.compile(r"^\s*[\[(]\s*([^\[\]()]{1,40}?)\s*[\])]\s*$")
+# 单独一行的说话人标签，例如 "JOHN:" 或 ">> MARY:"
+_SPEAKER_TAG_RE = re.compile(r"^\s*(?:>>|-)?\s*[A-Z][A-Z0-9 .'_-]{0,30}:\s*$")
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# 常见音效标签在各目标语言中的写法（英文标签直接保留）
+SOUND_TAG_TEMPLATES = {
+    "music": {
+        "Chinese": "[音乐]",
+        "Japanese": "[音楽]",
+        "Korean": "[음악]",
+        "Spanish": "[MÚSICA]",
+        "French": "[MUSIQUE]",
+        "German": "[MUSIK]",
+    },
+    "applause": {
+        "Chinese": "[掌声]",
+        "Japanese": "[拍手]",
+        "Korean": "[박수]",
+        "Spanish": "[APLAUSOS]",
+        "French": "[APPLAUDISSEMENTS]",
+        "German": "[APPLAUS]",
+    },
+    "laughter": {
+        "Chinese": "[笑声]",
+        "Japanese": "[笑い声]",
+        "Korean": "[웃음]",
+        "Spanish": "[RISAS]",
+        "French": "[RIRES]",
+        "German": "[GELÄCHTER]",
+    },
+    "silence": {
+        "Chinese": "[静默]",
+        "Japanese": "[沈黙]",
+        "Korean": "[침묵]",
+        "Spanish": "[SILENCIO]",
+        "French": "[SILENCE]",
+        "German": "[STILLE]",
+    },
+    "inaudible": {
+        "Chinese": "[听不清]",
+        "Japanese": "[聞き取れない]",
+        "Korean": "[들리지 않음]",
+        "Spanish": "[INAUDIBLE]",
+        "French": "[INAUDIBLE]",
+        "German": "[UNVERSTÄNDLICH]",
+    },
+}
+_SOUND_TAG_ALIASES = {
+    "music": "music",
+    "music playing": "music",
+    "upbeat music": "music",
+    "soft music": "music",
+    "applause": "applause",
+    "applauding": "applause",
+    "laughter": "laughter",
+    "laughing": "laughter",
+    "laughs": "laughter",
+    "silence": "silence",
+    "inaudible": "inaudible",
+}
+
+# 目标语言对应的文字系统
+_LANGUAGE_SCRIPTS = {
+    "chinese": "han",
+    "japanese": "japanese",
+    "korean": "hangul",
+    "russian": "cyrillic",
+    "ukrainian": "cyrillic",
+    "arabic": "arabic",
+    "hebrew": "hebrew",
+    "greek": "greek",
+    "thai": "thai",
+    "hindi": "devanagari",
+}
+# 使用拉丁字母的语言通过常用虚词粗略识别
+_STOPWORDS = {
+    "english": {
+        "the",
+        "and",
+        "is",
+        "are",
+        "you",
+        "to",
+        "of",
+        "it",
+        "that",
+        "what",
+        "this",
+        "a",
+        "in",
+        "i",
+        "we",
+        "not",
+        "have",
+        "be",
+        "do",
+        "was",
+    },
+    "spanish": {
+        "el",
+        "la",
+        "los",
+        "las",
+        "y",
+        "es",
+        "que",
+        "de",
+        "no",
+        "en",
+        "un",
+        "una",
+        "por",
+        "qué",
+        "con",
+        "se",
+        "lo",
+        "está",
+        "estoy",
+        "yo",
+    },
+    "french": {
+        "le",
+        "la",
+        "les",
+        "et",
+        "est",
+        "que",
+        "de",
+        "ne",
+        "pas",
+        "en",
+        "un",
+        "une",
+        "je",
+        "tu",
+        "vous",
+        "il",
+        "c'est",
+        "qu'est",
+        "du",
+        "des",
+    },
+    "german": {
+        "der",
+        "die",
+        "das",
+        "und",
+        "ist",
+        "nicht",
+        "ich",
+        "du",
+        "sie",
+        "es",
+        "ein",
+        "eine",
+        "zu",
+        "mit",
+        "was",
+        "wir",
+        "den",
+        "dem",
+        "auf",
+        "bin",
+    },
+    "italian": {
+        "il",
+        "la",
+        "e",
+        "è",
+        "che",
+        "di",
+        "non",
+        "un",
+        "una",
+        "per",
+        "sono",
+        "io",
+        "tu",
+        "lo",
+        "gli",
+        "le",
+        "con",
+        "cosa",
+        "questo",
+        "mi",
+    },
+    "portuguese": {
+        "o",
+        "a",
+        "os",
+        "as",
+        "e",
+        "é",
+        "que",
+        "de",
+        "não",
+        "em",
+        "um",
+        "uma",
+        "eu",
+        "você",
+        "por",
+        "com",
+        "isso",
+        "está",
+        "se",
+        "do",
+    },
+}
+# 判定为目标文字/目标语言所需的最低比例
+SCRIPT_RATIO = 0.9
+STOPWORD_RATIO = 0.3
+MIN_WORDS_FOR_LANGUAGE_ID = 4
+
+
+def _script_of(char):
+    code = ord(char)
+    if 0x3040 <= code <= 0x30FF:
+        return "kana"
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+        return "han"
+    if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF:
+        return "hangul"
+    name = unicodedata.name(char, "")
+    for script in (
+        "LATIN",
+        "CYRILLIC",
+        "ARABIC",
+        "HEBREW",
+        "GREEK",
+        "THAI",
+        "DEVANAGARI",
+    ):
+        if name.startswith(script):
+            return script.lower()
+    return "other"
+
+
+def _script_counts(text):
+    counts = {}
+    for char in text:
+        if char.isalpha():
+            script = _script_of(char)
+            counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def _in_target_script(text, language):
+    script = _LANGUAGE_SCRIPTS.get(language.lower())
+    counts = _script_counts(text)
+    total = sum(counts.values())
+    if not script or not total:
+        return False
+    if script == "japanese":
+        # 日文必须含假名，否则可能是中文
+        return (
+            counts.get("kana", 0) > 0
+            and (counts.get("kana", 0) + counts.get("han", 0)) / total >= SCRIPT_RATIO
+        )
+    if script == "han":
+        return (
+            counts.get("kana", 0) == 0 and counts.get("han", 0) / total >= SCRIPT_RATIO
+        )
+    return counts.get(script, 0) / total >= SCRIPT_RATIO
+
+
+def target_script_share(text, language):
+    """
+    Returns the share of the letters in text that are written in the script
+    of the target language (kana and han for Japanese), or None when the
+    language's script is unknown or the text has no letters.
+    """
+    script = _LANGUAGE_SCRIPTS.get(language.lower())
+    counts = _script_counts(text)
+    total = sum(counts.values())
+    if not script or not total:
+        return None
+    if script == "japanese":
+        return (counts.get("kana", 0) + counts.get("han", 0)) / total
+    return counts.get(script, 0) / total
+
+
+def detect_latin_language(text):
+    """
+    Guesses the language of a Latin-script line from its function words.
+    Returns the lower-case language name, or None when unsure.
+    """
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    if len(words) < MIN_WORDS_FOR_LANGUAGE_ID:
+        return None
+    scores = {
+        language: sum(1 for word in words if word in stopwords)
+        for language, stopwords in _STOPWORDS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    best, best_score = ranked[0]
+    if best_score / len(words) < STOPWORD_RATIO or best_score <= ranked[1][1] * 1.5:
+        return None
+    return best
+
+
+def classify(text, target_language):
+    """
+    Decides whether a cue can bypass the LLM. Returns (reason, output) for
+    cues that need no translation, or None when the cue must be translated.
+    """
+    stripped = text.strip()
+    if not stripped:
+        return "empty", ""
+    if _MUSIC_RE.match(stripped):
+        return "music", stripped
+    if _NUMBERS_RE.match(stripped):
+        return "numbers", stripped
+    if _SPEAKER_TAG_RE.match(stripped):
+        return "speaker_tag", stripped
+    tag = _SOUND_TAG_RE.match(stripped)
+    if tag:
+        key = _SOUND_TAG_ALIASES.get(tag.group(1).lower())
+        if key is not None:
+            if target_language.lower() == "english":
+                return "sound_tag", stripped
+            for language, output in SOUND_TAG_TEMPLATES[key].items():
+                if language.lower() == target_language.lower():
+                    return "sound_tag", output
+        # 未知的标签或目标语言没有模板时交给模型翻译
+        return None
+    if _in_target_script(stripped, target_language):
+        return "target_language", stripped
+    counts = _script_counts(stripped)
+    if (
+        target_language.lower() in _STOPWORDS
+        and counts
+        and counts.get("latin", 0) == sum(counts.values())
+        and detect_latin_language(stripped) == target_language.lower()
+    ):
+        return "target_language", stripped
+    return None
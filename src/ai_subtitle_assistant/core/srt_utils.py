@@ -1,5 +1,7 @@
 import srt
+import threading
 from datetime import timedelta
+from ai_subtitle_assistant.core.metrics import registry as metrics
 
 
 def to_srt(segments):
@@ -18,7 +20,23 @@ def to_srt(segments):
             content=segment["text"].strip(),
         )
         subs.append(subtitle)
-    return srt.compose(subs)
+    with metrics.stage("srt.compose"):
+        return srt.compose(subs)
+
+
+def _bilingual_subtitle(index, sub_data):
+    content = f"{sub_data['translated_text']}\n{sub_data['original_text']}"
+    start_time = (
+        sub_data["start"]
+        if isinstance(sub_data["start"], timedelta)
+        else timedelta(seconds=sub_data["start"])
+    )
+    end_time = (
+        sub_data["end"]
+        if isinstance(sub_data["end"], timedelta)
+        else timedelta(seconds=sub_data["end"])
+    )
+    return srt.Subtitle(index=index, start=start_time, end=end_time, content=content)
 
 
 def to_bilingual_srt(bilingual_subtitles):
@@ -30,29 +48,54 @@ def to_bilingual_srt(bilingual_subtitles):
     """
     subs = []
     for i, sub_data in enumerate(bilingual_subtitles):
-        content = f"{sub_data['translated_text']}\n{sub_data['original_text']}"
-        start_time = (
-            sub_data["start"]
-            if isinstance(sub_data["start"], timedelta)
-            else timedelta(seconds=sub_data["start"])
-        )
-        end_time = (
-            sub_data["end"]
-            if isinstance(sub_data["end"], timedelta)
-            else timedelta(seconds=sub_data["end"])
-        )
-        subtitle = srt.Subtitle(
-            index=i + 1, start=start_time, end=end_time, content=content
-        )
-        subs.append(subtitle)
-    return srt.compose(subs)
+        subs.append(_bilingual_subtitle(i + 1, sub_data))
+    with metrics.stage("srt.compose"):
+        return srt.compose(subs)
+
+
+class OrderedBilingualWriter:
+    """
+    Streams bilingual subtitles to a file object as translated chunks arrive.
+    Chunks may complete in any order; they are buffered until every earlier
+    chunk has been written, so the output is always a valid SRT prefix.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.cues_written = 0
+        self._pending = {}
+        self._next_position = 0
+        self._lock = threading.Lock()
+
+    def add(self, position, bilingual_subtitles):
+        """Accepts the subtitles of the chunk at the given position."""
+        with self._lock:
+            self._pending[position] = bilingual_subtitles
+            while self._next_position in self._pending:
+                self._write(self._pending.pop(self._next_position))
+                self._next_position += 1
+            self.stream.flush()
+
+    def _write(self, bilingual_subtitles):
+        subs = [_bilingual_subtitle(0, sub_data) for sub_data in bilingual_subtitles]
+        # 与 srt.compose 一致：排序、重新编号并跳过无效的字幕
+        for subtitle in srt.sort_and_reindex(subs, start_index=self.cues_written + 1):
+            self.stream.write(subtitle.to_srt())
+            self.cues_written += 1
+
+    @property
+    def pending_chunks(self):
+        """Number of finished chunks still waiting for an earlier chunk."""
+        with self._lock:
+            return len(self._pending)
 
 
 def parse_srt(srt_content):
     """
     Parses SRT content from a string and converts it to a segment list.
     """
-    subs = list(srt.parse(srt_content))
+    with metrics.stage("srt.parse"):
+        subs = list(srt.parse(srt_content))
     segments = []
     for i, sub in enumerate(subs):
         # 保留所有原文内容（多行内容也完整保留）
@@ -1,20 +1,224 @@
+import os
+import threading
 import whisper
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
 from ai_subtitle_assistant.i18n import _
-from colorama import Fore, Style, init
+from colorama import Fore
 
-init(autoreset=True)
+logger = get_logger(__name__)
 
+# 已加载的 Whisper 模型缓存，供常驻服务复用
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+# 每个模型一把锁，Whisper 模型不能被多个线程同时使用
+_model_locks = {}
+# 分布式转录时每个音频窗口的长度（秒）
+DEFAULT_WINDOW_SECONDS = 600
 
-def transcribe(audio_file, model_name="base"):
+
+def load_model(model_name="base"):
+    """
+    Loads a Whisper model, reusing an already loaded instance when possible.
+    """
+    with _model_cache_lock:
+        model = _model_cache.get(model_name)
+        metrics.record_cache("whisper_model", model is not None)
+        if model is None:
+            logger.info(
+                _("Loading Whisper model '{model_name}'...").format(
+                    model_name=model_name
+                ),
+                extra={"color": Fore.BLUE},
+            )
+            with metrics.stage("transcribe.load_model"):
+                model = whisper.load_model(model_name)
+            _model_cache[model_name] = model
+            _model_locks[model_name] = threading.Lock()
+        return model
+
+
+def _clips_outside(spans, duration):
+    """Returns the flat [start, end, ...] list of the parts of [0, duration] outside spans."""
+    clips = []
+    position = 0.0
+    for start, end in spans:
+        if start > position:
+            clips.extend([position, start])
+        position = max(position, end)
+    if position < duration:
+        clips.extend([position, duration])
+    return clips
+
+
+def _merge_reused(result, reused, spans):
+    """Adds the reused segments to a Whisper result, in time order."""
+    segments = [
+        segment
+        for segment in result["segments"]
+        # 片段边界附近模型可能重复转录已复用的部分，丢弃中点落在复用区域内的片段
+        if not any(
+            start <= (segment["start"] + segment["end"]) / 2 <= end
+            for start, end in spans
+        )
+    ] + reused
+    segments.sort(key=lambda segment: segment["start"])
+    for index, segment in enumerate(segments):
+        segment["id"] = index
+    result["segments"] = segments
+    result["text"] = "".join(segment["text"] for segment in segments)
+    return result
+
+
+def _load_audio(audio_file, audio_cache):
+    if audio_cache:
+        from ai_subtitle_assistant.core.audio_cache import load_pcm
+
+        with metrics.stage("transcribe.load_audio"):
+            return load_pcm(audio_file)
+    with metrics.stage("transcribe.load_audio"):
+        return whisper.load_audio(audio_file)
+
+
+def _windows(clips, window_seconds):
+    """Cuts the [start, end, ...] clips into (start, end) windows of at most window_seconds."""
+    windows = []
+    for clip_start, clip_end in zip(clips[::2], clips[1::2]):
+        position = clip_start
+        while position < clip_end:
+            windows.append((position, min(position + window_seconds, clip_end)))
+            position += window_seconds
+    return windows
+
+
+def transcribe_window(audio_file, model_name, start, end, audio_cache=True):
+    """
+    Transcribes the [start, end] seconds of an audio file. Used by workers
+    for the transcribe_window jobs of a distributed transcription.
+    """
+    audio = _load_audio(audio_file, audio_cache)
+    model = load_model(model_name)
+    with _model_locks[model_name], metrics.stage("transcribe.decode"):
+        result = model.transcribe(audio, verbose=None, clip_timestamps=[start, end])
+    return {
+        "segments": [
+            {"start": s["start"], "end": s["end"], "text": s["text"]}
+            for s in result["segments"]
+        ],
+        "language": result.get("language"),
+    }
+
+
+def _transcribe_distributed(
+    audio_file, model_name, clips, audio_cache, job_store, window_seconds
+):
+    """Transcribes the clips as transcribe_window jobs run by workers."""
+    from ai_subtitle_assistant.core.job_store import run_distributed
+
+    windows = _windows(clips, window_seconds)
+    results = [None] * len(windows)
+    for index, result in run_distributed(
+        job_store,
+        "transcribe_window",
+        [
+            {
+                "input_file": os.path.abspath(audio_file),
+                "model": model_name,
+                "start": start,
+                "end": end,
+                "audio_cache": audio_cache,
+            }
+            for start, end in windows
+        ],
+    ):
+        if result is None:
+            raise RuntimeError(
+                _("Transcription of {start:.0f}s-{end:.0f}s failed.").format(
+                    start=windows[index][0], end=windows[index][1]
+                )
+            )
+        results[index] = result
+    return {
+        "segments": [segment for result in results for segment in result["segments"]],
+        "language": next(
+            (result["language"] for result in results if result["language"]), None
+        ),
+    }
+
+
+def transcribe(
+    audio_file,
+    model_name="base",
+    audio_cache=True,
+    fingerprint_index=None,
+    job_store=None,
+    window_seconds=DEFAULT_WINDOW_SECONDS,
+):
     """
     Transcribes an audio file using Whisper.
+    With audio_cache, the decoded audio is read from (and saved to) the
+    shared PCM cache instead of being decoded by ffmpeg on every run.
+
+    With fingerprint_index (a FingerprintIndex), regions whose audio matches
+    a previously transcribed file (same model) are not sent to Whisper; the
+    stored segments are reused with shifted timestamps, and this file is
+    added to the index afterwards.
+
+    With job_store (a JobStore), the audio is cut into windows of
+    window_seconds that `ai-subtitle worker` processes transcribe in
+    parallel; the input file must be readable at the same path by them.
     """
-    print(
-        Fore.BLUE
-        + _("Loading Whisper model '{model_name}'...").format(model_name=model_name)
-    )
-    model = whisper.load_model(model_name)
-    print(Fore.BLUE + _("Model loaded. Starting transcription..."))
-    result = model.transcribe(audio_file, verbose=True)
-    print(Fore.GREEN + _("Transcription finished."))
+    audio = audio_file
+    if audio_cache or fingerprint_index is not None or job_store is not None:
+        audio = _load_audio(audio_file, audio_cache)
+
+    reused, spans = [], []
+    if fingerprint_index is not None:
+        from ai_subtitle_assistant.core.audio_cache import content_hash
+        from ai_subtitle_assistant.core.fingerprint import fingerprint
+
+        with metrics.stage("transcribe.fingerprint"):
+            hashes, frames = fingerprint(audio)
+        with metrics.stage("transcribe.fingerprint_match"):
+            reused, spans = fingerprint_index.find_reusable(hashes, frames, model_name)
+        reused_seconds = sum(end - start for start, end in spans)
+        metrics.increment("fingerprint_reused_segments", len(reused))
+        metrics.increment("fingerprint_reused_seconds", reused_seconds)
+        if spans:
+            logger.info(
+                _(
+                    "Reusing {count} segments from {seconds:.0f}s of previously transcribed audio."
+                ).format(count=len(reused), seconds=reused_seconds),
+                extra={"color": Fore.CYAN},
+            )
+
+    clips = None
+    if spans or job_store is not None:
+        from ai_subtitle_assistant.core.audio_cache import SAMPLE_RATE
+
+        clips = _clips_outside(spans, len(audio) / SAMPLE_RATE)
+    if clips == []:
+        # 整个文件都已有可复用的转录结果，无需加载模型
+        result = {"segments": [], "language": None}
+    elif job_store is not None:
+        result = _transcribe_distributed(
+            audio_file, model_name, clips, audio_cache, job_store, window_seconds
+        )
+    else:
+        model = load_model(model_name)
+        logger.info(
+            _("Model loaded. Starting transcription..."), extra={"color": Fore.BLUE}
+        )
+        options = {"clip_timestamps": clips} if clips else {}
+        with _model_locks[model_name], metrics.stage("transcribe.decode"):
+            result = model.transcribe(audio, verbose=True, **options)
+    if clips is not None:
+        result = _merge_reused(result, reused, spans)
+    logger.info(_("Transcription finished."), extra={"color": Fore.GREEN})
+
+    if fingerprint_index is not None:
+        with metrics.stage("transcribe.fingerprint_index"):
+            fingerprint_index.add(
+                content_hash(audio_file), model_name, hashes, frames, result["segments"]
+            )
     return result
@@ -2,33 +2,20 @@ import openai
 import json
 import time
 from datetime import timedelta
-import sys
-import os
 import concurrent.futures
 import threading
 from tqdm import tqdm
+from ai_subtitle_assistant.core.json_repair import TruncatedJSONError, loads_tolerant
+from ai_subtitle_assistant.core.log import flush_logs, get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
 from ai_subtitle_assistant.i18n import _
-from colorama import Fore, Style
-
-# 调试模式标志
-DEBUG_MODE = os.environ.get("AI_SUBTITLE_DEBUG", "0") == "1"
-# 线程锁，用于确保调试输出的线程安全
-_debug_lock = threading.Lock()
-
-
-def debug_print(message, data=None):
-    """调试输出函数"""
-    if DEBUG_MODE:
-        with _debug_lock:
-            print(f"\n[DEBUG] {message}", file=sys.stderr)
-            if data is not None:
-                if isinstance(data, str):
-                    print(data, file=sys.stderr)
-                else:
-                    print(
-                        json.dumps(data, ensure_ascii=False, indent=2), file=sys.stderr
-                    )
-            print("-" * 50, file=sys.stderr)
+from colorama import Fore
+
+logger = get_logger(__name__)
+
+# OpenAI 客户端缓存，复用底层的 HTTP 连接池
+_client_cache = {}
+_client_cache_lock = threading.Lock()
 
 
 # Define a safe character count threshold to avoid token limits
@@ -36,21 +23,172 @@ def debug_print(message, data=None):
 CHUNK_SIZE_LIMIT = 8000
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
+# 每个块前后附带的只读上下文字幕条数，0 表示不附带
+DEFAULT_CONTEXT_CUES = 0
+# 对冲请求：块耗时超过本次运行中已完成块耗时的该百分位时，再发送一份副本
+DEFAULT_HEDGE_PERCENTILE = 95
+# 对冲请求最多占块数的比例
+DEFAULT_HEDGE_BUDGET = 0.1
+HEDGE_MIN_SAMPLES = 3
+HEDGE_MIN_DELAY = 1.0  # seconds
+HEDGE_POLL_INTERVAL = 0.1  # seconds
+# 调度器添加到任务副本上的运行状态
+_DISPATCH_KEYS = ("cancel_event", "autotuner", "hedge", "started_at", "elapsed")
+# 结构化输出方式，见 core.backends.STRUCTURED_OUTPUT_MODES
+DEFAULT_STRUCTURED_OUTPUT = "auto"
 
 
-def _translate_chunk(client, chunk_segments, target_language, model):
-    debug_print(f"翻译块开始，使用模型: {model}，目标语言: {target_language}")
-    debug_print("输入段落:", chunk_segments)
+def get_client(api_base_url, api_key):
     """
-    Translates a single chunk of text with retry logic.
+    Returns an OpenAI client for the given endpoint, reusing cached instances
+    so that repeated jobs share the same connection pool.
     """
-    if not chunk_segments:
-        return []
+    key = (api_base_url, api_key)
+    with _client_cache_lock:
+        client = _client_cache.get(key)
+        metrics.record_cache("llm_client", client is not None)
+        if client is None:
+            client = openai.OpenAI(base_url=api_base_url, api_key=api_key)
+            _client_cache[key] = client
+        return client
+
+
+_OUTPUT_FORMAT = """Your output MUST be a valid JSON object that can be parsed by a JSON loader. The JSON object should contain a key "translations" which is an array of objects, with each object containing:
+1. The original "id"
+2. The "original_text" (exactly as provided, do not modify it)
+3. The "translated_text" (your translation)
+
+Do NOT add any extra explanations or text outside of the JSON object. The structure must be:
+{
+  "translations": [
+    {
+      "id": <original_id>,
+      "original_text": "<original_text_exactly_as_provided>",
+      "translated_text": "<your_translation>"
+    },
+    ...
+  ]
+}
+
+"""
+
+_MULTI_OUTPUT_FORMAT = """Your output MUST be a valid JSON object that can be parsed by a JSON loader. The JSON object should contain a key "translations" which is an array of objects, with each object containing:
+1. The original "id"
+2. The "original_text" (exactly as provided, do not modify it)
+3. The "translated_text", an object mapping each target language name ({language_keys}) to your translation into that language
+
+Do NOT add any extra explanations or text outside of the JSON object. The structure must be:
+{
+  "translations": [
+    {
+      "id": <original_id>,
+      "original_text": "<original_text_exactly_as_provided>",
+      "translated_text": {
+        "<language>": "<your_translation>",
+        ...
+      }
+    },
+    ...
+  ]
+}
+
+"""
+
+
+def _format_hints(hints):
+    """
+    Formats translation memory matches as few-shot examples for the prompt.
+    """
+    if not hints:
+        return ""
+    lines = [
+        "TRANSLATION MEMORY:",
+        "These similar lines were translated before. Reuse their wording and terminology where it fits, but translate only each segment's own content:",
+    ]
+    for hint in hints:
+        language = f" ({hint['language']})" if hint.get("language") else ""
+        lines.append(
+            f"- {json.dumps(hint['source_text'], ensure_ascii=False)} -> "
+            f"{json.dumps(hint['translated_text'], ensure_ascii=False)}{language}"
+        )
+    return "\n".join(lines) + "\n\n"
+
+
+def _format_glossary(glossary):
+    """
+    Formats the file glossary ({language: {term: translation or None}}) for
+    the prompt so that names are rendered the same way in every chunk.
+    """
+    terms = {}
+    for language, entries in (glossary or {}).items():
+        for term, translation in entries.items():
+            terms.setdefault(term, {})
+            if translation:
+                terms[term][language] = translation
+    if not terms:
+        return ""
+    lines = [
+        "GLOSSARY:",
+        "These names and terms occur throughout the file. Render them consistently, using the given translation where there is one:",
+    ]
+    for term, translations in terms.items():
+        line = f"- {json.dumps(term, ensure_ascii=False)}"
+        if len(glossary) == 1 and translations:
+            line += f" -> {json.dumps(next(iter(translations.values())), ensure_ascii=False)}"
+        elif translations:
+            line += " -> " + ", ".join(
+                f"{language}: {json.dumps(translation, ensure_ascii=False)}"
+                for language, translation in translations.items()
+            )
+        lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def _format_context(context):
+    """
+    Formats the read-only cues around a chunk. They help with pronouns and
+    sentences that cross the chunk boundary but are never translated.
+    context["around"] holds unchanged cues with their existing translations
+    when only the edited cues of a file are re-translated.
+    """
+    if not context or not (
+        context.get("before") or context.get("after") or context.get("around")
+    ):
+        return ""
+    lines = [
+        "CONTEXT (READ-ONLY):",
+        "These neighbouring segments are given only to help you understand the text at the start and end of this batch. Do NOT translate them and do NOT include them in your output.",
+    ]
+    if context.get("before"):
+        lines.append("Segments immediately before:")
+        lines.append(json.dumps(context["before"], ensure_ascii=False, indent=2))
+    if context.get("after"):
+        lines.append("Segments immediately after:")
+        lines.append(json.dumps(context["after"], ensure_ascii=False, indent=2))
+    if context.get("around"):
+        lines.append(
+            "Unchanged segments next to the ones to translate, with their existing translations. Keep your translations consistent with them:"
+        )
+        lines.append(json.dumps(context["around"], ensure_ascii=False, indent=2))
+    return "\n".join(lines) + "\n\n"
 
-    segments_json_str = json.dumps(chunk_segments, ensure_ascii=False, indent=2)
 
-    prompt = f"""
-You are a professional subtitle translator. Your task is to translate the following subtitle segments into {target_language}.
+def _build_prompt(
+    chunk_segments,
+    target_language,
+    output_format=_OUTPUT_FORMAT,
+    hints=None,
+    glossary=None,
+    context=None,
+):
+    """
+    Builds the user prompt for translating a chunk of segments.
+    """
+    segments_json_str = json.dumps(chunk_segments, ensure_ascii=False, indent=2)
+    hints_str = (
+        _format_glossary(glossary) + _format_hints(hints) + _format_context(context)
+    )
+    return f"""You are a professional subtitle translator. Your task is to translate the following subtitle segments into {target_language}.
 The input is a JSON array of objects, where each object has an "id" and a "text" from the original ASR (Automatic Speech Recognition).
 
 CRITICAL TRANSLATION RULES:
@@ -85,243 +223,874 @@ INCORRECT TRANSLATIONS (DO NOT DO THIS):
 
 IMPORTANT: Even if a sentence is split across multiple segments, each segment must be translated separately. Do not attempt to create a more natural flow by moving content between segments.
 
-Your output MUST be a valid JSON object that can be parsed by a JSON loader. The JSON object should contain a key "translations" which is an array of objects, with each object containing:
-1. The original "id"
-2. The "original_text" (exactly as provided, do not modify it)
-3. The "translated_text" (your translation)
-
-Do NOT add any extra explanations or text outside of the JSON object. The structure must be:
-{{
-  "translations": [
-    {{
-      "id": <original_id>,
-      "original_text": "<original_text_exactly_as_provided>",
-      "translated_text": "<your_translation>"
-    }},
-    ...
-  ]
-}}
-
-Here is the JSON data to translate:
+{hints_str}{output_format}Here is the JSON data to translate:
 {segments_json_str}
 """
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            debug_print("发送到API的提示:", prompt)
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are a professional subtitle translator translating subtitles into {target_language}. Your output must be a valid JSON object.",
+
+def _translation_schema(target_languages=None):
+    """
+    The JSON schema of a translation reply, for structured output. With
+    target_languages, translated_text maps each language to its translation.
+    """
+    translated_text = {"type": "string"}
+    if target_languages is not None:
+        translated_text = {
+            "type": "object",
+            "properties": {
+                language: {"type": "string"} for language in target_languages
+            },
+            "required": list(target_languages),
+            "additionalProperties": False,
+        }
+    return {
+        "name": "subtitle_translations",
+        "description": "The translation of every subtitle segment.",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "translations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "original_text": {"type": "string"},
+                            "translated_text": translated_text,
+                        },
+                        "required": ["id", "original_text", "translated_text"],
+                        "additionalProperties": False,
                     },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.7,
-                response_format={"type": "json_object"},
+                }
+            },
+            "required": ["translations"],
+            "additionalProperties": False,
+        },
+    }
+
+
+def _parse_translations(response_content, chunk_segments):
+    """
+    Parses a model response into its "translations" list, raising ValueError
+    when no translation can be recovered or the structure is wrong.
+    Malformed or truncated JSON is repaired (see core.json_repair); returns
+    (translations, complete), where complete is False if the reply was cut
+    short and the items after the last complete one are missing.
+    """
+    response_data, truncated = loads_tolerant(response_content or "")
+    if truncated:
+        metrics.increment("truncated_responses_repaired")
+        logger.debug("回复被截断，已恢复完整的条目")
+
+    # Basic validation
+    if (
+        isinstance(response_data, dict)
+        and "translations" in response_data
+        and isinstance(response_data["translations"], list)
+    ):
+        # 丢弃缺少字段的条目（例如截断处不完整的最后一条）
+        translations = [
+            item
+            for item in response_data["translations"]
+            if isinstance(item, dict) and "id" in item and "translated_text" in item
+        ]
+        if truncated and not translations:
+            raise TruncatedJSONError(
+                _("The response was cut off before the first complete translation")
             )
-            response_content = response.choices[0].message.content
-            debug_print("API响应:", response_content)
-            response_data = json.loads(response_content)
+        logger.debug("解析后的翻译:", extra={"payload": translations})
 
-            # Basic validation
-            if "translations" in response_data and isinstance(
-                response_data["translations"], list
-            ):
-                translations = response_data.get("translations", [])
-                debug_print("解析后的翻译:", translations)
-
-                # 检查返回的翻译数量是否与输入段落数量一致
-                if len(translations) != len(chunk_segments):
-                    print(
-                        Fore.YELLOW
-                        + _(
-                            "Warning: Translation count mismatch. Expected {expected}, got {actual}. "
-                            "This may be due to model context limits. Consider using a model with larger context or reducing input size."
-                        ).format(expected=len(chunk_segments), actual=len(translations))
-                        + Style.RESET_ALL,
-                        file=sys.stderr,
-                    )
+        # 检查返回的翻译数量是否与输入段落数量一致
+        if not truncated and len(translations) != len(chunk_segments):
+            logger.warning(
+                _(
+                    "Warning: Translation count mismatch. Expected {expected}, got {actual}. "
+                    "This may be due to model context limits. Consider using a model with larger context or reducing input size."
+                ).format(expected=len(chunk_segments), actual=len(translations))
+            )
+
+        return translations, not truncated
+    elif truncated:
+        raise TruncatedJSONError(
+            _("The response was cut off before the first complete translation")
+        )
+    else:
+        raise ValueError(_("Invalid JSON structure in response"))
 
-                return translations
-            else:
-                raise ValueError(_("Invalid JSON structure in response"))
+
+def _request_translations(
+    backend,
+    chunk_segments,
+    prompt,
+    system_prompt,
+    model,
+    cancel_event=None,
+    tuner=None,
+    schema=None,
+):
+    """
+    Sends a translation prompt with retry logic and returns the parsed
+    "translations" list, or None if every attempt failed or cancel_event
+    was set (another copy of the request already answered). The list may
+    lack the last items of a truncated reply; see _parse_translations.
+    schema asks the backend for structured output (see _translation_schema).
+    With the remote backend every attempt picks an endpoint from its pool,
+    so retries fail over to other providers. Every attempt's latency or
+    error is reported to tuner (a TunerGroup) if given, for the endpoint
+    and model that served it.
+    """
+    for attempt in range(MAX_RETRIES):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        started_at = time.monotonic()
+        try:
+            logger.debug("发送到API的提示:", extra={"payload": prompt})
+            response_content = backend.complete(
+                system_prompt, prompt, model, schema=schema
+            )
+            logger.debug("API响应:", extra={"payload": response_content})
+            translations, complete = _parse_translations(
+                response_content, chunk_segments
+            )
+            if tuner is not None:
+                target = backend.last_target()
+                if complete and backend.last_finish_reason() != "length":
+                    tuner.record_success(
+                        started_at, time.monotonic() - started_at, len(prompt), target
+                    )
+                else:
+                    tuner.record_failure(started_at, "truncated", target)
+            return translations
 
         except Exception as e:
+            metrics.increment("llm_request_errors", labels={"model": model})
+            if tuner is not None:
+                from ai_subtitle_assistant.core.autotune import classify_error
+
+                tuner.record_failure(
+                    started_at,
+                    classify_error(e, backend.last_finish_reason()),
+                    backend.last_target(),
+                )
             # 检查是否是JSON截断错误
             if "Unterminated string" in str(e) or "JSON" in str(e):
-                print(
-                    Fore.YELLOW
-                    + _("Attempt {attempt}/{max_retries} failed: {e}").format(
+                logger.warning(
+                    _("Attempt {attempt}/{max_retries} failed: {e}").format(
                         attempt=attempt + 1, max_retries=MAX_RETRIES, e=e
                     )
-                    + Style.RESET_ALL,
-                    file=sys.stderr,
                 )
-                print(
-                    Fore.YELLOW
-                    + _(
+                logger.warning(
+                    _(
                         "Warning: Output may be truncated due to model context limits. Consider using a model with larger context or reducing input size."
                     )
-                    + Style.RESET_ALL,
-                    file=sys.stderr,
                 )
             else:
-                print(
-                    Fore.YELLOW
-                    + _("Attempt {attempt}/{max_retries} failed: {e}").format(
+                logger.warning(
+                    _("Attempt {attempt}/{max_retries} failed: {e}").format(
                         attempt=attempt + 1, max_retries=MAX_RETRIES, e=e
                     )
-                    + Style.RESET_ALL,
-                    file=sys.stderr,
                 )
+            if cancel_event is not None and cancel_event.is_set():
+                return None
             if attempt < MAX_RETRIES - 1:
+                metrics.increment("llm_retries", labels={"model": model})
                 time.sleep(RETRY_DELAY)
             else:
-                print(
-                    Fore.RED
-                    + _("Error translating chunk after multiple retries.")
-                    + Style.RESET_ALL,
-                    file=sys.stderr,
-                )
-                return [
-                    {
-                        "id": seg["id"],
-                        "translated_text": _("[Chunk Translation Failed]"),
-                    }
-                    for seg in chunk_segments
-                ]
-    return []  # Should not be reached, but as a fallback
+                metrics.increment("chunk_failures", labels={"model": model})
+                logger.error(_("Error translating chunk after multiple retries."))
+    return None
 
 
-def _process_chunk(chunk_data):
-    """处理单个块的内部函数"""
-    client, chunk, target_language, model = chunk_data
-    return _translate_chunk(client, chunk, target_language, model)
+def _failed_chunk(chunk_segments):
+    """Placeholder translations for a chunk that could not be translated."""
+    return [
+        {
+            "id": seg["id"],
+            "translated_text": _("[Chunk Translation Failed]"),
+        }
+        for seg in chunk_segments
+    ]
 
 
-def translate_segments(
-    segments,
+def _single_prompts(chunk_segments, target_language, hints, glossary, context):
+    """Returns the (user prompt, system prompt) for translating into one language."""
+    prompt = _build_prompt(
+        chunk_segments,
+        target_language,
+        hints=hints,
+        glossary=glossary,
+        context=context,
+    )
+    system_prompt = f"You are a professional subtitle translator translating subtitles into {target_language}. Your output must be a valid JSON object."
+    return prompt, system_prompt
+
+
+def _multi_prompts(chunk_segments, target_languages, hints, glossary, context):
+    """Returns the (user prompt, system prompt) for translating into several languages at once."""
+    languages_str = ", ".join(target_languages)
+    output_format = _MULTI_OUTPUT_FORMAT.replace(
+        "{language_keys}", ", ".join(f'"{lang}"' for lang in target_languages)
+    )
+    prompt = _build_prompt(
+        chunk_segments, languages_str, output_format, hints, glossary, context
+    )
+    system_prompt = f"You are a professional subtitle translator translating subtitles into each of these languages: {languages_str}. Your output must be a valid JSON object."
+    return prompt, system_prompt
+
+
+def _missing_segments(chunk_segments, translations):
+    """The segments of the chunk that have no item in translations."""
+    returned = {item["id"] for item in translations}
+    return [segment for segment in chunk_segments if segment["id"] not in returned]
+
+
+def _split_languages(translations, target_languages):
+    """Splits combined multi-language items into {language: items}."""
+    results = {language: [] for language in target_languages}
+    for item in translations:
+        translated = item.get("translated_text")
+        if not isinstance(translated, dict):
+            continue
+        for language in target_languages:
+            if language in translated:
+                result = dict(item)
+                result["translated_text"] = translated[language]
+                results[language].append(result)
+    return results
+
+
+def _translate_chunk(
+    backend,
+    chunk_segments,
     target_language,
-    api_base_url,
-    api_key,
-    model="gpt-3.5-turbo",
-    max_workers=5,
+    model,
+    hints=None,
+    glossary=None,
+    context=None,
+    cancel_event=None,
+    tuner=None,
+    retry=True,
 ):
-    debug_print("翻译开始，总段落数:", len(segments))
-    debug_print("原始段落样本(前3个):", segments[:3] if len(segments) > 3 else segments)
+    logger.debug(f"翻译块开始，使用模型: {model}，目标语言: {target_language}")
+    logger.debug("输入段落:", extra={"payload": chunk_segments})
     """
-    Uses a large language model to translate and correct text segments, returning structured data.
-    This function implements chunking to handle long texts and processes chunks concurrently.
+    Translates a single chunk of text with retry logic. A reply without any
+    usable item is retried once, split in halves (see _retry_unusable);
+    with retry=False the chunk is then marked as failed.
+    """
+    if not chunk_segments:
+        return []
+
+    prompt, system_prompt = _single_prompts(
+        chunk_segments, target_language, hints, glossary, context
+    )
+    translations = _request_translations(
+        backend,
+        chunk_segments,
+        prompt,
+        system_prompt,
+        model,
+        cancel_event,
+        tuner,
+        _translation_schema(),
+    )
+    if translations is None:
+        return _failed_chunk(chunk_segments)
+    missing = _missing_segments(chunk_segments, translations)
+    if missing and len(missing) == len(chunk_segments):
+        return _retry_unusable(
+            chunk_segments,
+            retry,
+            lambda part: _translate_chunk(
+                backend,
+                part,
+                target_language,
+                model,
+                hints,
+                glossary,
+                context,
+                cancel_event,
+                tuner,
+                retry=False,
+            ),
+            _failed_chunk,
+            lambda first, second: first + second,
+        )
+    if missing:
+        # 回复被截断或漏掉了条目时，只为缺少的段落再发一次请求
+        translations += _translate_chunk(
+            backend,
+            missing,
+            target_language,
+            model,
+            hints,
+            glossary,
+            context,
+            cancel_event,
+            tuner,
+            retry,
+        )
+    return translations
+
+
+def _retry_unusable(chunk_segments, retry, translate, failed, merge):
+    """
+    Handles a reply without any usable item, e.g. a truncated reply whose
+    only recovered item lacks some of the languages. With retry the chunk
+    is requested once more, split in halves so that a shorter reply fits;
+    otherwise (or when the retry fails as well) failed(chunk_segments)
+    marks every cue as failed instead of silently dropping them.
+    """
+    if not retry:
+        metrics.increment("chunk_failures", labels={"reason": "no_usable_items"})
+        logger.warning(
+            _(
+                "Warning: The reply had no usable translation for {count} segments; marking them as failed."
+            ).format(count=len(chunk_segments))
+        )
+        return failed(chunk_segments)
+    logger.debug(f"回复中没有可用的条目，重试 {len(chunk_segments)} 个段落")
+    metrics.increment("unusable_reply_retries")
+    middle = (len(chunk_segments) + 1) // 2
+    result = translate(chunk_segments[:middle])
+    if middle < len(chunk_segments):
+        result = merge(result, translate(chunk_segments[middle:]))
+    return result
+
+
+def _translate_chunk_multi(
+    backend,
+    chunk_segments,
+    target_languages,
+    model,
+    hints=None,
+    glossary=None,
+    context=None,
+    cancel_event=None,
+    tuner=None,
+    retry=True,
+):
+    """
+    Translates a single chunk into several languages with one request.
+    Returns a dict mapping each language to its list of translations.
+    Items lacking one of the languages count as missing; a reply without
+    any complete item is retried once (see _retry_unusable).
+    """
+    logger.debug(f"多语言翻译块开始，使用模型: {model}，目标语言: {target_languages}")
+    if not chunk_segments:
+        return {language: [] for language in target_languages}
+
+    prompt, system_prompt = _multi_prompts(
+        chunk_segments, target_languages, hints, glossary, context
+    )
+    translations = _request_translations(
+        backend,
+        chunk_segments,
+        prompt,
+        system_prompt,
+        model,
+        cancel_event,
+        tuner,
+        _translation_schema(target_languages),
+    )
+    if translations is None:
+        return {
+            language: _failed_chunk(chunk_segments) for language in target_languages
+        }
+    # 只保留包含全部语言的条目，其余段落与缺少的段落一起重新请求
+    translations = [
+        item
+        for item in translations
+        if isinstance(item["translated_text"], dict)
+        and all(language in item["translated_text"] for language in target_languages)
+    ]
+    results = _split_languages(translations, target_languages)
+    missing = _missing_segments(chunk_segments, translations)
+    if missing and len(missing) == len(chunk_segments):
+        return _retry_unusable(
+            chunk_segments,
+            retry,
+            lambda part: _translate_chunk_multi(
+                backend,
+                part,
+                target_languages,
+                model,
+                hints,
+                glossary,
+                context,
+                cancel_event,
+                tuner,
+                retry=False,
+            ),
+            lambda part: {
+                language: _failed_chunk(part) for language in target_languages
+            },
+            lambda first, second: {
+                language: first[language] + second[language]
+                for language in target_languages
+            },
+        )
+    if missing:
+        rest = _translate_chunk_multi(
+            backend,
+            missing,
+            target_languages,
+            model,
+            hints,
+            glossary,
+            context,
+            cancel_event,
+            tuner,
+            retry,
+        )
+        for language in target_languages:
+            results[language] += rest[language]
+    return results
+
+
+def _drop_context_items(task, results):
+    """
+    Removes translations of the read-only context cues, which the model
+    occasionally returns, so they cannot overwrite a neighbouring chunk.
+    """
+    if not task.get("context"):
+        return results
+    chunk_ids = {item["id"] for item in task["chunk"]}
+    for language, translated_chunk in results.items():
+        kept = [item for item in translated_chunk if item.get("id") in chunk_ids]
+        if len(kept) != len(translated_chunk):
+            metrics.increment(
+                "context_items_dropped", len(translated_chunk) - len(kept)
+            )
+            logger.debug(
+                f"丢弃了 {len(translated_chunk) - len(kept)} 条上下文译文 ({language})"
+            )
+        results[language] = kept
+    return results
+
+
+def _process_chunk(task):
+    """处理单个块的内部函数，返回 {目标语言: 翻译列表}"""
+    backend = task["backend"]
+    chunk = task["chunk"]
+    target_language = task["target_language"]
+    model = task["model"]
+    hints = task.get("hints")
+    glossary = task.get("glossary")
+    context = task.get("context")
+    cancel_event = task.get("cancel_event")
+    tuner = task.get("autotuner")
+    if context:
+        context_segments = (
+            context.get("before", [])
+            + context.get("after", [])
+            + context.get("around", [])
+        )
+        metrics.increment("context_segments", len(context_segments))
+        metrics.increment(
+            "context_chars", sum(_segment_size(item) for item in context_segments)
+        )
+    with metrics.stage("translate.chunk"):
+        if isinstance(target_language, (list, tuple)):
+            results = _translate_chunk_multi(
+                backend,
+                chunk,
+                target_language,
+                model,
+                hints,
+                glossary,
+                context,
+                cancel_event,
+                tuner,
+            )
+        else:
+            results = {
+                target_language: _translate_chunk(
+                    backend,
+                    chunk,
+                    target_language,
+                    model,
+                    hints,
+                    glossary,
+                    context,
+                    cancel_event,
+                    tuner,
+                )
+            }
+    return _drop_context_items(task, results)
+
+
+def _timed_process_chunk(task):
+    """Runs _process_chunk, recording in the task when it started and how long it took."""
+    task["started_at"] = time.monotonic()
+    results = _process_chunk(task)
+    task["elapsed"] = time.monotonic() - task["started_at"]
+    return results
+
+
+def _is_failed_result(results):
+    return any(
+        item.get("translated_text") == _("[Chunk Translation Failed]")
+        for translated_chunk in results.values()
+        for item in translated_chunk
+    )
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    index = int(round(percentile / 100 * (len(ordered) - 1)))
+    return ordered[min(len(ordered) - 1, max(0, index))]
+
+
+def _dispatch_chunks(
+    chunk_data_list,
+    max_workers,
+    hedge_percentile=None,
+    hedge_budget=DEFAULT_HEDGE_BUDGET,
+    hedge_model=None,
+    tuner=None,
+):
+    """
+    Runs the chunk tasks on a worker pool and yields (position, task, future)
+    once per chunk, in completion order.
+
+    With tuner (a TunerGroup), at most tuner.max_workers chunks run at a
+    time instead of max_workers, and the limit follows the tuner as it
+    learns from each request.
+
+    With hedge_percentile, a chunk that has been running longer than that
+    percentile of the chunk latencies seen so far in this run gets a
+    duplicate request (to hedge_model if given). Whichever copy answers
+    first wins and the other is cancelled: it is dropped from the queue if
+    it has not started, otherwise it stops retrying and its result is
+    ignored. At most hedge_budget * chunk count duplicates are sent.
+
+    Tasks the caller appends to chunk_data_list while iterating are
+    submitted as well, ahead of the original tasks still waiting.
+    """
+    if tuner is not None:
+        max_workers = tuner.worker_limit
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    # 对冲副本使用独立的线程池，避免排在普通块的后面
+    hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    hedges_left = 0
+    if hedge_percentile:
+        hedges_left = int(round(len(chunk_data_list) * hedge_budget))
+    pending = {}
+    copies = {}
+    # 已提交但尚未结束的主请求；按并发上限逐步提交
+    running = set()
+    # 下一个待提交的原始任务和追加任务
+    next_keys = [0, len(chunk_data_list)]
+
+    def submit_ready():
+        limit = max_workers if tuner is None else tuner.max_workers
+        while len(copies) < len(chunk_data_list) and len(running) < limit:
+            # 运行中追加的任务（如升级的块）优先，以免排在所有原始任务之后
+            slot = 1 if next_keys[1] < len(chunk_data_list) else 0
+            key = next_keys[slot]
+            next_keys[slot] += 1
+            task = dict(
+                chunk_data_list[key][1],
+                cancel_event=threading.Event(),
+                autotuner=tuner,
+            )
+            future = executor.submit(_timed_process_chunk, task)
+            pending[future] = key
+            running.add(future)
+            copies[key] = [(future, task)]
+
+    submit_ready()
+    latencies = []
+    finished = set()
+
+    try:
+        while pending:
+            done, _not_done = concurrent.futures.wait(
+                pending,
+                timeout=HEDGE_POLL_INTERVAL if hedges_left else None,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                key = pending.pop(future)
+                running.discard(future)
+                if key in finished:
+                    continue
+                task = next(t for f, t in copies[key] if f is future)
+                others = [(f, t) for f, t in copies[key] if f in pending]
+                if others and (
+                    future.exception() is not None or _is_failed_result(future.result())
+                ):
+                    # 另一份副本仍在运行，等待它的结果
+                    continue
+                finished.add(key)
+                if "elapsed" in task:
+                    latencies.append(task["elapsed"])
+                for other_future, other_task in others:
+                    other_task["cancel_event"].set()
+                    other_future.cancel()
+                    pending.pop(other_future)
+                    running.discard(other_future)
+                if task.get("hedge"):
+                    metrics.increment("hedge_wins", labels={"model": task["model"]})
+                yield chunk_data_list[key][0], task, future
+            submit_ready()
+
+            if not hedges_left or len(latencies) < HEDGE_MIN_SAMPLES:
+                continue
+            threshold = max(HEDGE_MIN_DELAY, _percentile(latencies, hedge_percentile))
+            now = time.monotonic()
+            for key, entries in copies.items():
+                if not hedges_left:
+                    break
+                if key in finished or len(entries) > 1:
+                    continue
+                started_at = entries[0][1].get("started_at")
+                if started_at is None or now - started_at < threshold:
+                    continue
+                hedge_task = dict(
+                    chunk_data_list[key][1],
+                    cancel_event=threading.Event(),
+                    autotuner=tuner,
+                    hedge=True,
+                )
+                if hedge_model:
+                    hedge_task["model"] = hedge_model
+                hedge_future = hedge_executor.submit(_timed_process_chunk, hedge_task)
+                pending[hedge_future] = key
+                entries.append((hedge_future, hedge_task))
+                hedges_left -= 1
+                metrics.increment(
+                    "hedged_requests", labels={"model": hedge_task["model"]}
+                )
+                logger.debug(
+                    f"块 {chunk_data_list[key][0]} 已运行 {now - started_at:.2f}s，"
+                    f"超过阈值 {threshold:.2f}s，发送对冲请求"
+                )
+    finally:
+        for entries in copies.values():
+            for future, task in entries:
+                task["cancel_event"].set()
+                future.cancel()
+        # 被取消的请求可能仍在进行中，不等待它们结束
+        executor.shutdown(wait=False)
+        hedge_executor.shutdown(wait=False)
+
+
+def _translate_batch(chunk_data_list, backend, poll_interval=None, timeout=None):
+    """
+    Sends every chunk task as one job through the provider's batch API.
+    Returns {index in chunk_data_list: {language: translations}} for the
+    chunks that came back with a valid response; the caller retries the
+    others synchronously. A batch still running after timeout seconds is
+    cancelled and TimeoutError is raised.
+    """
+    from ai_subtitle_assistant.core.backends import _structured_output_options
+    from ai_subtitle_assistant.core.batch import DEFAULT_POLL_INTERVAL, run_batch
+
+    pool = getattr(backend, "pool", None)
+    if pool is None:
+        raise ValueError(_("Batch mode needs a remote API endpoint."))
+    endpoint = pool.acquire()
+    # 批处理中的请求无法逐个回退，只有确定支持时才使用 JSON Schema
+    structured_output = "off"
+    if backend.structured_output == "schema" or (
+        backend.structured_output == "auto" and endpoint.structured_output == "schema"
+    ):
+        structured_output = "schema"
+    requests = []
+    for index, (_position, task) in enumerate(chunk_data_list):
+        languages = task["target_language"]
+        schema = _translation_schema(
+            languages if isinstance(languages, (list, tuple)) else None
+        )
+        if isinstance(languages, (list, tuple)):
+            prompt, system_prompt = _multi_prompts(
+                task["chunk"],
+                languages,
+                task.get("hints"),
+                task.get("glossary"),
+                task.get("context"),
+            )
+        else:
+            prompt, system_prompt = _single_prompts(
+                task["chunk"],
+                languages,
+                task.get("hints"),
+                task.get("glossary"),
+                task.get("context"),
+            )
+        requests.append(
+            (
+                str(index),
+                {
+                    "model": backend.resolve_model(endpoint, task["model"]),
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    "temperature": 0.7,
+                    **_structured_output_options(structured_output, schema),
+                },
+            )
+        )
+    try:
+        responses = run_batch(
+            endpoint.client,
+            requests,
+            DEFAULT_POLL_INTERVAL if poll_interval is None else poll_interval,
+            timeout,
+        )
+    except BaseException:
+        pool.release(endpoint, success=False)
+        raise
+    pool.release(endpoint)
+
+    results = {}
+    for index, (_position, task) in enumerate(chunk_data_list):
+        body = responses.get(str(index))
+        if not body:
+            continue
+        metrics.record_usage(
+            body.get("usage"),
+            labels={"model": body.get("model"), "endpoint": endpoint.name},
+        )
+        try:
+            translations, complete = _parse_translations(
+                body["choices"][0]["message"]["content"], task["chunk"]
+            )
+        except Exception as e:
+            logger.debug(f"批量结果 {index} 解析失败: {e}")
+            continue
+        if not complete:
+            # 被截断的结果交给同步翻译重试
+            continue
+        languages = task["target_language"]
+        if isinstance(languages, (list, tuple)):
+            chunk_results = _split_languages(translations, languages)
+        else:
+            chunk_results = {languages: translations}
+        results[index] = _drop_context_items(task, chunk_results)
+    metrics.increment("batch_failures", len(chunk_data_list) - len(results))
+    return results
+
+
+def _segment_size(simple_segment):
+    return len(json.dumps(simple_segment, ensure_ascii=False))
+
+
+def _plan_chunks(
+    segments, pending_ids=None, context_cues=0, chunk_size_limit=CHUNK_SIZE_LIMIT
+):
     """
-    client = openai.OpenAI(base_url=api_base_url, api_key=api_key)
+    Divides the segments into chunks that stay under chunk_size_limit characters.
+    If pending_ids is given, only those segments count towards the limit;
+    the others already have translations and are only carried along so that
+    every chunk still covers a contiguous run of the file.
+    With context_cues, the read-only cues sent before and after each chunk
+    (see _chunk_context) count towards the limit as well.
+    """
+    simple_segments = [
+        {"id": segment["id"], "text": segment["text"].strip()} for segment in segments
+    ]
+    sizes = [_segment_size(simple_segment) for simple_segment in simple_segments]
+
+    def context_size(start, end):
+        # 块 [start, end] 前后各 context_cues 条上下文的字符数
+        if not context_cues:
+            return 0
+        return sum(sizes[max(0, start - context_cues) : start]) + sum(
+            sizes[end + 1 : end + 1 + context_cues]
+        )
 
-    all_translated_segments = []
     current_chunk = []
+    current_chunk_start = 0
     current_chunk_char_count = 0
     chunks_to_process = []
 
-    debug_print(f"使用模型: {model}, 目标语言: {target_language}")
-    debug_print(f"API基础URL: {api_base_url}")
-
-    # First, divide the segments into chunks
-    for segment in segments:
-        segment_text = segment["text"].strip()
-        simple_segment = {"id": segment["id"], "text": segment_text}
-        estimated_added_len = len(json.dumps(simple_segment, ensure_ascii=False))
+    for index, simple_segment in enumerate(simple_segments):
+        if pending_ids is not None and simple_segment["id"] not in pending_ids:
+            if not current_chunk:
+                current_chunk_start = index
+            current_chunk.append(simple_segment)
+            continue
+        estimated_added_len = sizes[index]
 
         if current_chunk and (
-            current_chunk_char_count + estimated_added_len > CHUNK_SIZE_LIMIT
+            current_chunk_char_count
+            + estimated_added_len
+            + context_size(current_chunk_start, index)
+            > chunk_size_limit
         ):
             chunks_to_process.append(current_chunk)
             current_chunk = [simple_segment]
+            current_chunk_start = index
             current_chunk_char_count = estimated_added_len
         else:
+            if not current_chunk:
+                current_chunk_start = index
             current_chunk.append(simple_segment)
             current_chunk_char_count += estimated_added_len
 
     if current_chunk:
         chunks_to_process.append(current_chunk)
 
-    debug_print(f"分块完成，共 {len(chunks_to_process)} 个块")
+    logger.debug(f"分块完成，共 {len(chunks_to_process)} 个块")
+    return chunks_to_process
 
-    # Now, process the chunks concurrently with a progress bar
-    with _debug_lock:
-        print(
-            Fore.CYAN
-            + _("Translating {count} chunks...").format(count=len(chunks_to_process))
-            + Style.RESET_ALL,
-            file=sys.stderr,
-        )
 
-    # Prepare data for concurrent processing
-    chunk_data_list = [
-        (client, chunk, target_language, model) for chunk in chunks_to_process
-    ]
+def _chunk_context(chunk, segments, index_by_id, context_cues):
+    """Returns the read-only cues just before and after a chunk."""
+    if not context_cues or not chunk:
+        return None
+    start = index_by_id[chunk[0]["id"]]
+    end = index_by_id[chunk[-1]["id"]]
+    return {
+        "before": [
+            {"id": segment["id"], "text": segment["text"].strip()}
+            for segment in segments[max(0, start - context_cues) : start]
+        ],
+        "after": [
+            {"id": segment["id"], "text": segment["text"].strip()}
+            for segment in segments[end + 1 : end + 1 + context_cues]
+        ],
+    }
 
-    # Process chunks concurrently
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_chunk = {
-            executor.submit(_process_chunk, chunk_data): chunk_data
-            for chunk_data in chunk_data_list
-        }
 
-        # Collect results with progress bar
-        with tqdm(
-            total=len(chunks_to_process), desc=_("Translating"), unit="chunk"
-        ) as pbar:
-            for future in concurrent.futures.as_completed(future_to_chunk):
-                try:
-                    translated_chunk = future.result()
-                    # 验证返回的翻译结果
-                    for item in translated_chunk:
-                        # 检查是否包含original_text字段
-                        if "original_text" in item:
-                            # 验证original_text是否与本地原文一致
-                            chunk_id = item["id"]
-                            # 找到对应的原始段落
-                            original_segment = next(
-                                (seg for seg in segments if seg["id"] == chunk_id), None
-                            )
-                            if original_segment:
-                                original_text = original_segment["text"].strip()
-                                if item["original_text"] != original_text:
-                                    debug_print(
-                                        f"警告: ID {chunk_id} 的原文不匹配。本地: '{original_text}', 返回: '{item['original_text']}'"
-                                    )
-                                    # 如果不匹配，使用本地原文
-                                    item["original_text"] = original_text
-                        else:
-                            # 如果没有original_text字段，从原始段落中获取
-                            chunk_id = item["id"]
-                            original_segment = next(
-                                (seg for seg in segments if seg["id"] == chunk_id), None
-                            )
-                            if original_segment:
-                                item["original_text"] = original_segment["text"].strip()
-
-                    all_translated_segments.extend(translated_chunk)
-                except Exception as e:
-                    print(
-                        Fore.RED
-                        + _("Error processing chunk: {e}").format(e=e)
-                        + Style.RESET_ALL,
-                        file=sys.stderr,
-                    )
-                pbar.update(1)
+def _validate_translations(translated_chunk, original_texts):
+    """
+    Checks the returned original_text of each item against the local source
+    text, replacing it when it is missing or does not match.
+    """
+    for item in translated_chunk:
+        chunk_id = item["id"]
+        original_text = original_texts.get(chunk_id)
+        if original_text is None:
+            continue
+        # 检查是否包含original_text字段
+        if "original_text" in item:
+            # 验证original_text是否与本地原文一致
+            if item["original_text"] != original_text:
+                logger.debug(
+                    f"警告: ID {chunk_id} 的原文不匹配。本地: '{original_text}', 返回: '{item['original_text']}'"
+                )
+                # 如果不匹配，使用本地原文
+                item["original_text"] = original_text
+        else:
+            # 如果没有original_text字段，从原始段落中获取
+            item["original_text"] = original_text
+    return translated_chunk
 
-    with _debug_lock:
-        print(
-            Fore.GREEN + _("All chunks translated.") + Style.RESET_ALL, file=sys.stderr
-        )
 
+def _assemble_bilingual(segments, all_translated_segments):
+    """
+    Merges the translated items back onto the source segments.
+    """
     translation_map = {
         item["id"]: item["translated_text"] for item in all_translated_segments
     }
 
-    debug_print("翻译映射:", translation_map)
+    logger.debug("翻译映射:", extra={"payload": translation_map})
 
     # 验证所有段落是否都有对应的翻译
     missing_ids = []
@@ -330,16 +1099,12 @@ def translate_segments(
             missing_ids.append(segment["id"])
 
     if missing_ids:
-        debug_print(f"警告: 以下ID没有对应的翻译: {missing_ids}")
-        with _debug_lock:
-            print(
-                Fore.YELLOW
-                + _(
-                    "Warning: {count} segments have no corresponding translations."
-                ).format(count=len(missing_ids))
-                + Style.RESET_ALL,
-                file=sys.stderr,
+        logger.debug(f"警告: 以下ID没有对应的翻译: {missing_ids}")
+        logger.warning(
+            _("Warning: {count} segments have no corresponding translations.").format(
+                count=len(missing_ids)
             )
+        )
 
     bilingual_subtitles = []
     for segment in segments:
@@ -349,15 +1114,11 @@ def translate_segments(
 
         # 如果使用了默认值，给出警告
         if translated_text == _("[Translation Failed]"):
-            with _debug_lock:
-                print(
-                    Fore.YELLOW
-                    + _(
-                        "Warning: Translation failed for segment {id}. Using default value."
-                    ).format(id=segment_id)
-                    + Style.RESET_ALL,
-                    file=sys.stderr,
-                )
+            logger.warning(
+                _(
+                    "Warning: Translation failed for segment {id}. Using default value."
+                ).format(id=segment_id)
+            )
 
         bilingual_subtitles.append(
             {
@@ -368,12 +1129,799 @@ def translate_segments(
             }
         )
 
-    debug_print(
+    logger.debug(
         "最终双语字幕样本(前3个):",
-        (
-            bilingual_subtitles[:3]
-            if len(bilingual_subtitles) > 3
-            else bilingual_subtitles
-        ),
+        extra={
+            "payload": (
+                bilingual_subtitles[:3]
+                if len(bilingual_subtitles) > 3
+                else bilingual_subtitles
+            )
+        },
     )
     return bilingual_subtitles
+
+
+def _apply_translation_memory(
+    segments,
+    target_languages,
+    translation_memory,
+    prefilled,
+    hints,
+    reuse_threshold,
+    hint_threshold,
+):
+    """
+    Looks up every segment in the translation memory. Close enough matches
+    are reused as-is (with numbers carried over) and weaker ones become
+    few-shot hints for the chunk prompt.
+    """
+    from ai_subtitle_assistant.core.translation_memory import transfer_numbers
+
+    for segment in segments:
+        text = segment["text"].strip()
+        for language in target_languages:
+            if segment["id"] in prefilled[language]:
+                continue
+            matches = translation_memory.lookup(text, language)
+            reused = False
+            if matches and matches[0]["similarity"] >= reuse_threshold:
+                translated = transfer_numbers(
+                    matches[0]["source_text"], text, matches[0]["translated_text"]
+                )
+                if translated is not None:
+                    prefilled[language][segment["id"]] = translated
+                    reused = True
+            metrics.record_cache("translation_memory", reused)
+            if reused:
+                continue
+            segment_hints = [
+                match for match in matches if match["similarity"] >= hint_threshold
+            ]
+            if segment_hints:
+                hints[language].setdefault(segment["id"], []).extend(segment_hints)
+
+
+def _apply_skip_detection(segments, target_languages, prefilled):
+    """
+    Prefills the cues that need no translation (music, sound tags, numbers,
+    speaker tags, lines already in the target language) with their
+    passthrough or templated output, so they never reach the LLM.
+    """
+    from ai_subtitle_assistant.core.skip_detection import classify
+
+    for segment in segments:
+        for language in target_languages:
+            if segment["id"] in prefilled[language]:
+                continue
+            result = classify(segment["text"], language)
+            if result is None:
+                continue
+            reason, output = result
+            prefilled[language][segment["id"]] = output
+            metrics.increment(
+                "skipped_segments", labels={"reason": reason, "language": language}
+            )
+
+
+def _find_duplicates(segments, target_languages, prefilled):
+    """
+    Maps every segment whose whitespace-normalized text already occurred
+    earlier in the file to that first occurrence. Only segments that still
+    need a translation in some language are considered.
+    """
+    first_by_text = {}
+    duplicates = {}
+    for segment in segments:
+        if all(segment["id"] in prefilled[lang] for lang in target_languages):
+            continue
+        text = " ".join(segment["text"].split())
+        if text in first_by_text:
+            duplicates[segment["id"]] = first_by_text[text]
+        else:
+            first_by_text[text] = segment["id"]
+    return duplicates
+
+
+def _chunk_hints(chunk, language, hints):
+    """Collects the translation memory hints of the segments in a chunk."""
+    languages = language if isinstance(language, (list, tuple)) else [language]
+    chunk_hints = []
+    for item in chunk:
+        for lang in languages:
+            for hint in hints[lang].get(item["id"], []):
+                hint = dict(hint)
+                if len(languages) > 1:
+                    hint["language"] = lang
+                chunk_hints.append(hint)
+    return chunk_hints
+
+
+def _chunk_glossary(chunk, language, glossary):
+    """Picks the glossary entries whose terms occur in the chunk's text."""
+    languages = language if isinstance(language, (list, tuple)) else [language]
+    text = "\n".join(item["text"] for item in chunk)
+    return {
+        lang: {
+            term: translation
+            for term, translation in glossary.get(lang, {}).items()
+            if term in text
+        }
+        for lang in languages
+    }
+
+
+def _remote_backend(
+    api_base_url,
+    api_key,
+    endpoints=None,
+    structured_output=DEFAULT_STRUCTURED_OUTPUT,
+    model=None,
+):
+    """
+    Builds the RemoteBackend for the endpoint list, or the single default
+    endpoint. model is the run's main model, the one an endpoint's own model
+    replaces.
+    """
+    from ai_subtitle_assistant.core.backends import RemoteBackend
+    from ai_subtitle_assistant.core.endpoints import get_pool
+
+    return RemoteBackend(
+        get_pool(
+            endpoints
+            or [
+                {
+                    "name": "default",
+                    "api_base_url": api_base_url,
+                    "api_key": api_key,
+                }
+            ]
+        ),
+        structured_output,
+        model,
+    )
+
+
+def _chunk_job_params(task, job_params):
+    """The JSON-serializable part of a chunk task, for a translate_chunk job."""
+    params = dict(job_params or {})
+    for key in ("chunk", "target_language", "model", "hints", "glossary", "context"):
+        params[key] = task.get(key)
+    return params
+
+
+def _job_results(result):
+    if result is None:
+        raise RuntimeError(_("The translate_chunk job failed."))
+    return result["results"]
+
+
+def _save_tuner(tuner):
+    try:
+        tuner.save()
+    except OSError as e:
+        logger.warning(_("Warning: Could not save autotune settings: {e}").format(e=e))
+        return
+    logger.debug(
+        f"自动调节设置已保存：并发 {tuner.max_workers}，块大小 {tuner.chunk_size}"
+    )
+
+
+def run_chunk_task(params, api_base_url, api_key, endpoints=None, backend=None):
+    """
+    Translates one chunk described by translate_chunk job params (see
+    _chunk_job_params) and returns {language: translations}.
+    """
+    task = {
+        key: params.get(key)
+        for key in ("chunk", "target_language", "model", "hints", "glossary", "context")
+    }
+    task["backend"] = backend or _remote_backend(
+        api_base_url,
+        api_key,
+        endpoints,
+        params.get("structured_output", DEFAULT_STRUCTURED_OUTPUT),
+        params.get("main_model"),
+    )
+    return _process_chunk(task)
+
+
+def translate_segments(
+    segments,
+    target_language,
+    api_base_url,
+    api_key,
+    model="gpt-3.5-turbo",
+    max_workers=5,
+    **options,
+):
+    """
+    Uses a large language model to translate and correct text segments, returning structured data.
+    This function implements chunking to handle long texts and processes chunks concurrently.
+    With on_chunk, chunks are delivered as they finish and [] is returned.
+    """
+    return translate_segments_multi(
+        segments,
+        [target_language],
+        api_base_url,
+        api_key,
+        model,
+        max_workers,
+        **options,
+    ).get(target_language, [])
+
+
+def translate_segments_multi(
+    segments,
+    target_languages,
+    api_base_url,
+    api_key,
+    model="gpt-3.5-turbo",
+    max_workers=5,
+    combined=False,
+    on_chunk=None,
+    translation_memory=None,
+    tm_reuse_threshold=None,
+    tm_hint_threshold=None,
+    glossary_mode="off",
+    context_cues=DEFAULT_CONTEXT_CUES,
+    hedge_percentile=None,
+    hedge_budget=DEFAULT_HEDGE_BUDGET,
+    hedge_model=None,
+    endpoints=None,
+    backend=None,
+    batch=False,
+    batch_poll_interval=None,
+    batch_timeout=None,
+    skip_detection=True,
+    deduplicate=True,
+    job_store=None,
+    job_params=None,
+    autotune=False,
+    structured_output=DEFAULT_STRUCTURED_OUTPUT,
+    previous=None,
+    fast_model=None,
+):
+    logger.debug("翻译开始，总段落数:", extra={"payload": len(segments)})
+    logger.debug(
+        "原始段落样本(前3个):",
+        extra={"payload": segments[:3] if len(segments) > 3 else segments},
+    )
+    """
+    Translates the segments into several target languages in one run.
+    Chunks are planned once and every (chunk, language) pair is scheduled on a
+    shared worker pool. With combined=True each chunk is sent once and the model
+    returns all languages in a single response.
+    Returns a dict mapping each target language to its bilingual subtitles.
+
+    If on_chunk is given, it is called as on_chunk(language, position, subtitles)
+    as soon as each chunk finishes, where position is the chunk's index in file
+    order. Results are then not accumulated and an empty dict is returned.
+
+    If translation_memory (a TranslationMemory) is given, segments whose
+    previous translation matches at least tm_reuse_threshold are reused
+    without an LLM call, weaker matches above tm_hint_threshold are sent as
+    few-shot hints, and new translations are added to the memory.
+
+    glossary_mode ("off", "local" or "llm") builds a glossary of names and
+    terms once per file (cached by content) and adds the entries that occur
+    in each chunk to that chunk's prompt, so chunks translated in parallel
+    agree on them.
+
+    context_cues adds that many untranslated cues before and after every
+    chunk to its prompt, so lines at chunk edges are not translated blind.
+    They count towards the chunk size limit.
+
+    hedge_percentile, hedge_budget and hedge_model enable hedged duplicate
+    requests for slow chunks; see _dispatch_chunks.
+
+    endpoints, a list of endpoint configs (see config.get_endpoint_configs),
+    spreads the requests over several providers with failover instead of
+    the single api_base_url/api_key endpoint. backend replaces the remote
+    endpoints altogether, e.g. with a LocalBackend (see core.backends).
+
+    With batch=True all chunks are submitted as one job through the
+    provider's batch API and polled every batch_poll_interval seconds;
+    chunks the batch could not translate are retried synchronously. A
+    batch still running after batch_timeout seconds, or interrupted, is
+    cancelled; after a timeout all chunks are translated synchronously.
+
+    With skip_detection=True (the default) cues that need no translation,
+    such as music notes, sound tags, numbers or lines already in the target
+    language, are passed through or filled from templates without an LLM
+    call; see core.skip_detection.
+
+    With deduplicate=True (the default) a text that occurs several times in
+    the file is only sent once, with the context of its first occurrence,
+    and that translation is copied to every other occurrence.
+
+    With job_store (a JobStore), every chunk becomes a translate_chunk job
+    that `ai-subtitle worker` processes on any node pick up; this process
+    only plans, validates and assembles. job_params are added to every job,
+    e.g. api_base_url/api_key to override the workers' own configuration.
+
+    With autotune=True, max_workers and CHUNK_SIZE_LIMIT are replaced by the
+    settings learned for each endpoint and model: concurrency adapts during
+    the run, and the chunk size it reaches is used from the next run on.
+    See core.autotune. It only applies to remote endpoints without batch or
+    job_store.
+
+    structured_output ("auto", "schema", "tool" or "off") selects how remote
+    endpoints are asked for replies matching the translation JSON schema;
+    see core.backends.RemoteBackend. Replies that are still malformed or
+    truncated are repaired locally, and only the cues missing from a
+    truncated reply are requested again.
+
+    previous ({language: cues}, see core.incremental.parse_bilingual_srt)
+    holds the previous bilingual output of an earlier version of the file.
+    Segments whose text is unchanged keep their previous translation with
+    the new timing; only inserted or edited segments are translated, with
+    the unchanged segments around them and their translations as read-only
+    context and the replaced cue's translation as a hint.
+
+    With fast_model, every chunk is first sent to that (cheaper, faster)
+    model and each returned cue is checked locally: id coverage, length
+    ratio, script or language of the output and the echoed original_text
+    (see core.routing). Only the cues that fail are sent again, as smaller
+    chunks, to model, and the counts per tier are reported.
+    """
+    if backend is None:
+        backend = _remote_backend(
+            api_base_url, api_key, endpoints, structured_output, model
+        )
+    if fast_model and backend.name == "local":
+        # 本地后端只加载了一个模型，两级请求会发给同一个模型
+        raise ValueError(
+            _(
+                "Error: --fast-model needs an API backend; a local model cannot switch to another model."
+            )
+        )
+    if job_store is not None:
+        job_params = dict(
+            job_params or {}, structured_output=structured_output, main_model=model
+        )
+
+    tuner = None
+    chunk_size_limit = CHUNK_SIZE_LIMIT
+    if autotune and backend.name == "remote" and not batch and job_store is None:
+        from ai_subtitle_assistant.core.autotune import TunerGroup
+
+        tuner = TunerGroup(backend.targets(fast_model or model))
+        chunk_size_limit = tuner.chunk_size
+        logger.info(
+            _(
+                "Autotune: starting with {workers} concurrent requests and {size}-character chunks."
+            ).format(workers=tuner.max_workers, size=tuner.chunk_size),
+            extra={"color": Fore.CYAN},
+        )
+
+    logger.debug(f"使用模型: {model}, 目标语言: {target_languages}")
+    logger.debug("翻译后端:", extra={"payload": backend.describe()})
+
+    # 已有译文的段落（例如来自翻译记忆）不再发送给 LLM
+    prefilled = {language: {} for language in target_languages}
+    hints = {language: {} for language in target_languages}
+    carried = {}
+    if previous:
+        from ai_subtitle_assistant.core.incremental import align_previous
+
+        with metrics.stage("translate.incremental_align"):
+            for language in target_languages:
+                carried[language], edited = align_previous(
+                    segments, previous.get(language) or []
+                )
+                prefilled[language].update(carried[language])
+                for segment_id, hint in edited.items():
+                    hints[language][segment_id] = [hint]
+                metrics.increment(
+                    "incremental_reused_segments",
+                    len(carried[language]),
+                    labels={"language": language},
+                )
+                logger.info(
+                    _(
+                        "Incremental ({language}): reusing {reused} of {total} translations."
+                    ).format(
+                        language=language,
+                        reused=len(carried[language]),
+                        total=len(segments),
+                    ),
+                    extra={"color": Fore.CYAN},
+                )
+    if skip_detection:
+        with metrics.stage("translate.skip_detection"):
+            _apply_skip_detection(segments, target_languages, prefilled)
+        logger.debug(
+            "无需翻译的段落数:",
+            extra={
+                "payload": {
+                    language: len(prefilled[language]) for language in target_languages
+                }
+            },
+        )
+    if translation_memory is not None:
+        from ai_subtitle_assistant.core.translation_memory import (
+            DEFAULT_REUSE_THRESHOLD,
+            DEFAULT_HINT_THRESHOLD,
+        )
+
+        with metrics.stage("translate.memory_lookup"):
+            _apply_translation_memory(
+                segments,
+                target_languages,
+                translation_memory,
+                prefilled,
+                hints,
+                (
+                    DEFAULT_REUSE_THRESHOLD
+                    if tm_reuse_threshold is None
+                    else tm_reuse_threshold
+                ),
+                (
+                    DEFAULT_HINT_THRESHOLD
+                    if tm_hint_threshold is None
+                    else tm_hint_threshold
+                ),
+            )
+        logger.debug(
+            "翻译记忆复用数:",
+            extra={
+                "payload": {
+                    language: len(prefilled[language]) for language in target_languages
+                }
+            },
+        )
+
+    glossary = {}
+    if glossary_mode != "off":
+        from ai_subtitle_assistant.core.glossary import build_glossary
+
+        glossary = {
+            language: build_glossary(segments, language, glossary_mode, backend, model)
+            for language in target_languages
+        }
+        logger.debug("术语表:", extra={"payload": glossary})
+
+    # 重复文本只翻译第一次出现的段落，其余段落在交付时复制其译文
+    duplicates = {}
+    if deduplicate:
+        duplicates = _find_duplicates(segments, target_languages, prefilled)
+        metrics.increment("deduplicated_segments", len(duplicates))
+        logger.debug("重复段落数:", extra={"payload": len(duplicates)})
+
+    pending_ids = {
+        segment["id"]
+        for segment in segments
+        if segment["id"] not in duplicates
+        and any(segment["id"] not in prefilled[lang] for lang in target_languages)
+    }
+
+    # First, divide the segments into chunks
+    with metrics.stage("translate.plan_chunks"):
+        chunks_to_process = _plan_chunks(
+            segments, pending_ids, context_cues, chunk_size_limit
+        )
+    metrics.increment("segments", len(segments))
+
+    # Prepare data for concurrent processing, remembering each chunk's position
+    if combined and len(target_languages) > 1:
+        chunk_languages = [list(target_languages)]
+    else:
+        chunk_languages = list(target_languages)
+    chunk_data_list = []
+    immediate = []
+    index_by_id = {segment["id"]: index for index, segment in enumerate(segments)}
+    for position, chunk in enumerate(chunks_to_process):
+        context = _chunk_context(chunk, segments, index_by_id, context_cues)
+        for language in chunk_languages:
+            languages = language if isinstance(language, list) else [language]
+            pending_chunk = [
+                item
+                for item in chunk
+                if item["id"] not in duplicates
+                and any(item["id"] not in prefilled[lang] for lang in languages)
+            ]
+            if not pending_chunk:
+                immediate.append((position, languages))
+                continue
+            chunk_context = context
+            if carried:
+                from ai_subtitle_assistant.core.incremental import (
+                    incremental_context,
+                )
+
+                chunk_context = dict(
+                    context or {},
+                    around=incremental_context(
+                        pending_chunk, segments, index_by_id, carried, languages
+                    ),
+                )
+            chunk_data_list.append(
+                (
+                    position,
+                    {
+                        "backend": backend,
+                        "chunk": pending_chunk,
+                        "target_language": language,
+                        "model": fast_model or model,
+                        "tier": "fast" if fast_model else None,
+                        "hints": _chunk_hints(pending_chunk, language, hints),
+                        "glossary": _chunk_glossary(chunk, language, glossary),
+                        "context": chunk_context,
+                    },
+                )
+            )
+
+    # Now, process the chunks concurrently with a progress bar
+    logger.info(
+        _("Translating {count} chunks...").format(count=len(chunk_data_list)),
+        extra={"color": Fore.CYAN},
+    )
+
+    original_texts = {segment["id"]: segment["text"].strip() for segment in segments}
+    all_translated_segments = {language: [] for language in target_languages}
+    segment_by_id = {segment["id"]: segment for segment in segments}
+    resolved = {language: {} for language in target_languages}
+    settled = {language: set() for language in target_languages}
+    waiting = {language: [] for language in target_languages}
+
+    def deliver(position, language, translated_chunk):
+        if translation_memory is not None:
+            translation_memory.add_many(
+                [
+                    (original_texts[item["id"]], item["translated_text"])
+                    for item in translated_chunk
+                    if item["id"] in original_texts
+                    and isinstance(item.get("translated_text"), str)
+                    and item["translated_text"] != _("[Chunk Translation Failed]")
+                ],
+                language,
+            )
+        # 预填的译文优先于模型返回的结果
+        translated_chunk = [
+            item for item in translated_chunk if item["id"] not in prefilled[language]
+        ] + [
+            {
+                "id": item["id"],
+                "original_text": original_texts[item["id"]],
+                "translated_text": prefilled[language][item["id"]],
+            }
+            for item in chunks_to_process[position]
+            if item["id"] in prefilled[language]
+        ]
+        if duplicates:
+            # 记录已交付块中的译文，等待其中代表段落的重复块随后一并交付
+            for item in translated_chunk:
+                resolved[language][item["id"]] = item["translated_text"]
+            settled[language].update(item["id"] for item in chunks_to_process[position])
+            waiting[language].append((position, translated_chunk))
+            flush_duplicates(language)
+            return
+        emit(position, language, translated_chunk)
+
+    def flush_duplicates(language, force=False):
+        """Delivers the waiting chunks whose duplicates' first occurrences are done."""
+        still_waiting = []
+        for position, translated_chunk in waiting[language]:
+            chunk_duplicates = [
+                item["id"]
+                for item in chunks_to_process[position]
+                if item["id"] in duplicates and item["id"] not in prefilled[language]
+            ]
+            if not force and any(
+                duplicates[dup_id] not in settled[language]
+                for dup_id in chunk_duplicates
+            ):
+                still_waiting.append((position, translated_chunk))
+                continue
+            emit(
+                position,
+                language,
+                translated_chunk
+                + [
+                    {
+                        "id": dup_id,
+                        "original_text": original_texts[dup_id],
+                        "translated_text": resolved[language][duplicates[dup_id]],
+                    }
+                    for dup_id in chunk_duplicates
+                    if duplicates[dup_id] in resolved[language]
+                ],
+            )
+        waiting[language] = still_waiting
+
+    def emit(position, language, translated_chunk):
+        if on_chunk is None:
+            all_translated_segments[language].extend(translated_chunk)
+            return
+        chunk_segments = [
+            segment_by_id[item["id"]] for item in chunks_to_process[position]
+        ]
+        on_chunk(
+            language,
+            position,
+            _assemble_bilingual(chunk_segments, translated_chunk),
+        )
+
+    # 所有段落都已有译文的块无需请求，直接交付
+    for position, languages in immediate:
+        for language in languages:
+            deliver(position, language, [])
+
+    # 分级路由：快速模型的译文中通过检查的部分暂存于此，等待升级的段落完成后一并交付
+    routing = None
+    held = {}
+    # 待运行的块；升级到主模型的块在检查后立即追加，调度器会随即提交
+    scheduled = []
+    if fast_model:
+        from ai_subtitle_assistant.core.routing import (
+            RoutingStats,
+            check_translations,
+        )
+
+        routing = RoutingStats(fast_model, model)
+
+    def escalate(position, task, language, translated_chunk):
+        """
+        Keeps the fast tier's translations that pass the checks and queues a
+        chunk of the failing cues for the strong model. Returns the accepted
+        translations, or None when the chunk has to wait for escalated cues.
+        """
+        failures = check_translations(task["chunk"], translated_chunk, language)
+        accepted = [
+            item
+            for item in translated_chunk
+            if isinstance(item, dict)
+            and item.get("id") in original_texts
+            and item["id"] not in failures
+        ]
+        routing.record(len(accepted), failures)
+        if not failures:
+            return accepted
+        logger.debug(
+            f"块 {position} ({language}) 升级的段落:", extra={"payload": failures}
+        )
+        held[(position, language)] = accepted
+        failing = [item for item in task["chunk"] if item["id"] in failures]
+        # 不继承调度器给副本添加的运行状态（对冲标记、取消事件、计时等）
+        escalation = {
+            key: value for key, value in task.items() if key not in _DISPATCH_KEYS
+        }
+        escalation.update(
+            chunk=failing,
+            target_language=language,
+            model=model,
+            tier="strong",
+            hints=_chunk_hints(failing, language, hints),
+            glossary=_chunk_glossary(failing, language, glossary),
+        )
+        scheduled.append((position, escalation))
+        pbar.total += 1
+        pbar.refresh()
+        return None
+
+    def handle(position, task, get_result):
+        chunk_languages = task["target_language"]
+        if not isinstance(chunk_languages, list):
+            chunk_languages = [chunk_languages]
+        # 已交付或已升级的语言，出错时不再重复交付
+        handled = set()
+        try:
+            try:
+                results = get_result()
+            except Exception as e:
+                if task.get("tier") != "fast":
+                    raise
+                # 快速模型整块失败时，全部段落升级到主模型
+                logger.debug(f"快速模型翻译块 {position} 失败: {e}")
+                results = {language: [] for language in chunk_languages}
+            for language, translated_chunk in results.items():
+                if task.get("tier") == "fast":
+                    translated_chunk = escalate(
+                        position, task, language, translated_chunk
+                    )
+                    if translated_chunk is None:
+                        handled.add(language)
+                        continue
+                elif task.get("tier") == "strong":
+                    routing.record_strong(len(translated_chunk))
+                # 验证返回的翻译结果
+                _validate_translations(translated_chunk, original_texts)
+                deliver(
+                    position,
+                    language,
+                    held.pop((position, language), []) + translated_chunk,
+                )
+                handled.add(language)
+        except Exception as e:
+            logger.error(_("Error processing chunk: {e}").format(e=e))
+            # 仍需交付该块：预填和重复的段落不应随请求一起丢失，流式输出的后续块也在等待它
+            for language in chunk_languages:
+                if language not in handled:
+                    deliver(position, language, held.pop((position, language), []))
+
+    # 批量模式：先通过批处理 API 提交全部块，未成功的块再同步翻译
+    remaining = chunk_data_list
+    batch_results = {}
+    if batch and chunk_data_list:
+        try:
+            batch_results = _translate_batch(
+                chunk_data_list, backend, batch_poll_interval, batch_timeout
+            )
+        except Exception as e:
+            logger.warning(
+                _(
+                    "Warning: Batch submission failed, translating synchronously: {e}"
+                ).format(e=e)
+            )
+        remaining = [
+            item
+            for index, item in enumerate(chunk_data_list)
+            if index not in batch_results
+        ]
+
+    # Process chunks concurrently, collecting results with a progress bar
+    # 先写出排队的日志，避免与进度条交错
+    flush_logs()
+
+    def run_tasks(tasks, pbar):
+        """Runs tasks, including the escalations appended to it meanwhile."""
+        if job_store is not None:
+            from ai_subtitle_assistant.core.job_store import run_distributed
+
+            # 分布式模式按轮提交：本轮中升级的块在下一轮提交
+            start = 0
+            while start < len(tasks):
+                round_tasks = tasks[start:]
+                start = len(tasks)
+                for index, results in run_distributed(
+                    job_store,
+                    "translate_chunk",
+                    [_chunk_job_params(task, job_params) for _p, task in round_tasks],
+                ):
+                    position, task = round_tasks[index]
+                    handle(position, task, lambda: _job_results(results))
+                    pbar.update(1)
+            return
+        try:
+            for position, task, future in _dispatch_chunks(
+                tasks,
+                max_workers,
+                hedge_percentile,
+                hedge_budget,
+                hedge_model,
+                tuner,
+            ):
+                handle(position, task, future.result)
+                pbar.update(1)
+        finally:
+            if tuner is not None:
+                _save_tuner(tuner)
+
+    with metrics.stage("translate.dispatch"), tqdm(
+        total=len(chunk_data_list), desc=_("Translating"), unit="chunk"
+    ) as pbar:
+        for index, results in batch_results.items():
+            position, task = chunk_data_list[index]
+            handle(position, task, lambda: results)
+            pbar.update(1)
+        scheduled[:0] = remaining
+        run_tasks(scheduled, pbar)
+
+    # 代表段落所在块失败且未交付时，其余块不再等待
+    for language in target_languages:
+        flush_duplicates(language, force=True)
+
+    logger.info(_("All chunks translated."), extra={"color": Fore.GREEN})
+    if routing is not None:
+        logger.info(routing.summary(), extra={"color": Fore.CYAN})
+    flush_logs()
+
+    if on_chunk is not None:
+        return {}
+
+    with metrics.stage("translate.assemble"):
+        return {
+            language: _assemble_bilingual(segments, all_translated_segments[language])
+            for language in target_languages
+        }
@@ -0,0 +1,221 @@
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from platformdirs import user_data_dir
+
+APP_NAME = "ai-subtitle"
+DEFAULT_MEMORY_FILE = os.path.join(
+    user_data_dir(APP_NAME, "Lumos"), "translation_memory.sqlite3"
+)
+
+# 默认只自动复用归一化后完全相同的句子（仅标点、大小写、数字不同），其余相似句作为提示
+DEFAULT_REUSE_THRESHOLD = 1.0
+DEFAULT_HINT_THRESHOLD = 0.6
+MAX_HINTS_PER_SEGMENT = 2
+
+SHINGLE_SIZE = 3
+# MinHash 签名长度 = BANDS * ROWS_PER_BAND，用于局部敏感哈希(LSH)分桶
+BANDS = 8
+ROWS_PER_BAND = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _permutations():
+    # 固定的伪随机参数，保证不同运行之间签名一致
+    state = 0x2545F4914F6CDD1D
+    params = []
+    for _i in range(BANDS * ROWS_PER_BAND):
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        a = (state >> 3) % _MERSENNE_PRIME or 1
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        b = (state >> 3) % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def normalize(text):
+    """
+    Lower-cases the text, masks numbers and drops punctuation so that lines
+    differing only in those respects share the same key.
+    """
+    text = _NUMBER_RE.sub("0", text.lower())
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def shingles(normalized):
+    """Character n-grams of a normalized string."""
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {
+        normalized[i : i + SHINGLE_SIZE]
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_bands(shingle_set):
+    """Returns the LSH band buckets of the MinHash signature of a shingle set."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    signature = [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+    return [
+        zlib.crc32(
+            repr(signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]).encode()
+        )
+        for band in range(BANDS)
+    ]
+
+
+def transfer_numbers(old_source, new_source, translation):
+    """
+    Rewrites the numbers of a reused translation to match the new source line.
+    Returns None when the numbers cannot be mapped unambiguously.
+    """
+    old_numbers = _NUMBER_RE.findall(old_source)
+    new_numbers = _NUMBER_RE.findall(new_source)
+    if old_numbers == new_numbers:
+        return translation
+    if len(old_numbers) != len(new_numbers):
+        return None
+    result = translation
+    for old, new in zip(old_numbers, new_numbers):
+        if old == new:
+            continue
+        if result.count(old) != 1:
+            return None
+        result = result.replace(old, new)
+    return result
+
+
+class TranslationMemory:
+    """
+    A local, persistent store of previous translations with approximate
+    lookup. Candidates are found through MinHash/LSH buckets over character
+    n-grams and ranked by their exact Jaccard similarity.
+    """
+
+    def __init__(self, path=DEFAULT_MEMORY_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                target_language TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                UNIQUE (target_language, source_text)
+            );
+            CREATE INDEX IF NOT EXISTS entries_normalized
+                ON entries (target_language, normalized);
+            CREATE TABLE IF NOT EXISTS bands (
+                entry_id INTEGER NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_many(self, pairs, target_language):
+        """Stores (source_text, translated_text) pairs for a target language."""
+        with self._lock, self._conn:
+            for source_text, translated_text in pairs:
+                normalized = normalize(source_text)
+                if not normalized or not translated_text:
+                    continue
+                row = self._conn.execute(
+                    "SELECT id FROM entries WHERE target_language = ? AND source_text = ?",
+                    (target_language, source_text),
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE entries SET translated_text = ? WHERE id = ?",
+                        (translated_text, row[0]),
+                    )
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO entries (target_language, source_text, normalized, translated_text) "
+                    "VALUES (?, ?, ?, ?)",
+                    (target_language, source_text, normalized, translated_text),
+                )
+                self._conn.executemany(
+                    "INSERT INTO bands (entry_id, band, bucket) VALUES (?, ?, ?)",
+                    [
+                        (cursor.lastrowid, band, bucket)
+                        for band, bucket in enumerate(
+                            minhash_bands(shingles(normalized))
+                        )
+                    ],
+                )
+
+    def lookup(self, text, target_language, limit=MAX_HINTS_PER_SEGMENT):
+        """
+        Returns up to `limit` matches as dicts with source_text, translated_text
+        and similarity, best first.
+        """
+        normalized = normalize(text)
+        if not normalized:
+            return []
+        with self._lock:
+            exact = self._conn.execute(
+                "SELECT source_text, translated_text FROM entries "
+                "WHERE target_language = ? AND normalized = ? LIMIT 1",
+                (target_language, normalized),
+            ).fetchone()
+            if exact:
+                return [
+                    {
+                        "source_text": exact[0],
+                        "translated_text": exact[1],
+                        "similarity": 1.0,
+                    }
+                ]
+            query_shingles = shingles(normalized)
+            buckets = minhash_bands(query_shingles)
+            clause = " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(buckets))
+            params = [target_language]
+            for band, bucket in enumerate(buckets):
+                params.extend((band, bucket))
+            rows = self._conn.execute(
+                "SELECT DISTINCT e.source_text, e.normalized, e.translated_text "
+                "FROM bands b JOIN entries e ON e.id = b.entry_id "
+                f"WHERE e.target_language = ? AND ({clause})",
+                params,
+            ).fetchall()
+
+        matches = [
+            {
+                "source_text": source_text,
+                "translated_text": translated_text,
+                "similarity": jaccard(query_shingles, shingles(candidate)),
+            }
+            for source_text, candidate, translated_text in rows
+        ]
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches[:limit]
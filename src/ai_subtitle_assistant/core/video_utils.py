@@ -1,5 +1,8 @@
 import ffmpeg
-import sys
+from ai_subtitle_assistant.core.log import get_logger
+from ai_subtitle_assistant.core.metrics import registry as metrics
+
+logger = get_logger(__name__)
 
 
 def probe_subtitles(video_file):
@@ -8,8 +11,9 @@ def probe_subtitles(video_file):
     Returns a list of subtitle streams found.
     """
     try:
-        print(f"Probing '{video_file}' for subtitle streams...", file=sys.stderr)
-        probe = ffmpeg.probe(video_file)
+        logger.info(f"Probing '{video_file}' for subtitle streams...")
+        with metrics.stage("ffmpeg.probe"):
+            probe = ffmpeg.probe(video_file)
         subtitle_streams = [
             stream for stream in probe["streams"] if stream["codec_type"] == "subtitle"
         ]
@@ -17,10 +21,7 @@ def probe_subtitles(video_file):
     except ffmpeg.Error as e:
         # Hide error if it's just about not finding streams, but show other errors
         if "could not find stream" not in e.stderr.decode(errors="ignore").lower():
-            print(
-                f"ffmpeg probe error: {e.stderr.decode(errors='ignore')}",
-                file=sys.stderr,
-            )
+            logger.error(f"ffmpeg probe error: {e.stderr.decode(errors='ignore')}")
         return []
 
 
@@ -28,24 +29,19 @@ def extract_subtitle(video_file, stream_index):
     """
     Extracts a specific subtitle stream from a video file and returns it as SRT content.
     """
-    print(f"Extracting subtitle stream {stream_index}...", file=sys.stderr)
+    logger.info(f"Extracting subtitle stream {stream_index}...")
     stream_specifier = f"0:s:{stream_index}"
     try:
-        out, err = (
-            ffmpeg.input(video_file)
-            .output("pipe:", format="srt", map=stream_specifier)
-            .run(capture_stdout=True, capture_stderr=True)
-        )
+        with metrics.stage("ffmpeg.extract_subtitle"):
+            out, err = (
+                ffmpeg.input(video_file)
+                .output("pipe:", format="srt", map=stream_specifier)
+                .run(capture_stdout=True, capture_stderr=True)
+            )
         srt_content = out.decode("utf-8")
         if not srt_content.strip() and err:
-            print(
-                f"ffmpeg extraction warning: {err.decode(errors='ignore')}",
-                file=sys.stderr,
-            )
+            logger.warning(f"ffmpeg extraction warning: {err.decode(errors='ignore')}")
         return srt_content
     except ffmpeg.Error as e:
-        print(
-            f"Error extracting subtitle: {e.stderr.decode(errors='ignore')}",
-            file=sys.stderr,
-        )
+        logger.error(f"Error extracting subtitle: {e.stderr.decode(errors='ignore')}")
         return None
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from ai_subtitle_assistant.core import audio_cache
+
+
+def test_prune_cache_deletes_least_recently_used_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", str(tmp_path))
+    paths = []
+    for index, name in enumerate(["old", "used", "new"]):
+        path = tmp_path / f"{name}.{audio_cache.PCM_FORMAT}"
+        path.write_bytes(b"\0" * 100)
+        os.utime(path, (1000 + index, 1000 + index))
+        paths.append(path)
+    # 最早写入的文件刚被使用过
+    os.utime(paths[0], (2000, 2000))
+
+    assert audio_cache.prune_cache(max_bytes=200, keep=str(paths[2])) == 100
+    assert sorted(os.listdir(tmp_path)) == [
+        f"new.{audio_cache.PCM_FORMAT}",
+        f"old.{audio_cache.PCM_FORMAT}",
+    ]
+
+
+def test_decoded_audio_is_reused_through_a_private_mapping(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", str(tmp_path / "cache"))
+    decoded = []
+
+    def decode(audio_file, path):
+        decoded.append(audio_file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.arange(4, dtype=audio_cache.PCM_DTYPE).tofile(path)
+
+    monkeypatch.setattr(audio_cache, "_decode", decode)
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(b"video")
+
+    first = audio_cache.load_pcm(str(video))
+    assert isinstance(first, np.memmap)
+    assert first.tolist() == [0, 1, 2, 3]
+    # 写入只影响本进程的映射，不改变缓存文件
+    first[0] = 9
+    # 内容相同的文件共用同一份缓存
+    second = audio_cache.load_pcm(str(copy))
+    assert second.tolist() == [0, 1, 2, 3]
+    assert decoded == [str(video)]
@@ -0,0 +1,49 @@
+import pytest
+from ai_subtitle_assistant.core import autotune, translation
+from ai_subtitle_assistant.core.json_repair import TruncatedJSONError
+
+
+def test_tuner_group_backs_off_only_the_failing_endpoint(tmp_path):
+    path = str(tmp_path / "autotune.json")
+    group = autotune.TunerGroup([("a", "m"), ("b", "pinned")], path)
+    before = group.tuner("a", "m").max_workers
+
+    group.record_failure(0.0, "rate_limit", ("b", "pinned"))
+    group.record_failure(0.0, "rate_limit", None)
+
+    assert group.tuner("a", "m").max_workers == before
+    assert group.tuner("b", "pinned").max_workers < before
+    assert group.max_workers == before + group.tuner("b", "pinned").max_workers
+
+    group.save()
+    assert set(autotune._load_state(path)) == {"a|m", "b|pinned"}
+
+
+def _parse_error(reply):
+    with pytest.raises(ValueError) as info:
+        translation._parse_translations(reply, [{"id": 0, "text": "Hi."}])
+    return info.value
+
+
+def test_only_cut_off_replies_count_as_truncated():
+    cut_off = _parse_error('{"translations": [{"id": 0, "original_text": "Hi')
+    assert isinstance(cut_off, TruncatedJSONError)
+    assert autotune.classify_error(cut_off) == "truncated"
+    assert autotune.classify_error(_parse_error('{"transl')) == "truncated"
+
+    wrong_shape = _parse_error('{"result": [{"id": 0, "text": "Hi."}]}')
+    assert autotune.classify_error(wrong_shape) == "malformed"
+    assert autotune.classify_error(_parse_error("Sorry, I can't.")) == "malformed"
+    # 回复因达到输出上限而结束时，即使结构不符也视为截断
+    assert autotune.classify_error(wrong_shape, "length") == "truncated"
+
+
+def test_malformed_reply_does_not_shrink_chunks(tmp_path):
+    tuner = autotune.Autotuner("k", path=str(tmp_path / "autotune.json"))
+    chunk_size, max_workers = tuner.chunk_size, tuner.max_workers
+
+    tuner.record_failure(0.0, "malformed")
+    assert (tuner.chunk_size, tuner.max_workers) == (chunk_size, max_workers)
+
+    tuner.record_failure(0.0, "truncated")
+    assert tuner.chunk_size < chunk_size
@@ -0,0 +1,13 @@
+from types import SimpleNamespace
+from ai_subtitle_assistant.core.backends import RemoteBackend
+
+
+def test_endpoint_model_replaces_only_the_main_model():
+    backend = RemoteBackend(pool=None, model="gpt-4o")
+    pinned = SimpleNamespace(model="deepseek-chat")
+    unpinned = SimpleNamespace(model=None)
+
+    assert backend.resolve_model(pinned, "gpt-4o") == "deepseek-chat"
+    assert backend.resolve_model(pinned, "gpt-4o-mini") == "gpt-4o-mini"
+    assert backend.resolve_model(unpinned, "gpt-4o-mini") == "gpt-4o-mini"
+    assert RemoteBackend(pool=None).resolve_model(pinned, "x") == "deepseek-chat"
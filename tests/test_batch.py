@@ -0,0 +1,75 @@
+import json
+from types import SimpleNamespace
+import pytest
+from ai_subtitle_assistant.core import batch
+
+
+class _FakeClient:
+    """A batch API whose batch stays in progress until output is set."""
+
+    def __init__(self, output=None, interrupt=False):
+        self.output = output
+        self.interrupt = interrupt
+        self.cancelled = []
+        self.files = SimpleNamespace(create=self._upload, content=self._content)
+        self.batches = SimpleNamespace(
+            create=self._create, retrieve=self._retrieve, cancel=self.cancelled.append
+        )
+
+    def _upload(self, file, purpose):
+        return SimpleNamespace(id="file-in")
+
+    def _create(self, **kwargs):
+        return SimpleNamespace(id="batch-1")
+
+    def _retrieve(self, batch_id):
+        if self.interrupt:
+            raise KeyboardInterrupt
+        if self.output is None:
+            return SimpleNamespace(status="in_progress", request_counts=None)
+        return SimpleNamespace(
+            status="completed", request_counts=None, output_file_id="file-out"
+        )
+
+    def _content(self, file_id):
+        return SimpleNamespace(text=self.output)
+
+
+def _record(custom_id, status_code=200, error=None):
+    return json.dumps(
+        {
+            "custom_id": custom_id,
+            "response": {"status_code": status_code, "body": {"id": custom_id}},
+            "error": error,
+        }
+    )
+
+
+def test_batch_output_leaves_out_failed_records():
+    output = "\n".join(
+        [
+            _record("0"),
+            _record("1", status_code=500),
+            "",
+            _record("2", error={"code": "server_error"}),
+            _record("3"),
+        ]
+    )
+    client = _FakeClient(output)
+    responses = batch.run_batch(client, [(str(i), {}) for i in range(4)], 0)
+    assert responses == {"0": {"id": "0"}, "3": {"id": "3"}}
+    assert client.cancelled == []
+
+
+def test_batch_is_cancelled_when_it_times_out():
+    client = _FakeClient()
+    with pytest.raises(TimeoutError):
+        batch.run_batch(client, [("0", {})], poll_interval=0.01, timeout=0.05)
+    assert client.cancelled == ["batch-1"]
+
+
+def test_batch_is_cancelled_when_interrupted():
+    client = _FakeClient(interrupt=True)
+    with pytest.raises(KeyboardInterrupt):
+        batch.run_batch(client, [("0", {})], poll_interval=0.01)
+    assert client.cancelled == ["batch-1"]
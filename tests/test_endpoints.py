@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+from ai_subtitle_assistant.core import endpoints
+from ai_subtitle_assistant.core.endpoints import Endpoint, EndpointPool, get_pool
+
+
+def _pick(pool, times=50):
+    names = set()
+    for _ in range(times):
+        endpoint = pool.acquire()
+        pool.release(endpoint, 0.1)
+        names.add(endpoint.name)
+    return names
+
+
+def test_endpoints_with_weight_zero_are_picked_uniformly_when_all_are_zero():
+    pool = EndpointPool(
+        [
+            Endpoint("a", "http://a", "k", weight=0),
+            Endpoint("b", "http://b", "k", weight=0),
+        ]
+    )
+    assert _pick(pool) == {"a", "b"}
+
+
+def test_endpoint_with_weight_zero_is_not_used_next_to_a_weighted_one():
+    pool = get_pool(
+        [
+            {
+                "name": "off",
+                "api_base_url": "http://off",
+                "api_key": "k",
+                "weight": 0.0,
+            },
+            {"name": "on", "api_base_url": "http://on", "api_key": "k"},
+        ]
+    )
+    assert [e.weight for e in pool.endpoints] == [0.0, 1.0]
+    assert _pick(pool) == {"on"}
+
+
+class _Probe:
+    """Stands in for an OpenAI client; models.list() fails until healthy."""
+
+    def __init__(self):
+        self.healthy = False
+        self.models = SimpleNamespace(list=self._list)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def _list(self):
+        if not self.healthy:
+            raise ConnectionError("unreachable")
+        return []
+
+
+def test_failing_endpoint_is_paused_until_a_health_check_passes(monkeypatch):
+    probe = _Probe()
+    monkeypatch.setattr(Endpoint, "client", property(lambda self: probe))
+    monkeypatch.setattr(endpoints, "OPEN_SECONDS", 0)
+    # 权重为 0 的备用端点只在主端点熔断时使用
+    pool = EndpointPool(
+        [
+            Endpoint("bad", "http://bad", "k"),
+            Endpoint("spare", "http://spare", "k", weight=0),
+        ]
+    )
+    monkeypatch.setattr(pool, "_start_health_checks", lambda: None)
+    bad = pool.endpoints[0]
+    for _ in range(endpoints.FAILURE_THRESHOLD - 1):
+        pool.release(pool.acquire(), success=False)
+    assert bad.opened_at is None
+    assert _pick(pool) == {"bad"}
+    for _ in range(endpoints.FAILURE_THRESHOLD):
+        pool.release(pool.acquire(), success=False)
+    assert bad.opened_at is not None
+    assert _pick(pool, 10) == {"spare"}
+    # 健康检查失败时保持熔断，成功后恢复
+    pool.check_health()
+    assert bad.opened_at is not None
+    probe.healthy = True
+    pool.check_health()
+    assert bad.opened_at is None and bad.failures == 0
+    assert _pick(pool) == {"bad"}
+
+
+def test_success_resets_the_failure_count():
+    pool = EndpointPool([Endpoint("a", "http://a", "k")])
+    endpoint = pool.endpoints[0]
+    for _ in range(endpoints.FAILURE_THRESHOLD - 1):
+        pool.release(pool.acquire(), success=False)
+    pool.release(pool.acquire(), 0.1)
+    pool.release(pool.acquire(), success=False)
+    assert endpoint.failures == 1 and endpoint.opened_at is None
@@ -0,0 +1,62 @@
+import numpy as np
+from ai_subtitle_assistant.core import fingerprint
+from ai_subtitle_assistant.core.audio_cache import SAMPLE_RATE
+
+
+def _syllables(seconds, seed):
+    """Quiet harmonic syllables with pauses and background noise, like speech."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int((seconds + 1) * SAMPLE_RATE))
+    position = 0
+    while position < seconds * SAMPLE_RATE:
+        length = int(rng.uniform(0.08, 0.25) * SAMPLE_RATE)
+        t = np.arange(length) / SAMPLE_RATE
+        phase = 2 * np.pi * np.cumsum(rng.uniform(100, 250) * (1 + 0.3 * t))
+        syllable = sum(np.sin(k * phase / SAMPLE_RATE) / k for k in range(1, 6))
+        samples[position : position + length] += (
+            rng.uniform(0.015, 0.06) * syllable * np.hanning(length)
+        )
+        position += length + int(rng.uniform(0.02, 0.3) * SAMPLE_RATE)
+    samples += rng.normal(0, 0.003, len(samples))
+    return samples[: int(seconds * SAMPLE_RATE)].astype(np.float32)
+
+
+def test_reuses_a_segment_at_a_half_hop_offset(tmp_path):
+    theme = _syllables(30, 1)
+    # 第一个文件中主题曲从第 20 秒开始，正好落在分帧网格上
+    first = np.concatenate([_syllables(20, 2), theme, _syllables(10, 3)])
+    segments = [
+        {"start": 20 + i * 3.0, "end": 22.5 + i * 3.0, "text": f"Line {i}"}
+        for i in range(10)
+    ]
+    index = fingerprint.FingerprintIndex(str(tmp_path / "index.sqlite3"))
+    index.add("first", "base", *fingerprint.fingerprint(first), segments)
+
+    # 第二个文件中主题曲相对分帧网格偏移半个跳步
+    lead = 15 * SAMPLE_RATE // fingerprint.HOP_SIZE * fingerprint.HOP_SIZE
+    lead += fingerprint.HOP_SIZE // 2
+    second = np.concatenate([_syllables(16, 4)[:lead], theme, _syllables(10, 5)])
+    reused, spans = index.find_reusable(*fingerprint.fingerprint(second), "base")
+
+    assert [segment["text"] for segment in reused] == [f"Line {i}" for i in range(10)]
+    assert abs(reused[0]["start"] - lead / SAMPLE_RATE) < 0.1
+    index.close()
+
+
+def test_unrelated_audio_or_another_model_reuses_nothing(tmp_path):
+    theme = _syllables(30, 1)
+    first = np.concatenate([_syllables(10, 2), theme])
+    segments = [
+        {"start": 10 + i * 3.0, "end": 12.5 + i * 3.0, "text": f"Line {i}"}
+        for i in range(10)
+    ]
+    index = fingerprint.FingerprintIndex(str(tmp_path / "index.sqlite3"))
+    index.add("first", "base", *fingerprint.fingerprint(first), segments)
+
+    unrelated = fingerprint.fingerprint(_syllables(40, 6))
+    assert index.find_reusable(*unrelated, "base")[0] == []
+    # 其他模型的转录不能复用
+    same = fingerprint.fingerprint(np.concatenate([_syllables(5, 7), theme]))
+    assert index.find_reusable(*same, "large")[0] == []
+    assert index.find_reusable(*same, "base")[0]
+    index.close()
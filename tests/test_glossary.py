@@ -0,0 +1,61 @@
+import json
+from ai_subtitle_assistant.core import glossary, translation
+
+SEGMENTS = [
+    {"id": i, "text": text}
+    for i, text in enumerate(
+        [
+            "Where is Gandalf?",
+            "I told Gandalf to wait.",
+            "[MUSIC] We need to leave Minas Tirith now.",
+            "Run! Run to the boats.",
+            "Do you trust Gandalf?",
+            "The boats are ready, run.",
+        ]
+    )
+]
+
+
+class _GlossaryBackend:
+    name = "remote"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def complete(self, system_prompt, prompt, model, **kwargs):
+        self.calls += 1
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+def test_extract_terms_keeps_names_and_drops_ordinary_words():
+    terms = glossary.extract_terms(SEGMENTS)
+    assert "Gandalf" in terms
+    assert "Minas Tirith" in terms
+    # 句首的大写词、也以小写出现的词和音效标记都不是术语
+    assert "Where" not in terms
+    assert "Run" not in terms
+    assert "MUSIC" not in terms
+
+
+def test_llm_glossary_is_cached_but_failures_are_not(tmp_path, monkeypatch):
+    monkeypatch.setattr(glossary, "GLOSSARY_CACHE_DIR", str(tmp_path))
+    failing = _GlossaryBackend(RuntimeError("rate limited"))
+    terms = glossary.build_glossary(SEGMENTS, "Chinese", "llm", failing, "m")
+    assert terms["Gandalf"] is None
+    assert list(tmp_path.iterdir()) == []
+
+    backend = _GlossaryBackend(
+        json.dumps({"glossary": {"Gandalf": "甘道夫", "Minas Tirith": "米那斯提力斯"}})
+    )
+    for _i in range(2):
+        terms = glossary.build_glossary(SEGMENTS, "Chinese", "llm", backend, "m")
+    assert backend.calls == 1
+    assert terms["Gandalf"] == "甘道夫"
+
+    chunk = [{"id": 0, "text": "Where is Gandalf?"}]
+    assert translation._chunk_glossary(chunk, "Chinese", {"Chinese": terms}) == {
+        "Chinese": {"Gandalf": "甘道夫"}
+    }
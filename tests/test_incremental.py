@@ -0,0 +1,68 @@
+from ai_subtitle_assistant.core.incremental import align_previous, parse_bilingual_srt
+from ai_subtitle_assistant.i18n import _
+
+PREVIOUS_SRT = """1
+00:00:01,000 --> 00:00:02,000
+我们黎明出发。
+We ride at dawn.
+
+2
+00:00:03,000 --> 00:00:04,000
+国王的军队
+已经到了河边。
+The king's army has reached the river.
+
+3
+00:00:05,000 --> 00:00:06,000
+准备好马匹。
+Get the horses ready.
+"""
+
+
+def _segments(texts):
+    return [
+        {"id": i, "start": i * 2.0 + 1, "end": i * 2.0 + 2, "text": text}
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_edited_cue_is_split_where_its_original_starts():
+    segments = _segments(
+        [
+            "We ride at dawn.",
+            "The queen's army has reached the river.",
+            "Get the horses ready.",
+        ]
+    )
+    cues = parse_bilingual_srt(PREVIOUS_SRT, segments)
+    # 两行译文、一行原文：按中间拆分会把第二行译文算进原文
+    assert cues[1] == {
+        "original_text": "The king's army has reached the river.",
+        "translated_text": "国王的军队\n已经到了河边。",
+    }
+
+
+def test_align_previous_carries_unchanged_cues_and_hints_edited_ones():
+    previous = [
+        {"original_text": "We ride at dawn.", "translated_text": "我们黎明出发。"},
+        {
+            "original_text": "The king's army has reached the river.",
+            "translated_text": "国王的军队已经到了河边。",
+        },
+        {"original_text": "Get the horses ready.", "translated_text": "准备好马匹。"},
+        {"original_text": "Quiet!", "translated_text": _("[Translation Failed]")},
+    ]
+    segments = _segments(
+        [
+            "We ride at dawn.",
+            "The queen's army has reached the river.",
+            "Someone is coming.",
+            "Get the horses ready.",
+            "Quiet!",
+        ]
+    )
+    carried, edited = align_previous(segments, previous)
+    assert carried == {0: "我们黎明出发。", 3: "准备好马匹。"}
+    assert list(edited) == [1]
+    assert edited[1]["source_text"] == "The king's army has reached the river."
+    assert edited[1]["translated_text"] == "国王的军队已经到了河边。"
@@ -0,0 +1,57 @@
+import time
+from ai_subtitle_assistant.core.job_store import JobStore
+
+
+def test_purge_finished_keeps_recent_and_unfinished_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.submit_many("translate", [{}, {}, {}])
+    old, recent = (store.claim("worker")["id"] for _i in range(2))
+    (queued,) = store._conn.execute(
+        "SELECT id FROM jobs WHERE status = 'queued'"
+    ).fetchone()
+    for job_id in (old, recent):
+        store.complete(job_id, "worker", {"srt": ""})
+    store._write(
+        [("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 7200, old))]
+    )
+
+    assert store.purge_finished(3600) == 1
+    assert store.get(old) is None
+    assert store.get(recent)["status"] == "done"
+    assert store.get(queued)["status"] == "queued"
+    store.close()
+
+
+def test_api_keys_are_not_persisted(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = JobStore(str(path))
+    job_id = store.submit(
+        "translate_chunk",
+        {"api_base_url": "https://llm.example/v1", "api_key": "sk-secret"},
+    )
+    assert store.get(job_id)["params"] == {"api_base_url": "https://llm.example/v1"}
+    store.close()
+    assert b"sk-secret" not in path.read_bytes()
+
+
+def test_workers_resolve_the_key_of_a_job_endpoint(monkeypatch):
+    from ai_subtitle_assistant.core import server
+
+    defaults = {
+        "api_base_url": "https://default.example/v1",
+        "api_key": "default-key",
+        "endpoints": [
+            {"name": "b", "api_base_url": "https://llm.example/v1", "api_key": "b-key"}
+        ],
+    }
+    monkeypatch.delenv("AI_SUBTITLE_API_KEY", raising=False)
+    params = {"api_base_url": "https://llm.example/v1"}
+    assert server._job_backend(params, defaults)[1] == "b-key"
+
+    monkeypatch.setenv("AI_SUBTITLE_API_KEY", "env-key")
+    params = {"api_base_url": "https://other.example/v1"}
+    assert server._job_backend(params, defaults)[:3] == (
+        "https://other.example/v1",
+        "env-key",
+        None,
+    )
@@ -0,0 +1,41 @@
+import logging
+import threading
+from ai_subtitle_assistant.core import log
+
+
+def test_payload_is_written_as_it_was_when_logged(tmp_path):
+    path = tmp_path / "test.log"
+    log.setup_logging("DEBUG", log_file=str(path))
+    try:
+        logger = log.get_logger("ai_subtitle_assistant.tests")
+        payload = [{"id": 0, "text": "before"}]
+        logger.debug("chunk %s", payload, extra={"payload": payload})
+        payload[0]["text"] = "after"
+        log.flush_logs()
+    finally:
+        log.stop_logging()
+        logging.getLogger(log.PACKAGE).handlers.clear()
+    content = path.read_text(encoding="utf-8")
+    assert "before" in content
+    assert "after" not in content
+
+
+def test_payload_is_serialized_on_the_listener_thread(tmp_path, monkeypatch):
+    threads = []
+    serialize = log._serialize_payload
+
+    def recording(payload):
+        threads.append(threading.current_thread())
+        return serialize(payload)
+
+    monkeypatch.setattr(log, "_serialize_payload", recording)
+    log.setup_logging("DEBUG", log_file=str(tmp_path / "test.log"))
+    try:
+        logger = log.get_logger("ai_subtitle_assistant.tests")
+        logger.debug("response", extra={"payload": {"translations": [1, 2]}})
+        log.flush_logs()
+    finally:
+        log.stop_logging()
+        logging.getLogger(log.PACKAGE).handlers.clear()
+    assert threads
+    assert threading.current_thread() not in threads
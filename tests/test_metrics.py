@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+from ai_subtitle_assistant.core.metrics import MetricsRegistry
+
+
+def test_report_sums_counters_usage_and_cache_hit_rates():
+    metrics = MetricsRegistry()
+    metrics.increment("llm_requests", labels={"model": "m"})
+    metrics.increment("llm_requests", 2, labels={"model": "m"})
+    metrics.record_usage(
+        SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+        labels={"model": "m"},
+    )
+    metrics.record_usage({"prompt_tokens": 1, "total_tokens": 1}, labels={"model": "m"})
+    for hit in (True, True, True, False):
+        metrics.record_cache("tm", hit)
+    with metrics.stage("translate.dispatch"):
+        pass
+
+    report = metrics.report()
+    counters = report["counters"]
+    assert counters["llm_requests"] == [{"labels": {"model": "m"}, "value": 3}]
+    assert counters["prompt_tokens"][0]["value"] == 11
+    assert counters["completion_tokens"][0]["value"] == 5
+    assert report["cache_hit_rates"] == {"tm": 0.75}
+    assert report["stages"]["translate.dispatch"]["calls"] == 1
+
+
+def test_prometheus_histogram_buckets_are_cumulative():
+    metrics = MetricsRegistry()
+    for seconds in (0.05, 0.3, 0.3, 100):
+        metrics.observe("llm_request_seconds", seconds, labels={"model": 'a"b'})
+    text = metrics.to_prometheus()
+    name = "ai_subtitle_llm_request_seconds"
+    assert "# TYPE " + name + " histogram" in text
+    assert name + '_bucket{model="a\\"b",le="0.1"} 1' in text
+    assert name + '_bucket{model="a\\"b",le="0.5"} 3' in text
+    assert name + '_bucket{model="a\\"b",le="+Inf"} 4' in text
+    assert name + '_count{model="a\\"b"} 4' in text
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import time
+import zipfile
+from ai_subtitle_assistant.core.metrics import MetricsRegistry
+from ai_subtitle_assistant.core.profiling import Profiler
+
+
+def _outer_work():
+    return sum(i * i for i in range(20000))
+
+
+def _inner_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_stages_are_profiled_exclusively_and_waits_are_sampled(tmp_path):
+    metrics = MetricsRegistry()
+    profiler = Profiler(str(tmp_path / "profile"), interval=0.001)
+    metrics.profiler = profiler
+    profiler.start()
+    release = threading.Event()
+
+    def worker():
+        with metrics.stage("translate.wait"):
+            release.wait(5)
+
+    thread = threading.Thread(target=worker, name="ThreadPoolExecutor-0_0")
+    thread.start()
+    with metrics.stage("outer"):
+        _outer_work()
+        with metrics.stage("inner"):
+            _inner_work()
+        time.sleep(0.05)
+    release.set()
+    thread.join()
+    profiler.stop()
+    archive = profiler.write(metrics.report()["stages"])
+
+    directory = tmp_path / "profile"
+    outer = (directory / "outer.txt").read_text(encoding="utf-8")
+    inner = (directory / "inner.txt").read_text(encoding="utf-8")
+    # 外层阶段不包含内层阶段的调用
+    assert "_outer_work" in outer and "_inner_work" not in outer
+    assert "_inner_work" in inner and "_outer_work" not in inner
+
+    summary = json.loads((directory / "summary.json").read_text(encoding="utf-8"))
+    waiting = summary["stages"]["translate.wait"]["threads"]["ThreadPoolExecutor-0"]
+    assert waiting["waiting_seconds"]["lock"] > 0
+    assert summary["stages"]["outer"]["calls"] == 1
+    assert "translate.wait;" in (directory / "all.collapsed").read_text(
+        encoding="utf-8"
+    )
+    with zipfile.ZipFile(archive) as zf:
+        assert "summary.json" in zf.namelist()
+    assert os.path.exists(directory / "translate.wait.collapsed")
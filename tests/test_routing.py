@@ -0,0 +1,166 @@
+import json
+import threading
+import pytest
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.routing import check_translation, check_translations
+
+SEGMENTS = [
+    {"id": i, "start": i * 2.0, "end": i * 2.0 + 1, "text": f"Sentence number {i}."}
+    for i in range(6)
+]
+
+
+class _TieredBackend:
+    """
+    The fast model drops the first cue of every chunk and answers the chunk
+    starting at id 0 at once, the others after release. The strong model
+    answers at once.
+    """
+
+    name = "remote"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def describe(self):
+        return ["tiered"]
+
+    def complete(self, system_prompt, prompt, model, schema=None):
+        marker = "Here is the JSON data to translate:"
+        segments = json.loads(prompt[prompt.rindex(marker) + len(marker) :])
+        if model == "fast":
+            if segments[0]["id"] != 0:
+                assert self.release.wait(10)
+            segments = segments[1:]
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": segment["id"],
+                        "original_text": segment["text"],
+                        "translated_text": f"这是第{segment['id']}句话的译文。",
+                    }
+                    for segment in segments
+                ]
+            },
+            ensure_ascii=False,
+        )
+
+
+def test_check_translation_reasons():
+    source = "This is a sentence that needs to be translated."
+    cases = [
+        ({"translated_text": ""}, "failed"),
+        ({"translated_text": "[Chunk Translation Failed]"}, "failed"),
+        (
+            {"original_text": "Another sentence.", "translated_text": "这是一句话。"},
+            "original_text",
+        ),
+        ({"original_text": source, "translated_text": "句"}, "length"),
+        ({"original_text": source, "translated_text": source}, "script"),
+        ({"original_text": source, "translated_text": "这是一句需要翻译的话。"}, None),
+    ]
+    for item, reason in cases:
+        assert check_translation(source, item, "Chinese") == reason
+    # 日文译文只有汉字时可能是中文
+    assert check_translation(
+        source, {"translated_text": "这是一句需要翻译的话"}, "Japanese"
+    )
+    assert (
+        check_translation(
+            source, {"translated_text": "これは翻訳が必要な文です。"}, "Japanese"
+        )
+        is None
+    )
+
+
+def test_check_translations_reports_missing_cues():
+    chunk = [{"id": 0, "text": "Yes."}, {"id": 1, "text": "No."}]
+    translated = [{"id": 1, "original_text": "No.", "translated_text": "不。"}]
+    assert check_translations(chunk, translated, "Chinese") == {0: "missing"}
+
+
+def test_escalated_cues_are_delivered_while_later_fast_chunks_run(monkeypatch):
+    monkeypatch.setattr(translation, "CHUNK_SIZE_LIMIT", 60)
+    backend = _TieredBackend()
+    delivered = {}
+    first_chunk = threading.Event()
+
+    def on_chunk(language, position, subtitles):
+        delivered[position] = subtitles
+        if position == 0:
+            first_chunk.set()
+
+    thread = threading.Thread(
+        target=translation.translate_segments_multi,
+        args=(SEGMENTS, ["Chinese"], None, None, "strong", 4),
+        kwargs=dict(
+            backend=backend,
+            fast_model="fast",
+            skip_detection=False,
+            deduplicate=False,
+            on_chunk=on_chunk,
+        ),
+    )
+    thread.start()
+    try:
+        assert first_chunk.wait(10)
+        assert all("Failed" not in item["translated_text"] for item in delivered[0])
+    finally:
+        backend.release.set()
+        thread.join(10)
+    assert sum(len(subtitles) for subtitles in delivered.values()) == len(SEGMENTS)
+
+
+def test_escalations_do_not_inherit_the_hedge_flag(monkeypatch):
+    dispatch = translation._dispatch_chunks
+    process = translation._timed_process_chunk
+    strong_tasks = []
+
+    def hedged_dispatch(chunk_data_list, *args, **kwargs):
+        # 假设每个快速模型的块都由对冲副本胜出
+        for position, task, future in dispatch(chunk_data_list, *args, **kwargs):
+            if task.get("tier") == "fast":
+                task = dict(task, hedge=True)
+            yield position, task, future
+
+    def record(task):
+        if task.get("tier") == "strong":
+            strong_tasks.append(task)
+        return process(task)
+
+    monkeypatch.setattr(translation, "_dispatch_chunks", hedged_dispatch)
+    monkeypatch.setattr(translation, "_timed_process_chunk", record)
+    backend = _TieredBackend()
+    backend.release.set()
+    results = translation.translate_segments_multi(
+        SEGMENTS,
+        ["Chinese"],
+        None,
+        None,
+        "strong",
+        4,
+        backend=backend,
+        fast_model="fast",
+        skip_detection=False,
+        deduplicate=False,
+    )
+    assert strong_tasks
+    assert not any(task.get("hedge") for task in strong_tasks)
+    assert len(results["Chinese"]) == len(SEGMENTS)
+
+
+def test_fast_model_is_rejected_for_a_local_backend():
+    backend = _TieredBackend()
+    backend.name = "local"
+    with pytest.raises(ValueError):
+        translation.translate_segments_multi(
+            SEGMENTS,
+            ["Chinese"],
+            None,
+            None,
+            "strong",
+            4,
+            backend=backend,
+            fast_model="fast",
+        )
@@ -0,0 +1,77 @@
+import queue
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from ai_subtitle_assistant.core import server
+
+
+@pytest.fixture
+def http_server():
+    """Serves a JobManager's HTTP API on a free port; yields (manager, url)."""
+    started = []
+
+    def start(manager):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), server._make_handler(manager))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        started.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    yield start
+    for httpd in started:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_jobs_run_in_priority_order(monkeypatch):
+    order = []
+    monkeypatch.setitem(
+        server._JOB_RUNNERS, "translate", lambda params, defaults: order.append(params)
+    )
+    manager = server.JobManager(queue_size=10, workers=1)
+    for name, priority in [("late", 5), ("first", -1), ("second", 0), ("third", 0)]:
+        manager.submit("translate", name, priority)
+    manager.start()
+    manager.queue.join()
+    assert order == ["first", "second", "third", "late"]
+
+
+def test_full_queue_and_unknown_job_types_are_rejected(http_server):
+    manager = server.JobManager(queue_size=1, workers=1)
+    url = http_server(manager)
+    server.submit_job(url, "translate", {})
+    with pytest.raises(RuntimeError, match="full"):
+        server.submit_job(url, "translate", {})
+    with pytest.raises(queue.Full):
+        manager.submit("translate", {})
+    with pytest.raises(RuntimeError, match="Unknown job type"):
+        server.submit_job(url, "translate_chunk", {})
+
+
+def test_remote_job_returns_the_result_and_drops_params(monkeypatch, http_server):
+    monkeypatch.setitem(
+        server._JOB_RUNNERS,
+        "translate",
+        lambda params, defaults: {"srt": params["srt"].upper(), "model": defaults},
+    )
+    manager = server.JobManager(workers=1, defaults={"model": "m"})
+    manager.start()
+    url = http_server(manager)
+    job_id = server.submit_job(url, "translate", {"srt": "hello"})
+    result = server.wait_for_job(url, job_id, poll_interval=0.01)
+    assert result == {"srt": "HELLO", "model": {"model": "m"}}
+    job = manager.get(job_id)
+    assert job["status"] == "done" and job["params"] is None
+
+
+def test_failed_job_reports_its_error(monkeypatch, http_server):
+    def fail(params, defaults):
+        raise ValueError("Error: Could not parse SRT content.")
+
+    monkeypatch.setitem(server._JOB_RUNNERS, "translate", fail)
+    manager = server.JobManager(workers=1)
+    manager.start()
+    url = http_server(manager)
+    job_id = server.submit_job(url, "translate", {"srt": ""})
+    with pytest.raises(RuntimeError, match="Could not parse"):
+        server.wait_for_job(url, job_id, poll_interval=0.01)
+    assert manager.get(job_id)["status"] == "failed"
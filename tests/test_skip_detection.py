@@ -0,0 +1,88 @@
+import json
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.skip_detection import classify, detect_latin_language
+
+
+def test_cues_that_need_no_translation():
+    cases = [
+        ("   ", "Chinese", ("empty", "")),
+        ("♪ ♪", "Chinese", ("music", "♪ ♪")),
+        ("1, 2, 3...", "Chinese", ("numbers", "1, 2, 3...")),
+        (">> JOHN:", "Chinese", ("speaker_tag", ">> JOHN:")),
+        ("[Music]", "Chinese", ("sound_tag", "[音乐]")),
+        ("(laughing)", "japanese", ("sound_tag", "[笑い声]")),
+        ("[APPLAUSE]", "English", ("sound_tag", "[APPLAUSE]")),
+        ("你好，世界。", "Chinese", ("target_language", "你好，世界。")),
+        (
+            "¿Qué es lo que está pasando en la casa?",
+            "Spanish",
+            ("target_language", "¿Qué es lo que está pasando en la casa?"),
+        ),
+    ]
+    for text, language, expected in cases:
+        assert classify(text, language) == expected, text
+
+
+def test_cues_that_must_be_translated():
+    for text, language in [
+        ("What is going on in the house?", "Chinese"),
+        # 未知的音效标签，或目标语言没有模板
+        ("[door creaks]", "Chinese"),
+        ("[Music]", "Italian"),
+        # 只有汉字的句子可能是中文，不能当作日文
+        ("你好，世界。", "Japanese"),
+        ("¿Qué es lo que está pasando en la casa?", "French"),
+    ]:
+        assert classify(text, language) is None, text
+
+
+def test_latin_language_needs_enough_function_words():
+    assert detect_latin_language("What is that and what are you doing?") == "english"
+    assert detect_latin_language("Okay.") is None
+
+
+class _RecordingBackend:
+    name = "remote"
+
+    def __init__(self):
+        self.sent = []
+
+    def describe(self):
+        return ["recording"]
+
+    def complete(self, system_prompt, prompt, model, schema=None):
+        marker = "Here is the JSON data to translate:"
+        segments = json.loads(prompt[prompt.rindex(marker) + len(marker) :])
+        self.sent.extend(segment["text"] for segment in segments)
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": segment["id"],
+                        "original_text": segment["text"],
+                        "translated_text": "译文",
+                    }
+                    for segment in segments
+                ]
+            },
+            ensure_ascii=False,
+        )
+
+
+def test_skipped_cues_are_not_sent_to_the_model():
+    texts = ["♪ ♪", "Where are you going?", "[Music]", "42"]
+    segments = [
+        {"id": i, "start": i * 2.0, "end": i * 2.0 + 1, "text": text}
+        for i, text in enumerate(texts)
+    ]
+    backend = _RecordingBackend()
+    results = translation.translate_segments(
+        segments, "Chinese", None, None, "m", 1, backend=backend
+    )
+    assert backend.sent == ["Where are you going?"]
+    assert [item["translated_text"] for item in results] == [
+        "♪ ♪",
+        "译文",
+        "[音乐]",
+        "42",
+    ]
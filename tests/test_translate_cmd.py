@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import pytest
+import srt
+from ai_subtitle_assistant.commands.translate_cmd import open_output
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.srt_utils import OrderedBilingualWriter
+
+
+class _BlockingBackend:
+    """Answers the chunk starting at id 0 at once and the others after release."""
+
+    name = "remote"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def describe(self):
+        return ["blocking"]
+
+    def complete(self, system_prompt, prompt, model, schema=None):
+        marker = "Here is the JSON data to translate:"
+        segments = json.loads(prompt[prompt.rindex(marker) + len(marker) :])
+        if segments[0]["id"] != 0:
+            assert self.release.wait(10)
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": segment["id"],
+                        "original_text": segment["text"],
+                        "translated_text": "zh " + segment["text"],
+                    }
+                    for segment in segments
+                ]
+            }
+        )
+
+
+def test_cues_are_readable_from_the_output_while_later_chunks_run(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(translation, "CHUNK_SIZE_LIMIT", 60)
+    segments = [
+        {"id": i, "start": i * 2.0, "end": i * 2.0 + 1, "text": f"Sentence number {i}."}
+        for i in range(6)
+    ]
+    backend = _BlockingBackend()
+    path = tmp_path / "movie.srt"
+    written = threading.Event()
+
+    with open_output(str(path)) as f:
+        writer = OrderedBilingualWriter(f)
+
+        def on_chunk(language, position, subtitles):
+            writer.add(position, subtitles)
+            written.set()
+
+        thread = threading.Thread(
+            target=translation.translate_segments_multi,
+            args=(segments, ["Chinese"], None, None, "m", 2),
+            kwargs=dict(
+                backend=backend,
+                on_chunk=on_chunk,
+                skip_detection=False,
+                deduplicate=False,
+                context_cues=0,
+            ),
+        )
+        thread.start()
+        try:
+            assert written.wait(10)
+            # 后面的块仍被阻塞，输出文件中已有第一个块的字幕
+            early = list(srt.parse(path.read_text(encoding="utf-8")))
+            assert 0 < len(early) < len(segments)
+            assert early[0].content.startswith("zh Sentence number 0.")
+        finally:
+            backend.release.set()
+            thread.join(10)
+    assert len(list(srt.parse(path.read_text(encoding="utf-8")))) == len(segments)
+
+
+def test_atomic_output_replaces_the_file_on_success(tmp_path):
+    path = tmp_path / "movie.srt"
+    path.write_text("old", encoding="utf-8")
+    with open_output(str(path), atomic=True) as f:
+        f.write("new")
+    assert path.read_text(encoding="utf-8") == "new"
+    assert os.listdir(tmp_path) == ["movie.srt"]
+
+
+def test_atomic_output_keeps_the_previous_file_on_failure(tmp_path):
+    path = tmp_path / "movie.srt"
+    path.write_text("old", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with open_output(str(path), atomic=True) as f:
+            f.write("partial")
+            raise RuntimeError("translation failed")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(tmp_path) == ["movie.srt"]
@@ -0,0 +1,242 @@
+import json
+import threading
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.metrics import registry as metrics
+
+
+class _ScriptedBackend:
+    """Returns the scripted replies in order, then complete ones."""
+
+    name = "remote"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def describe(self):
+        return ["scripted"]
+
+    def complete(self, system_prompt, prompt, model, schema=None):
+        marker = "Here is the JSON data to translate:"
+        segments = json.loads(prompt[prompt.rindex(marker) + len(marker) :])
+        self.prompts.append(segments)
+        if self.replies:
+            return self.replies.pop(0)
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": segment["id"],
+                        "original_text": segment["text"],
+                        "translated_text": {
+                            "Japanese": "ja " + segment["text"],
+                            "Spanish": "es " + segment["text"],
+                        },
+                    }
+                    for segment in segments
+                ]
+            }
+        )
+
+
+SEGMENTS = [{"id": i, "text": f"Line {i}."} for i in range(4)]
+LANGUAGES = ["Japanese", "Spanish"]
+# 截断的回复中唯一恢复的条目缺少 Spanish
+TRUNCATED = (
+    '{"translations": [{"id": 0, "original_text": "Line 0.", '
+    '"translated_text": {"Japanese": "ja Line 0."}}, {"id": 1, "orig'
+)
+
+
+def test_multi_retries_reply_without_complete_items():
+    backend = _ScriptedBackend([TRUNCATED])
+    results = translation._translate_chunk_multi(backend, SEGMENTS, LANGUAGES, "m")
+    # 重试时拆成两半
+    assert [len(p) for p in backend.prompts] == [4, 2, 2]
+    for language in LANGUAGES:
+        assert sorted(item["id"] for item in results[language]) == [0, 1, 2, 3]
+
+
+def test_multi_marks_cues_failed_when_retry_is_unusable():
+    backend = _ScriptedBackend([TRUNCATED] * 3)
+    results = translation._translate_chunk_multi(backend, SEGMENTS, LANGUAGES, "m")
+    failed = translation._("[Chunk Translation Failed]")
+    for language in LANGUAGES:
+        assert [item["id"] for item in results[language]] == [0, 1, 2, 3]
+        assert all(item["translated_text"] == failed for item in results[language])
+
+
+def test_failed_chunk_still_delivers_prefilled_and_duplicate_cues(monkeypatch):
+    segments = [
+        {"id": 0, "start": 0.0, "end": 1.0, "text": "Where are you going tonight?"},
+        {"id": 1, "start": 2.0, "end": 3.0, "text": "♪ ♪"},
+        {"id": 2, "start": 4.0, "end": 5.0, "text": "I have no idea at all."},
+        {"id": 3, "start": 6.0, "end": 7.0, "text": "Where are you going tonight?"},
+    ]
+    process = translation._timed_process_chunk
+
+    def fail_second_chunk(task):
+        if task["chunk"][0]["id"] != 0:
+            raise RuntimeError("connection reset")
+        return process(task)
+
+    monkeypatch.setattr(translation, "CHUNK_SIZE_LIMIT", 60)
+    monkeypatch.setattr(translation, "_timed_process_chunk", fail_second_chunk)
+    results = translation.translate_segments_multi(
+        segments,
+        LANGUAGES,
+        None,
+        None,
+        "m",
+        2,
+        combined=True,
+        backend=_ScriptedBackend([]),
+    )
+    texts = [item["translated_text"] for item in results["Japanese"]]
+    # 音乐段落原样保留，重复段落使用首次出现的译文，只有真正请求失败的段落标记为失败
+    assert texts[0] == texts[3] == "ja Where are you going tonight?"
+    assert texts[1] == "♪ ♪"
+    assert "ja " not in texts[2]
+
+
+class _SlowPrimaryBackend:
+    """Answers at once, except the primary request of every later chunk."""
+
+    name = "remote"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.models = []
+        self.texts = []
+
+    def describe(self):
+        return ["slow primary"]
+
+    def complete(self, system_prompt, prompt, model, schema=None):
+        marker = "Here is the JSON data to translate:"
+        segments = json.loads(prompt[prompt.rindex(marker) + len(marker) :])
+        self.models.append(model)
+        self.texts.extend(segment["text"] for segment in segments)
+        if model == "m" and segments[0]["id"] != 0:
+            self.release.wait(10)
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": segment["id"],
+                        "original_text": segment["text"],
+                        "translated_text": f"{model} {segment['text']}",
+                    }
+                    for segment in segments
+                ]
+            }
+        )
+
+
+def _hedge_wins():
+    return sum(
+        item["value"]
+        for item in metrics.report()["counters"].get("hedge_wins", [])
+        if item["labels"] == {"model": "hedge"}
+    )
+
+
+def test_slow_chunk_is_answered_by_its_hedge(monkeypatch):
+    monkeypatch.setattr(translation, "CHUNK_SIZE_LIMIT", 60)
+    monkeypatch.setattr(translation, "HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(translation, "HEDGE_MIN_DELAY", 0.05)
+    segments = [
+        {"id": i, "start": i * 2.0, "end": i * 2.0 + 1, "text": f"Sentence number {i}."}
+        for i in range(2)
+    ]
+    backend = _SlowPrimaryBackend()
+    wins = _hedge_wins()
+    try:
+        results = translation.translate_segments(
+            segments,
+            "Japanese",
+            None,
+            None,
+            "m",
+            2,
+            backend=backend,
+            hedge_percentile=50,
+            hedge_budget=1.0,
+            hedge_model="hedge",
+            skip_detection=False,
+        )
+    finally:
+        backend.release.set()
+    assert [item["translated_text"] for item in results] == [
+        "m Sentence number 0.",
+        "hedge Sentence number 1.",
+    ]
+    assert backend.models.count("hedge") == 1
+    assert _hedge_wins() == wins + 1
+
+
+def test_streaming_single_language_delivers_chunks_and_returns_nothing():
+    segments = [
+        dict(segment, start=i, end=i + 0.5) for i, segment in enumerate(SEGMENTS)
+    ]
+    backend = _ScriptedBackend(
+        [
+            json.dumps(
+                {
+                    "translations": [
+                        {
+                            "id": s["id"],
+                            "original_text": s["text"],
+                            "translated_text": "ja",
+                        }
+                        for s in segments
+                    ]
+                }
+            )
+        ]
+    )
+    delivered = []
+    results = translation.translate_segments(
+        segments,
+        "Japanese",
+        None,
+        None,
+        "m",
+        1,
+        backend=backend,
+        skip_detection=False,
+        on_chunk=lambda language, position, subtitles: delivered.extend(subtitles),
+    )
+    assert results == []
+    assert [item["translated_text"] for item in delivered] == ["ja"] * len(segments)
+
+
+def test_repeated_text_is_sent_once_and_copied_to_every_occurrence():
+    texts = ["Yeah.", "Where are you going?", "Yeah.", "Where are  you\ngoing?"]
+    segments = [
+        {"id": i, "start": i * 2.0, "end": i * 2.0 + 1, "text": text}
+        for i, text in enumerate(texts)
+    ]
+    expected = ["m Yeah.", "m Where are you going?"] * 2
+    backend = _SlowPrimaryBackend()
+    backend.release.set()
+    results = translation.translate_segments(
+        segments, "Japanese", None, None, "m", 1, backend=backend, skip_detection=False
+    )
+    assert backend.texts == ["Yeah.", "Where are you going?"]
+    assert [item["translated_text"] for item in results] == expected
+    # 流式交付时重复的段落也随其所在的块交付
+    delivered = []
+    translation.translate_segments(
+        segments,
+        "Japanese",
+        None,
+        None,
+        "m",
+        1,
+        backend=backend,
+        skip_detection=False,
+        on_chunk=lambda language, position, subtitles: delivered.extend(subtitles),
+    )
+    assert len(backend.texts) == 4
+    assert [item["translated_text"] for item in delivered] == expected
@@ -0,0 +1,60 @@
+from ai_subtitle_assistant.core import translation
+from ai_subtitle_assistant.core.translation_memory import (
+    TranslationMemory,
+    transfer_numbers,
+)
+
+
+def test_lookup_finds_exact_and_near_matches(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    memory.add_many(
+        [
+            ("I will be there at 5 o'clock.", "我五点会到。"),
+            ("The weather is lovely today, isn't it?", "今天天气真好，不是吗？"),
+        ],
+        "Chinese",
+    )
+    # 只有数字和标点不同的句子视为完全匹配
+    exact = memory.lookup("I WILL be there at 7 o'clock!", "Chinese")
+    assert exact[0]["similarity"] == 1.0
+    assert exact[0]["source_text"] == "I will be there at 5 o'clock."
+
+    near = memory.lookup("The weather is lovely today, isn't it", "Chinese")
+    assert near and near[0]["translated_text"] == "今天天气真好，不是吗？"
+    assert memory.lookup("The weather is lovely today.", "Japanese") == []
+    memory.close()
+
+
+def test_transfer_numbers_rewrites_or_gives_up():
+    assert (
+        transfer_numbers("Room 12 at 5.", "Room 14 at 5.", "12号房间，5点。")
+        == "14号房间，5点。"
+    )
+    assert transfer_numbers("1 and 1", "2 and 3", "1和1") is None
+    assert transfer_numbers("5 apples", "5 apples and 2 pears", "5个苹果") is None
+
+
+def test_translation_memory_reuses_exact_matches_without_a_request(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    memory.add_many([("Room 12, please.", "请到12号房间。")], "Chinese")
+
+    class NoRequests:
+        name = "remote"
+
+        def describe(self):
+            return ["none"]
+
+        def complete(self, *args, **kwargs):
+            raise AssertionError("the memory should have answered")
+
+    segments = [{"id": 0, "start": 0.0, "end": 1.0, "text": "Room 14, please."}]
+    results = translation.translate_segments(
+        segments,
+        "Chinese",
+        None,
+        None,
+        backend=NoRequests(),
+        translation_memory=memory,
+    )
+    assert results[0]["translated_text"] == "请到14号房间。"
+    memory.close()